@@ -0,0 +1,17 @@
+from fastapi import Depends, Header, HTTPException
+from typing import Optional
+import hmac
+import os
+
+async def verify_admin_key(x_admin_key: Optional[str] = Header(None)) -> None:
+    """Guard for operational endpoints: requires X-Admin-Key to match ADMIN_API_KEY.
+
+    Admin endpoints are disabled entirely when ADMIN_API_KEY is unset.
+    """
+    expected = os.getenv("ADMIN_API_KEY")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+require_admin = Depends(verify_admin_key)
@@ -3,24 +3,25 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 import os
 import logging
-from dotenv import load_dotenv
-import httpx
+from app.clients.http import upstream_client
+from app.tracing import traced
 from pydantic import BaseModel, EmailStr
 
-# Load environment variables
-load_dotenv()
-
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Set up security
 security = HTTPBearer()
 
-# Get Clerk environment variables
-clerk_secret_key = os.getenv("CLERK_SECRET_KEY")
-if not clerk_secret_key:
-    raise ValueError("CLERK_SECRET_KEY not found in environment variables")
+def get_clerk_secret_key() -> str:
+    """The Clerk backend key, read when first needed rather than at import."""
+    clerk_secret_key = os.getenv("CLERK_SECRET_KEY")
+    if not clerk_secret_key:
+        raise ValueError("CLERK_SECRET_KEY not found in environment variables")
+    return clerk_secret_key
+
+def get_clerk_api_base_url() -> str:
+    return os.getenv("CLERK_API_BASE_URL", "https://api.clerk.com/v1")
 
 class UserData(BaseModel):
     """Pydantic model for authenticated user data"""
@@ -33,6 +34,7 @@ class UserData(BaseModel):
     class Config:
         from_attributes = True
 
+@traced("clerk.verify_auth_token")
 async def verify_auth_token(token: str) -> Optional[UserData]:
     """Verify a JWT token from Clerk."""
     try:
@@ -61,15 +63,16 @@ async def verify_auth_token(token: str) -> Optional[UserData]:
                 return None
             
             # Make direct HTTP request to Clerk API to get user details
-            async with httpx.AsyncClient() as client:
-                headers = {"Authorization": f"Bearer {clerk_secret_key}"}
+            clerk_api_base_url = get_clerk_api_base_url()
+            async with upstream_client("clerk") as client:
+                headers = {"Authorization": f"Bearer {get_clerk_secret_key()}"}
                 user_response = await client.get(
-                    f"https://api.clerk.com/v1/users/{user_id}",
+                    f"{clerk_api_base_url}/users/{user_id}",
                     headers=headers
                 )
                 
                 if user_response.status_code != 200:
-                    logger.error(f"❌ Failed to get user details: {user_response.text}")
+                    logger.error("❌ Failed to get user details: %s", user_response.text)
                     return None
                     
                 user_data = user_response.json()
@@ -77,12 +80,12 @@ async def verify_auth_token(token: str) -> Optional[UserData]:
                 
                 # Get session details
                 session_response = await client.get(
-                    f"https://api.clerk.com/v1/sessions/{session_id}",
+                    f"{clerk_api_base_url}/sessions/{session_id}",
                     headers=headers
                 )
                 
                 if session_response.status_code != 200:
-                    logger.error(f"❌ Failed to get session details: {session_response.text}")
+                    logger.error("❌ Failed to get session details: %s", session_response.text)
                     return None
                     
                 session_data = session_response.json()
@@ -101,17 +104,17 @@ async def verify_auth_token(token: str) -> Optional[UserData]:
                 )
                 
         except Exception as e:
-            logger.error(f"❌ Failed to decode token payload: {str(e)}")
+            logger.error("❌ Failed to decode token payload: %s", e)
             return None
             
     except Exception as e:
-        logger.error(f"❌ Token verification failed: {str(e)}")
+        logger.error("❌ Token verification failed: %s", e)
         return None
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserData:
     """Get the current authenticated user from the token."""
     user_data = await verify_auth_token(credentials.credentials)
-    logger.info(f"👤 User auth data: {user_data}")
+    logger.info("👤 User auth data: %s", user_data)
     if not user_data:
         raise HTTPException(
             status_code=401,
@@ -124,12 +127,12 @@ async def get_optional_user(
 ) -> Optional[UserData]:
     """Get the current user if authenticated, otherwise return None."""
 
-    logger.info(f"👤 Optional user auth data: {bool(credentials)}")
+    logger.info("👤 Optional user auth data: %s", bool(credentials))
     if not credentials:
         return None
     try:
         user_data = await verify_auth_token(credentials.credentials)
-        logger.info(f"👤 User auth data: {user_data}")
+        logger.info("👤 User auth data: %s", user_data)
         return user_data
     except HTTPException:
         return None
@@ -0,0 +1,17 @@
+from fastapi import Depends, Header, HTTPException
+from typing import Optional
+import hmac
+import os
+
+async def verify_vapi_secret(x_vapi_secret: Optional[str] = Header(None)) -> None:
+    """Guard for VAPI server messages: requires X-Vapi-Secret to match VAPI_WEBHOOK_SECRET.
+
+    The webhook is disabled entirely when VAPI_WEBHOOK_SECRET is unset.
+    """
+    expected = os.getenv("VAPI_WEBHOOK_SECRET")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_vapi_secret or not hmac.compare_digest(x_vapi_secret, expected):
+        raise HTTPException(status_code=403, detail="Invalid webhook secret")
+
+require_vapi_secret = Depends(verify_vapi_secret)
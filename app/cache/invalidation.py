@@ -0,0 +1,327 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Protocol, Set
+from urllib.parse import urlparse
+from pydantic import BaseModel
+from app.metrics import cache_invalidations
+from .shared_cache import LocalServerBackend, read_reply
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+MAX_KEYS_PER_EVENT = 100  # keeps a message well under Postgres' 8000-byte NOTIFY limit
+
+class InvalidationEvent(BaseModel):
+    """A write to an entity, announced to every worker."""
+    entity: str  # "restaurant", "hours" or "user"
+    keys: List[str]
+    version: float  # when the write finished (epoch seconds); cached reads from before it are stale
+    deleted: bool = False
+    origin: str = ""  # the publishing worker, which applied the event already
+
+class InvalidationTransport(Protocol):
+    """Carries encoded events between workers; every worker receives every message."""
+
+    async def connect(self, deliver: Callable[[bytes], None]) -> None: ...
+
+    async def publish(self, message: bytes) -> None: ...
+
+    async def close(self) -> None: ...
+
+class PostgresNotifyTransport:
+    """LISTEN/NOTIFY on a Postgres channel (requires the optional `asyncpg` package).
+
+    One connection both listens and notifies. A watchdog reconnects and listens again as
+    soon as the connection terminates, and pings it every `keepalive_seconds` to catch a
+    peer that went away without closing it. Events missed meanwhile are bounded by the
+    caches' TTLs.
+    """
+
+    def __init__(self, dsn: str, channel: str = CHANNEL, retry_seconds: float = 1.0,
+                 keepalive_seconds: float = 30.0):
+        try:
+            import asyncpg
+        except ImportError as e:
+            raise ValueError("postgres:// invalidation URLs require the `asyncpg` package") from e
+        self._asyncpg = asyncpg
+        self.dsn = dsn
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self._conn = None
+        self._deliver: Optional[Callable[[bytes], None]] = None
+        self._lock = asyncio.Lock()
+        self._watchdog: Optional[asyncio.Task] = None
+        self._lost: Optional[asyncio.Event] = None
+        self._connected: Optional[asyncio.Event] = None
+
+    async def connect(self, deliver: Callable[[bytes], None]) -> None:
+        self._deliver = deliver
+        self._lost = asyncio.Event()
+        self._connected = asyncio.Event()
+        self._watchdog = asyncio.create_task(self._watch())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Postgres invalidation channel %s not reachable yet; retrying", self.channel)
+
+    async def _ensure_connection(self):
+        if self._conn is None or self._conn.is_closed():
+            self._conn = await self._asyncpg.connect(self.dsn)
+            await self._conn.add_listener(self.channel, self._on_notify)
+            self._conn.add_termination_listener(self._on_terminated)
+            if self._lost is not None:
+                self._lost.clear()
+        return self._conn
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                async with self._lock:
+                    await self._ensure_connection()
+                self._connected.set()
+                try:
+                    await asyncio.wait_for(self._lost.wait(), timeout=self.keepalive_seconds)
+                    logger.warning("⚠️ Postgres invalidation listener on %s disconnected; reconnecting", self.channel)
+                except asyncio.TimeoutError:
+                    async with self._lock:
+                        await self._conn.fetchval("select 1", timeout=self.keepalive_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Lost Postgres invalidation listener on %s: %r", self.channel, e)
+                self._drop()
+                await asyncio.sleep(self.retry_seconds)
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        if self._deliver is not None:
+            self._deliver(payload.encode("utf-8"))
+
+    def _on_terminated(self, connection: Any) -> None:
+        if self._lost is not None:
+            self._lost.set()
+
+    def _drop(self) -> None:
+        if self._conn is not None:
+            self._conn.remove_termination_listener(self._on_terminated)
+            self._conn.terminate()
+            self._conn = None
+
+    async def publish(self, message: bytes) -> None:
+        async with self._lock:
+            conn = await self._ensure_connection()
+            await conn.execute("select pg_notify($1, $2)", self.channel, message.decode("utf-8"))
+
+    async def close(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            await asyncio.gather(self._watchdog, return_exceptions=True)
+        if self._conn is not None:
+            self._conn.remove_termination_listener(self._on_terminated)
+            await self._conn.close()
+            self._conn = None
+
+class SupabaseRealtimeTransport:
+    """Broadcast messages on a Supabase Realtime channel, with the project URL and key."""
+    EVENT = "invalidate"
+
+    def __init__(self, url: str, key: str, channel: str = CHANNEL):
+        self.url = url
+        self.key = key
+        self.channel_name = channel
+        self._client = None
+        self._channel = None
+
+    async def connect(self, deliver: Callable[[bytes], None]) -> None:
+        from realtime import AsyncRealtimeClient
+        realtime_url = f"{self.url.rstrip('/')}/realtime/v1".replace("http", "ws", 1)
+        self._client = AsyncRealtimeClient(realtime_url, token=self.key, params={"apikey": self.key})
+        await self._client.connect()
+        self._channel = self._client.channel(self.channel_name, {"config": {"broadcast": {"self": False}}})
+        self._channel.on_broadcast(
+            self.EVENT, lambda message: deliver(json.dumps(message["payload"]).encode("utf-8"))
+        )
+        await self._channel.subscribe()
+
+    async def publish(self, message: bytes) -> None:
+        await self._channel.send_broadcast(self.EVENT, json.loads(message))
+
+    async def close(self) -> None:
+        if self._channel is not None:
+            await self._channel.unsubscribe()
+        if self._client is not None:
+            await self._client.close()
+
+class LocalServerTransport:
+    """Relay through the stand-in in `app.cache.local_server`, for tests and local runs.
+
+    Listens on its own connection and reconnects if the server goes away.
+    """
+
+    def __init__(self, host: str, port: int, channel: str = CHANNEL, retry_seconds: float = 1.0):
+        self.host = host
+        self.port = port
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self._publisher = LocalServerBackend(host, port)
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed: Optional[asyncio.Event] = None
+
+    async def connect(self, deliver: Callable[[bytes], None]) -> None:
+        self._subscribed = asyncio.Event()
+        self._listener = asyncio.create_task(self._listen(deliver))
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Invalidation relay at %s:%s not reachable yet; retrying", self.host, self.port)
+
+    async def _listen(self, deliver: Callable[[bytes], None]) -> None:
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(f"SUB {self.channel}\n".encode("utf-8"))
+                await writer.drain()
+                await read_reply(reader)
+                self._subscribed.set()
+                while True:
+                    message = await read_reply(reader)
+                    if message is not None:
+                        deliver(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Lost invalidation relay at %s:%s: %s", self.host, self.port, e)
+                await asyncio.sleep(self.retry_seconds)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+    async def publish(self, message: bytes) -> None:
+        await self._publisher.publish(self.channel, message)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+
+def transport_from_url(url: Optional[str]) -> Optional[InvalidationTransport]:
+    """Build a transport from `postgresql://...`, `supabase://` (the project's Realtime) or
+    `local://host:port`; None keeps invalidations inside this process.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme in ("postgres", "postgresql"):
+        return PostgresNotifyTransport(url)
+    if parsed.scheme == "supabase":
+        supabase_url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+        if not supabase_url or not key:
+            raise ValueError("supabase:// invalidation needs SUPABASE_URL and SUPABASE_KEY")
+        return SupabaseRealtimeTransport(supabase_url, key)
+    if parsed.scheme == "local":
+        return LocalServerTransport(parsed.hostname or "127.0.0.1", parsed.port or 6390)
+    raise ValueError(f"Unsupported cache invalidation URL: {url}")
+
+class InvalidationBus:
+    """Announces writes to every worker and applies them to this worker's caches.
+
+    Writers call `publish(entity, *keys)` once the write is done. Handlers subscribed to
+    the entity run here at once and, through the transport, on every other worker. Each
+    event carries the time of the write as its version, so versioned caches refuse values
+    read before it no matter how late or out of order the event arrives. Without a
+    transport (a single worker) only the local handlers run.
+    """
+
+    def __init__(self, transport: Optional[InvalidationTransport] = None, worker_id: Optional[str] = None):
+        self.transport = transport
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._handlers: Dict[str, List[Callable[[InvalidationEvent], None]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls) -> InvalidationBus:
+        return cls(transport_from_url(os.getenv("CACHE_INVALIDATION_URL")))
+
+    def subscribe(self, entity: str, handler: Callable[[InvalidationEvent], None]) -> None:
+        self._handlers.setdefault(entity, []).append(handler)
+
+    async def start(self) -> None:
+        if self.transport is None:
+            return
+        self._loop = asyncio.get_running_loop()
+        try:
+            await self.transport.connect(self._deliver)
+            logger.info("📣 Cache invalidation bus connected (%s)", type(self.transport).__name__)
+        except Exception as e:
+            # Caches still expire on their TTLs; writes just aren't seen early elsewhere
+            logger.error("❌ Failed to connect cache invalidation bus: %s", e)
+
+    async def stop(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self.transport is not None:
+            try:
+                await self.transport.close()
+            except Exception as e:
+                logger.warning("⚠️ Failed to close cache invalidation bus: %s", e)
+        self._loop = None
+
+    def publish(self, entity: str, *keys: str, deleted: bool = False) -> Optional[float]:
+        """Apply a write to local caches now and send it to other workers; safe from any thread.
+
+        Returns the event's version, for callers caching a value read after the write.
+        """
+        if not keys:
+            return None
+        version = time.time()
+        keys = tuple(dict.fromkeys(keys))
+        for start in range(0, len(keys), MAX_KEYS_PER_EVENT):
+            event = InvalidationEvent(
+                entity=entity, keys=list(keys[start:start + MAX_KEYS_PER_EVENT]), version=version,
+                deleted=deleted, origin=self.worker_id,
+            )
+            self._apply(event)
+            if self.transport is not None and self._loop is not None:
+                self._loop.call_soon_threadsafe(self._send, event)
+        return version
+
+    def _send(self, event: InvalidationEvent) -> None:
+        task = asyncio.ensure_future(self._publish(event))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish(self, event: InvalidationEvent) -> None:
+        try:
+            await self.transport.publish(event.model_dump_json().encode("utf-8"))
+            cache_invalidations.inc(entity=event.entity, direction="sent")
+        except Exception as e:
+            cache_invalidations.inc(entity=event.entity, direction="failed")
+            logger.warning("⚠️ Failed to publish %s invalidation for %s: %s", event.entity, event.keys, e)
+
+    def _deliver(self, message: bytes) -> None:
+        try:
+            event = InvalidationEvent.model_validate_json(message)
+        except ValueError as e:
+            logger.warning("⚠️ Ignoring malformed invalidation message: %s", e)
+            return
+        if event.origin == self.worker_id:
+            return
+        cache_invalidations.inc(entity=event.entity, direction="received")
+        self._apply(event)
+
+    def _apply(self, event: InvalidationEvent) -> None:
+        for handler in self._handlers.get(event.entity, ()):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error("❌ Failed to apply %s invalidation for %s: %s", event.entity, event.keys, e)
+
+invalidation_bus = InvalidationBus.from_env()
@@ -0,0 +1,85 @@
+"""Stand-in for the shared cache tier: a single-process, in-memory key/value server that
+also relays published messages to subscribers, for the cache invalidation bus.
+
+    python -m app.cache.local_server --port 6390
+
+Point workers at it with e.g. RESTAURANT_CACHE_URL=local://127.0.0.1:6390 and
+CACHE_INVALIDATION_URL=local://127.0.0.1:6390. Not meant for production; use Redis and
+Postgres (or Supabase Realtime) there.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class LocalCacheServer:
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+        self._subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        channels: Set[str] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, *args = line.decode("utf-8").split()
+                if command == "GET":
+                    entry = self._entries.get(args[0])
+                    if entry is None or entry[0] <= time.monotonic():
+                        self._entries.pop(args[0], None)
+                        writer.write(b"$-1\n")
+                    else:
+                        writer.write(b"$%d\n" % len(entry[1]) + entry[1])
+                elif command == "SET":
+                    key, ttl, length = args[0], float(args[1]), int(args[2])
+                    value = await reader.readexactly(length)
+                    self._entries[key] = (time.monotonic() + ttl, value)
+                    writer.write(b"+OK\n")
+                elif command == "DEL":
+                    for key in args:
+                        self._entries.pop(key, None)
+                    writer.write(b"+OK\n")
+                elif command == "SUB":
+                    # From here on the connection receives `$<len>\n<bytes>` for each message
+                    channels.add(args[0])
+                    self._subscribers.setdefault(args[0], set()).add(writer)
+                    writer.write(b"+OK\n")
+                elif command == "PUB":
+                    channel, length = args[0], int(args[1])
+                    message = await reader.readexactly(length)
+                    for subscriber in list(self._subscribers.get(channel, ())):
+                        subscriber.write(b"$%d\n" % length + message)
+                    writer.write(b"+OK\n")
+                else:
+                    writer.write(f"-unknown command {command}\n".encode("utf-8"))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            for channel in channels:
+                self._subscribers.get(channel, set()).discard(writer)
+            writer.close()
+
+async def serve(host: str = "127.0.0.1", port: int = 6390) -> asyncio.AbstractServer:
+    server = await asyncio.start_server(LocalCacheServer().handle, host, port)
+    logger.info("✅ Local shared cache listening on %s:%s", host, port)
+    return server
+
+async def _main(host: str, port: int) -> None:
+    server = await serve(host, port)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the shared cache tier")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.host, args.port))
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Optional, Protocol
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+class SharedCacheBackend(Protocol):
+    """A byte-oriented cache shared by every worker process."""
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+class RedisBackend:
+    """Shared tier backed by Redis (requires the optional `redis` package)."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ValueError("redis:// cache URLs require the `redis` package") from e
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        await self._client.set(key, value, px=int(ttl_seconds * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*keys)
+
+class LocalServerBackend:
+    """Client for the stand-in cache process in `app.cache.local_server`.
+
+    Keeps one connection open and reconnects lazily; requests are serialized on it.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _request(self, header: str, payload: bytes = b"") -> Optional[bytes]:
+        async with self._lock:
+            try:
+                if self._writer is None or self._writer.is_closing():
+                    self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+                self._writer.write(header.encode("utf-8") + b"\n" + payload)
+                await self._writer.drain()
+                return await read_reply(self._reader)
+            except Exception:
+                # Drop the connection so the next request starts clean
+                if self._writer is not None:
+                    self._writer.close()
+                self._reader = self._writer = None
+                raise
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._request(f"GET {key}")
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        await self._request(f"SET {key} {ttl_seconds} {len(value)}", value)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._request("DEL " + " ".join(keys))
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        """Relay `message` to every connection subscribed to `channel`."""
+        await self._request(f"PUB {channel} {len(message)}", message)
+
+async def read_reply(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """Read a `$<len>\\n<bytes>`, `$-1` (nil) or `+OK` reply."""
+    line = (await reader.readline()).decode("utf-8").strip()
+    if line.startswith("+"):
+        return None
+    if line.startswith("-"):
+        raise RuntimeError(f"Shared cache error: {line[1:]}")
+    if not line.startswith("$"):
+        raise RuntimeError(f"Unexpected shared cache reply: {line!r}")
+    length = int(line[1:])
+    if length < 0:
+        return None
+    return await reader.readexactly(length)
+
+def backend_from_url(url: Optional[str]) -> Optional[SharedCacheBackend]:
+    """Build a shared backend from `redis://...` or `local://host:port`; None disables the tier."""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme in ("redis", "rediss"):
+        return RedisBackend(url)
+    if parsed.scheme == "local":
+        return LocalServerBackend(parsed.hostname or "127.0.0.1", parsed.port or 6390)
+    raise ValueError(f"Unsupported shared cache URL: {url}")
@@ -0,0 +1,43 @@
+from __future__ import annotations
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller (leader) starts the work as its own task; callers arriving while it
+    runs (followers) await the same task. Cancelling any single caller never cancels the
+    shared work for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    @property
+    def coalescing_ratio(self) -> float:
+        """Fraction of calls that were served by another caller's execution."""
+        total = self.leaders + self.followers
+        return self.followers / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": len(self._inflight),
+            "coalescing_ratio": self.coalescing_ratio,
+        }
@@ -0,0 +1,90 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+class TTLCache(Generic[V]):
+    """Thread-safe in-process cache with per-entry expiry and optional LRU size bound.
+
+    Entries may carry a version (when the data was read, as a timestamp). A versioned
+    invalidation drops older entries and leaves a floor behind, so a value read before
+    the write it announces can't be stored afterwards, whatever order things arrive in.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, Tuple[float, V, Optional[float]]] = OrderedDict()
+        # key -> (expires_at, version): the oldest version still allowed in
+        self._floors: OrderedDict[Hashable, Tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V, ttl_seconds: Optional[float] = None,
+            version: Optional[float] = None) -> bool:
+        """Store `value`; returns False if `version` predates an invalidation of `key`."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            now = self._clock()
+            floor = self._floors.get(key)
+            if floor is not None and floor[0] > now and version is not None and version < floor[1]:
+                return False
+            self._entries[key] = (now + ttl, value, version)
+            self._entries.move_to_end(key)
+            if self.max_size is not None:
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, key: Hashable, version: Optional[float] = None) -> None:
+        """Drop `key`. With a version, only an entry read before it, and keep older ones out."""
+        with self._lock:
+            if version is None:
+                self._entries.pop(key, None)
+                return
+            entry = self._entries.get(key)
+            if entry is not None and (entry[2] is None or entry[2] < version):
+                del self._entries[key]
+            now = self._clock()
+            floor = self._floors.get(key)
+            if floor is None or floor[0] <= now or floor[1] < version:
+                # Past the TTL a value read before the write would have expired anyway
+                self._floors[key] = (now + self.ttl_seconds, version)
+                self._floors.move_to_end(key)
+                if self.max_size is not None:
+                    while len(self._floors) > self.max_size:
+                        self._floors.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._floors.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
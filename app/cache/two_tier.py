@@ -0,0 +1,95 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Callable, Generic, Optional, TypeVar
+from .shared_cache import SharedCacheBackend
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+class TwoTierCache(Generic[V]):
+    """In-process LRU/TTL tier in front of an optional shared tier.
+
+    The shared tier is best effort: its failures are logged and treated as misses, so a
+    cache outage never fails a request.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        local: TTLCache[V],
+        shared: Optional[SharedCacheBackend],
+        encode: Callable[[V], bytes],
+        decode: Callable[[bytes], V],
+        shared_ttl_seconds: float = 300,
+    ):
+        self.namespace = namespace
+        self.local = local
+        self.shared = shared
+        self._encode = encode
+        self._decode = decode
+        self.shared_ttl_seconds = shared_ttl_seconds
+        self.shared_hits = 0
+        self._pending = set()  # keeps fire-and-forget invalidations alive until done
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[V]:
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        version = time.time()
+        try:
+            raw = await self.shared.get(self._key(key))
+        except Exception as e:
+            logger.warning("⚠️ Shared cache get failed for %s: %s", key, e)
+            return None
+        if raw is None:
+            return None
+        value = self._decode(raw)
+        self.local.set(key, value, version=version)
+        self.shared_hits += 1
+        return value
+
+    async def set(self, key: str, value: V, version: Optional[float] = None) -> None:
+        """Store `value`, read at `version` (a timestamp); values older than an invalidation are dropped."""
+        if not self.local.set(key, value, version=version):
+            return
+        if self.shared is None:
+            return
+        try:
+            await self.shared.set(self._key(key), self._encode(value), self.shared_ttl_seconds)
+        except Exception as e:
+            logger.warning("⚠️ Shared cache set failed for %s: %s", key, e)
+
+    async def invalidate(self, *keys: str, version: Optional[float] = None) -> None:
+        self.invalidate_local(*keys, version=version)
+        if self.shared is None or not keys:
+            return
+        try:
+            await self.shared.delete(*(self._key(key) for key in keys))
+        except Exception as e:
+            logger.warning("⚠️ Shared cache invalidation failed for %s: %s", keys, e)
+
+    def invalidate_local(self, *keys: str, version: Optional[float] = None) -> None:
+        """Invalidate this process's tier only, e.g. for a write another worker announced."""
+        for key in keys:
+            self.local.invalidate(key, version=version)
+
+    def invalidate_nowait(self, *keys: str, version: Optional[float] = None) -> None:
+        """Invalidate from synchronous code: local tier now, shared tier on the running loop."""
+        self.invalidate_local(*keys, version=version)
+        if self.shared is None or not keys:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning("⚠️ No event loop to invalidate shared cache for %s", keys)
+            return
+        task = loop.create_task(self.invalidate(*keys, version=version))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
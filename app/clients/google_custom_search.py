@@ -1,9 +1,9 @@
 import os
 from typing import List
-import httpx
-from dotenv import load_dotenv
+from .http import upstream_client
+import logging
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 class GoogleCustomImageSearch:
     def __init__(self):
@@ -14,7 +14,7 @@ class GoogleCustomImageSearch:
                 "GOOGLE_API_KEY and GOOGLE_SEARCH_ENGINE_ID must be set in .env file"
             )
         
-        self.base_url = "https://www.googleapis.com/customsearch/v1"
+        self.base_url = os.getenv("GOOGLE_SEARCH_BASE_URL", "https://www.googleapis.com/customsearch/v1")
 
     async def search_images(self, query: str, num: int = 1) -> List[str]:
         """
@@ -27,7 +27,7 @@ class GoogleCustomImageSearch:
         Returns:
             List of image URLs
         """
-        print(f"🔍 Searching for images for query: {query}")
+        logger.info("🔍 Searching for images for query: %s", query)
         
         # Ensure num is within API limits (1-10)
         num = max(1, min(num, 10))
@@ -46,29 +46,26 @@ class GoogleCustomImageSearch:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
+            async with upstream_client("google") as client:
                 response = await client.get(self.base_url, params=params)
                 
                 if response.status_code != 200:
-                    print(f"❌ API request failed: {response.status_code}")
-                    print(f"Error: {response.text}")
+                    logger.error("❌ API request failed: %s", response.status_code)
+                    logger.error("Error: %s", response.text)
                     return []
 
                 data = response.json()
                 
                 if "items" not in data:
-                    print("❌ No images found")
+                    logger.error("❌ No images found")
                     return []
 
                 # Extract image URLs from the response
                 image_urls = [item["link"] for item in data["items"][:num]]
                 
-                print(f"✅ Found {len(image_urls)} images for query: {query}")
+                logger.info("✅ Found %s images for query: %s", len(image_urls), query)
                 return image_urls
 
         except Exception as e:
-            print(f"❌ Error searching for images: {str(e)}")
+            logger.error("❌ Error searching for images: %s", e)
             return []
-
-# Create singleton instance
-image_search = GoogleCustomImageSearch()
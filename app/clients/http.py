@@ -0,0 +1,54 @@
+from __future__ import annotations
+import time
+from typing import Optional
+import httpx
+from app.metrics import observe_upstream
+from app.tracing import open_span, start_span
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Records latency and outcome of every outbound request under an upstream name."""
+
+    def __init__(self, upstream: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.upstream = upstream
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with start_span(f"{self.upstream} {request.method} {request.url.path}",
+                        upstream=self.upstream) as span:
+            start = time.perf_counter()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except Exception:
+                observe_upstream(self.upstream, time.perf_counter() - start)
+                raise
+            observe_upstream(self.upstream, time.perf_counter() - start, response.status_code)
+            if span is not None:
+                span.set_attribute("status", response.status_code)
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+def upstream_client(upstream: str, **kwargs) -> httpx.AsyncClient:
+    """An AsyncClient whose requests are recorded under `upstream` in the metrics."""
+    return httpx.AsyncClient(transport=InstrumentedTransport(upstream), **kwargs)
+
+def instrument_sync_client(client: httpx.Client, upstream: str) -> None:
+    """Record request latency and trace spans for an existing sync client (e.g. the Supabase session)."""
+    def on_request(request: httpx.Request) -> None:
+        request.extensions["upstream_start"] = time.perf_counter()
+        request.extensions["upstream_span"] = open_span(
+            f"{upstream} {request.method} {request.url.path}", upstream=upstream
+        )
+
+    def on_response(response: httpx.Response) -> None:
+        start = response.request.extensions.get("upstream_start")
+        if start is not None:
+            observe_upstream(upstream, time.perf_counter() - start, response.status_code)
+        span = response.request.extensions.get("upstream_span")
+        if span is not None:
+            span.set_attribute("status", response.status_code)
+            span.finish()
+
+    client.event_hooks["request"].append(on_request)
+    client.event_hooks["response"].append(on_response)
@@ -1,10 +1,25 @@
+from __future__ import annotations
+import json
 import os
-from typing import Dict, List, Optional, Any
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Tuple
 import logging
+from .http import instrument_sync_client
+from .vapi import to_e164
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# One underlying client (and connection pool) per project, shared by every SupabaseClient
+_clients: Dict[Tuple[str, str], "Client"] = {}
+_clients_lock = threading.Lock()
+
+def _quote(value: str) -> str:
+    """A filter value quoted for PostgREST lists and or=(...), so commas and colons survive."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
 class SupabaseClient:
     RESTAURANTS_TABLE_NAME = 'restaurants'
     OPERATING_HOURS_TABLE_NAME = 'operating_hours' 
@@ -12,7 +27,23 @@ class SupabaseClient:
     def __init__(self):
         self.supabase_url = os.getenv("SUPABASE_URL")
         self.supabase_key = os.getenv("SUPABASE_KEY")
-        
+
+    @property
+    def client(self) -> "Client":
+        """The supabase-py client, created on first use so importing the app needs no credentials."""
+        return self.connect()
+
+    def connect(self) -> "Client":
+        """The project's shared client, created now if no SupabaseClient has yet."""
+        key = (self.supabase_url, self.supabase_key)
+        client = _clients.get(key)
+        if client is None:
+            with _clients_lock:
+                client = _clients.get(key) or self._connect()
+                _clients[key] = client
+        return client
+
+    def _connect(self) -> "Client":
         # Log environment state (without exposing sensitive values)
         logger.info("🔧 Supabase Configuration:", extra={
             "has_url": bool(self.supabase_url),
@@ -22,105 +53,173 @@ class SupabaseClient:
         
         if not self.supabase_url or not self.supabase_key:
             error_msg = "Missing Supabase configuration. Ensure SUPABASE_URL and SUPABASE_KEY are set in environment variables."
-            logger.error(f"❌ {error_msg}")
+            logger.error("❌ %s", error_msg)
             raise ValueError(error_msg)
             
         try:
-            self.client = create_client(self.supabase_url, self.supabase_key)
-            logger.info(f"✅ Connected to Supabase")
+            # Imported here: the supabase package alone takes a noticeable share of startup
+            from supabase import create_client
+            client = create_client(self.supabase_url, self.supabase_key)
+            instrument_sync_client(client.postgrest.session, "supabase")
+            logger.info("✅ Connected to Supabase")
+            return client
         except Exception as e:
-            logger.error(f"❌ Failed to initialize Supabase client: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to initialize Supabase client: %s", e, exc_info=True)
             raise
         
     def store_restaurant(self, restaurant_data: Dict) -> bool:
         """Store a restaurant in Supabase."""
         try:
-            logger.info(f"💾 Storing restaurant: {restaurant_data.get('name', 'Unknown')}")
+            logger.info("💾 Storing restaurant: %s", restaurant_data.get('name', 'Unknown'))
             self.client.table(self.RESTAURANTS_TABLE_NAME).upsert(restaurant_data).execute()
             logger.info("✅ Restaurant stored successfully")
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to store restaurant: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to store restaurant: %s", e, exc_info=True)
             raise
             
-    def get_restaurant(self, business_id: str) -> Optional[Dict]:
+    def get_restaurant(self, business_id: str, columns: str = "*") -> Optional[Dict]:
         """Get a restaurant by business ID."""
         try:
-            logger.info(f"🔍 Getting restaurant with ID: {business_id}")
-            response = self.client.table(self.RESTAURANTS_TABLE_NAME).select("*").eq('business_id', business_id).execute()
+            logger.info("🔍 Getting restaurant with ID: %s", business_id)
+            response = self.client.table(self.RESTAURANTS_TABLE_NAME).select(columns).eq('business_id', business_id).execute()
             if response.data:
                 logger.info("✅ Found restaurant")
             else:
                 logger.warning("⚠️ Restaurant not found")
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"❌ Failed to get restaurant: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to get restaurant: %s", e, exc_info=True)
             raise
             
     def get_restaurants(self, limit: Optional[int] = None) -> List[Dict]:
         """Get restaurants from Supabase."""
         try:
-            logger.info(f"🔍 Fetching restaurants from Supabase (limit={limit})")
+            logger.info("🔍 Fetching restaurants from Supabase (limit=%s)", limit)
             query = self.client.table(self.RESTAURANTS_TABLE_NAME).select("*")
             if limit:
                 query = query.limit(limit)
             response = query.execute()
-            logger.info(f"✅ Found {len(response.data)} restaurants")
+            logger.info("✅ Found %s restaurants", len(response.data))
             return response.data
         except Exception as e:
-            logger.error(f"❌ Failed to get restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to get restaurants: %s", e, exc_info=True)
             raise
             
+    def get_restaurants_after(self, after_business_id: Optional[str], chunk_size: int) -> List[Dict]:
+        """Get the next chunk of restaurants ordered by business_id (keyset pagination)."""
+        try:
+            query = self.client.table(self.RESTAURANTS_TABLE_NAME).select("*").order('business_id')
+            if after_business_id is not None:
+                query = query.gt('business_id', after_business_id)
+            response = query.limit(chunk_size).execute()
+            return response.data
+        except Exception as e:
+            logger.error("❌ Failed to get restaurant chunk: %s", e, exc_info=True)
+            raise
+
+    def get_restaurants_updated_after(
+        self, after_updated_at: str, after_business_id: Optional[str], chunk_size: int
+    ) -> List[Dict]:
+        """Get the next chunk of restaurants ordered by (updated_at, business_id) after the given position.
+
+        Rows sharing a timestamp (one bulk upsert) are paged by business_id, so two plain
+        filters stand in for a row comparison PostgREST can't express.
+        """
+        try:
+            table = self.client.table(self.RESTAURANTS_TABLE_NAME)
+            rows: List[Dict] = []
+            if after_business_id is not None:
+                rows = table.select("*").eq("updated_at", after_updated_at)\
+                    .gt("business_id", after_business_id)\
+                    .order("business_id").limit(chunk_size).execute().data
+            if len(rows) < chunk_size:
+                rows += table.select("*").gt("updated_at", after_updated_at)\
+                    .order("updated_at").order("business_id")\
+                    .limit(chunk_size - len(rows)).execute().data
+            return rows
+        except Exception as e:
+            logger.error("❌ Failed to get updated restaurants: %s", e, exc_info=True)
+            raise
+
+    def get_restaurants_by_ids(self, business_ids: List[str], columns: str = "*") -> List[Dict]:
+        """Get the stored restaurants among `business_ids`, in no particular order."""
+        if not business_ids:
+            return []
+        try:
+            response = self.client.table(self.RESTAURANTS_TABLE_NAME)\
+                .select(columns)\
+                .in_('business_id', business_ids)\
+                .execute()
+            return response.data
+        except Exception as e:
+            logger.error("❌ Failed to get %s restaurants by id: %s", len(business_ids), e, exc_info=True)
+            raise
+
     def get_all_restaurants(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get all restaurants from the database."""
         try:
             logger.info("🔍 Fetching restaurants from Supabase...")
             query = self.client.table('restaurants').select('*')
             if limit:
-                logger.info(f"📊 Limiting to {limit} results")
+                logger.info("📊 Limiting to %s results", limit)
                 query = query.limit(limit)
-            logger.info("🚀 Executing query...")
+            logger.debug("🚀 Executing query...")
             response = query.execute()
             restaurants = response.data
-            logger.info(f"✅ Found {len(restaurants)} restaurants")
+            logger.info("✅ Found %s restaurants", len(restaurants))
             if restaurants:
-                logger.info("📝 Example restaurant:", restaurants[0])
+                logger.debug("📝 Example restaurant: %s", restaurants[0])
             return restaurants
         except Exception as e:
-            logger.error(f"❌ Error fetching restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Error fetching restaurants: %s", e, exc_info=True)
             raise
             
+    def search_by_phone(self, phone: str) -> List[Dict]:
+        """Get stored restaurants reachable at a phone number, in any formatting."""
+        try:
+            query = self.client.table(self.RESTAURANTS_TABLE_NAME).select("*")
+            try:
+                query = query.eq('phone_e164', to_e164(phone))
+            except ValueError:
+                query = query.eq('phone', phone)
+            response = query.execute()
+            return response.data
+        except Exception as e:
+            logger.error("❌ Failed to search restaurants by phone: %s", e, exc_info=True)
+            raise
+
     def update_restaurant(self, business_id: str, data: Dict) -> bool:
         """Update a restaurant's information."""
         try:
-            logger.info(f"🔄 Updating restaurant with ID: {business_id}")
+            logger.info("🔄 Updating restaurant with ID: %s", business_id)
             self.client.table(self.RESTAURANTS_TABLE_NAME).update(data).eq('business_id', business_id).execute()
             logger.info("✅ Restaurant updated successfully")
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to update restaurant: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to update restaurant: %s", e, exc_info=True)
             raise
             
     def delete_restaurant(self, business_id: str) -> bool:
         """Delete a restaurant."""
         try:
-            logger.info(f"🚮 Deleting restaurant with ID: {business_id}")
+            logger.info("🚮 Deleting restaurant with ID: %s", business_id)
             self.client.table(self.RESTAURANTS_TABLE_NAME).delete().eq('business_id', business_id).execute()
             logger.info("✅ Restaurant deleted successfully")
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to delete restaurant: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to delete restaurant: %s", e, exc_info=True)
             raise
             
     def bulk_upsert_restaurants(self, restaurants: List[Dict]) -> bool:
         """Bulk upsert restaurants."""
         try:
-            logger.info(f"💾 Bulk upserting {len(restaurants)} restaurants")
+            logger.info("💾 Bulk upserting %s restaurants", len(restaurants))
             self.client.table(self.RESTAURANTS_TABLE_NAME).upsert(restaurants).execute()
             logger.info("✅ Restaurants bulk upserted successfully")
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to bulk upsert restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to bulk upsert restaurants: %s", e, exc_info=True)
             raise
 
     def get_restaurants_without_hours(self) -> List[Dict]:
@@ -132,45 +231,65 @@ class SupabaseClient:
 
             query = self.client.table(self.RESTAURANTS_TABLE_NAME).select("*").eq('is_hours_verified', False).order('created_at')
             response = query.execute()
-            logger.info("🚀 Executing query...")
-            logger.info(f"✅ Found {len(response.data)} restaurants without hours")
+            logger.debug("🚀 Executing query...")
+            logger.info("✅ Found %s restaurants without hours", len(response.data))
             return response.data
         except Exception as e:
-            logger.error(f"❌ Error fetching restaurants without hours: {str(e)}", exc_info=True)
+            logger.error("❌ Error fetching restaurants without hours: %s", e, exc_info=True)
             raise
 
     def search_restaurants(
         self,
         term: Optional[str] = None,
         location: Optional[str] = None,
-        price: Optional[str] = None,
-        categories: Optional[List[str]] = None
+        prices: Optional[List[str]] = None,
+        categories: Optional[List[str]] = None,
+        open_now: Optional[bool] = None,
+        by_rating: bool = True,
+        offset: int = 0,
+        limit: Optional[int] = None,
     ) -> List[Dict]:
-        """Search restaurants in Supabase."""
+        """Search restaurants in Supabase, a page at a time.
+
+        `prices` are stored values ('$$'); `categories` match the business type or any
+        category alias, both stored lowercase as Yelp gives them.
+        """
         try:
-            logger.info(f"🔍 Searching restaurants with term='{term}' location='{location}' categories={categories}")
+            logger.info("🔍 Searching restaurants with term='%s' location='%s' categories=%s", term, location, categories)
             
             # Start with a base query
             query = self.client.table(self.RESTAURANTS_TABLE_NAME).select("*")
             
             # Add filters one by one
             if term:
-                # Search in both name and categories using OR
                 query = query.ilike("name", f"%{term}%")
             if location:
                 query = query.ilike("location->>city", f"%{location}%")
-            if price:
-                query = query.eq("price", price)
-            if categories and len(categories) > 0:
-                query = query.eq("business_type", categories[0])
+            if prices is not None:
+                query = query.in_("price", prices)
+            wanted = sorted({c.strip().lower() for c in categories or [] if c and c.strip()})
+            if wanted:
+                query = query.or_(",".join(
+                    [f"business_type.in.({','.join(_quote(c) for c in wanted)})"]
+                    + [f"categories.cs.{_quote(json.dumps([{'alias': c}], separators=(',', ':')))}" for c in wanted]
+                ))
+            if open_now:
+                query = query.eq("is_open", True).not_.is_("is_closed", "true")
+            if by_rating:
+                query = query.order("rating", desc=True, nullsfirst=False)
+            query = query.order("business_id")
+            if limit:
+                query = query.range(offset, offset + limit - 1)
+            elif offset:
+                query = query.offset(offset)
             
-            logger.info("🚀 Executing query...")
+            logger.debug("🚀 Executing query...")
             response = query.execute()
-            logger.info(f"✅ Found {len(response.data)} restaurants")
+            logger.info("✅ Found %s restaurants", len(response.data))
             return response.data
             
         except Exception as e:
-            logger.error(f"❌ Failed to search restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to search restaurants: %s", e, exc_info=True)
             raise Exception(f"Failed to search restaurants: {str(e)}")
             
     async def search_restaurants_async(
@@ -182,7 +301,7 @@ class SupabaseClient:
     ) -> List[Dict]:
         """Search for restaurants in Supabase."""
         try:
-            logger.info(f"\n🔍 Searching restaurants with term='{term}' location='{location}' categories={categories}")
+            logger.info("\n🔍 Searching restaurants with term='%s' location='%s' categories=%s", term, location, categories)
             
             # Start with base query
             query = self.client.table(self.RESTAURANTS_TABLE_NAME).select("*")
@@ -198,11 +317,11 @@ class SupabaseClient:
             if categories and len(categories) > 0:
                 query = query.eq("business_type", categories[0])
             
-            logger.info("🚀 Executing query...")
+            logger.debug("🚀 Executing query...")
             response = await query.execute()
-            logger.info(f"✅ Found {len(response.data)} restaurants")
+            logger.info("✅ Found %s restaurants", len(response.data))
             return response.data
             
         except Exception as e:
-            logger.error(f"❌ Failed to search restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to search restaurants: %s", e, exc_info=True)
             raise
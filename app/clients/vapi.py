@@ -1,12 +1,79 @@
 from __future__ import annotations
-from typing import AsyncGenerator, Dict, Any
-import httpx
+from datetime import datetime, timezone
+from typing import AsyncGenerator, Dict, Any, List, Optional
+from .http import upstream_client
+from ..models.base import WEEKDAYS
+import json
 import os
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+def to_e164(phone_number: str) -> str:
+    """Normalize a US phone number to E.164 (+1XXXXXXXXXX); calls are keyed by this."""
+    # Remove any non-digit characters
+    digits = re.sub(r'\D', '', phone_number or '')
+
+    # Handle 10-digit numbers
+    if len(digits) == 10:
+        digits = f"1{digits}"
+
+    # Ensure it's 11 digits
+    if len(digits) != 11:
+        raise ValueError("Phone number must be 10 or 11 digits")
+
+    return f"+{digits}"
+
+_INTERVALS_SCHEMA = {
+    "type": "array",
+    "description": "Open periods for the day, empty if closed all day",
+    "items": {
+        "type": "object",
+        "properties": {
+            "time_open": {"type": "string", "description": "Opening time, e.g. 09:00 or 9am"},
+            "time_closed": {"type": "string", "description": "Closing time, e.g. 22:00 or 10pm"},
+        },
+        "required": ["time_open", "time_closed"],
+    },
+}
+
+# What the assistant extracts from a call, sent with every call so the keys always match
+# what app.services.hours_check reads (and StructuredHours.from_analysis for the schedule)
+STRUCTURED_DATA_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "time_open": {"type": "string", "description": "Today's opening time"},
+        "time_closed": {"type": "string", "description": "Today's closing time"},
+        "is_open": {"type": "boolean", "description": "Whether the restaurant is open today"},
+        "withdrawing_consent": {
+            "type": "boolean", "description": "Whether they asked not to be called again",
+        },
+        "weekly_hours": {
+            "type": "object",
+            "description": "Regular hours for each weekday mentioned",
+            "properties": dict.fromkeys(WEEKDAYS, _INTERVALS_SCHEMA),
+        },
+        "holiday_hours": {
+            "type": "array",
+            "description": "Dates with different hours than usual, such as holidays",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string", "description": "The date, as YYYY-MM-DD"},
+                    "name": {"type": "string", "description": "The holiday or event, if given"},
+                    "is_closed": {"type": "boolean", "description": "Closed all day"},
+                    "intervals": _INTERVALS_SCHEMA,
+                },
+                "required": ["date", "is_closed"],
+            },
+        },
+    },
+}
+
+def _vapi_timestamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
 class VAPIClient:
     def __init__(self):
         self.api_key = os.getenv("VAPI_API_KEY")
@@ -14,7 +81,23 @@ class VAPIClient:
             logger.error("❌ VAPI_API_KEY not found in environment variables")
             raise ValueError("VAPI_API_KEY not found in environment variables")
             
-        self.base_url = "https://api.vapi.ai"  # Replace with actual VAPI base URL
+        self.base_url = os.getenv("VAPI_API_BASE_URL", "https://api.vapi.ai")
+        # Polling cadence while waiting for a call to end (seconds)
+        self.poll_initial_delay = float(os.getenv("VAPI_POLL_INITIAL_DELAY", "15"))
+        self.poll_interval = float(os.getenv("VAPI_POLL_INTERVAL", "5"))
+        # The poller checks most often around the expected end of a call and backs off
+        # to at most VAPI_MAX_POLL_INTERVAL before and after it
+        self.expected_call_seconds = float(os.getenv("VAPI_EXPECTED_CALL_SECONDS", "90"))
+        self.max_poll_interval = float(os.getenv("VAPI_MAX_POLL_INTERVAL", "60"))
+        self.phone_number_id = os.getenv("VAPI_PHONE_NUMBER_ID")
+        # With a webhook configured VAPI pushes call events to us, and polling only backs it up
+        self.webhook_url = os.getenv("VAPI_WEBHOOK_URL")
+        self.webhook_secret = os.getenv("VAPI_WEBHOOK_SECRET")
+        self.fallback_poll_interval = float(os.getenv("VAPI_FALLBACK_POLL_INTERVAL", "60"))
+        # With a webhook, live transcripts are parsed as the call goes and the assistant
+        # wraps up once hours and consent are heard with at least this confidence
+        self.early_end = os.getenv("VAPI_EARLY_END", "true").lower() in ("1", "true", "yes")
+        self.early_end_confidence = float(os.getenv("VAPI_EARLY_END_CONFIDENCE", "0.85"))
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -23,58 +106,69 @@ class VAPIClient:
 
     def _format_phone_number(self, phone_number: str) -> str:
         """Format phone number to E.164 format (+1XXXXXXXXXX)."""
-        # Remove any non-digit characters
-        digits = re.sub(r'\D', '', phone_number)
-        
-        # Handle 10-digit numbers
-        if len(digits) == 10:
-            digits = f"1{digits}"
-            
-        # Ensure it's 11 digits
-        if len(digits) != 11:
-            raise ValueError("Phone number must be 10 or 11 digits")
-            
-        # Add + if not present
-        if not phone_number.startswith('+'):
-            return f"+{digits}"
-        
-        return phone_number
+        return to_e164(phone_number)
+
+    async def make_call(self, phone_number: str, message: str = "This is a test call from Hungry Monkey",
+                        idempotency_key: Optional[str] = None) -> str:
+        """Make a call using VAPI.
 
-    async def make_call(self, phone_number: str, message: str = "This is a test call from Hungry Monkey") -> str:
-        """Make a call using VAPI."""
+        `idempotency_key` is sent as Idempotency-Key so a create retried after a timeout
+        doesn't place a second call.
+        """
         # Format the phone number
         formatted_number = self._format_phone_number(phone_number)
-        print(f"Formatted phone number: {formatted_number}") 
-        async with httpx.AsyncClient() as client:
+        logger.debug("Formatted phone number: %s", formatted_number)
+        async with upstream_client("vapi") as client:
             try:
+                payload = {
+                    "name": "Test Call",
+                    "phoneNumberId": os.getenv("VAPI_PHONE_NUMBER_ID"),
+                    "customer": {"number": formatted_number},
+                    "assistantId": os.getenv("VAPI_ASSISTANT_ID")  # Make sure to add this to your .env file
+                }
+                overrides: Dict[str, Any] = {
+                    "analysisPlan": {"structuredDataSchema": STRUCTURED_DATA_SCHEMA}
+                }
+                if self.webhook_url:
+                    overrides.update(self._webhook_overrides())
+                payload["assistantOverrides"] = overrides
+                headers = self.headers
+                if idempotency_key:
+                    headers = {**headers, "Idempotency-Key": idempotency_key}
                 response = await client.post(
                     f"{self.base_url}/call",
-                    headers=self.headers,
-                    json={
-                        "name": "Test Call",
-                        "phoneNumberId": os.getenv("VAPI_PHONE_NUMBER_ID"),
-                        "customer": {"number": formatted_number},
-                        "assistantId": os.getenv("VAPI_ASSISTANT_ID")  # Make sure to add this to your .env file
-                    }
+                    headers=headers,
+                    json=payload
                 )
-                print(f"Response status: {response.status_code}")
+                logger.debug("Response status: %s", response.status_code)
                 
                 if response.status_code == 201:
                     data = response.json()
-                    print(f"Call successfully created: {data}")
+                    logger.info("Call successfully created: %s", data)
                     return data.get("id")  # VAPI typically returns 'id' rather than 'call_id'
                 elif response.status_code == 200:
                     data = response.json()
-                    print(f"Call successful: {data}")
+                    logger.info("Call successful: %s", data)
                     return data.get("id")
                 else:
                     raise Exception(f"VAPI call failed with status {response.status_code}: {response.text}")
             except Exception as e:
                 raise Exception(f"Failed to make call: {str(e)}")
 
+    def _webhook_overrides(self) -> Dict[str, Any]:
+        """Point the call's server messages at /api/vapi/webhook."""
+        server: Dict[str, Any] = {"url": self.webhook_url}
+        if self.webhook_secret:
+            server["secret"] = self.webhook_secret
+        overrides: Dict[str, Any] = {"server": server, "serverMessages": ["status-update", "end-of-call-report"]}
+        if self.early_end:
+            overrides["serverMessages"].append("transcript")
+            overrides["monitorPlan"] = {"controlEnabled": True}
+        return overrides
+
     async def stream_conversation(self, conversation_id: str) -> AsyncGenerator[Dict[str, Any], None]:
         """Stream conversation data from VAPI."""
-        async with httpx.AsyncClient() as client:
+        async with upstream_client("vapi") as client:
             try:
                 response = await client.get(
                     f"{self.base_url}/stream/{conversation_id}",
@@ -84,18 +178,43 @@ class VAPIClient:
                     raise Exception(f"Failed to stream conversation: {response.text}")
                 
                 async for line in response.aiter_lines():
-                    if line:
-                        yield self._parse_stream_data(line)
+                    message = self._parse_stream_data(line) if line else None
+                    if message is not None:
+                        yield message
             except Exception as e:
                 raise Exception(f"Failed to stream conversation: {str(e)}")
 
-    def _parse_stream_data(self, data: str) -> Dict[str, Any]:
-        """Parse streaming data from VAPI."""
-        return data
+    def _parse_stream_data(self, data: str) -> Optional[Dict[str, Any]]:
+        """Parse one streamed line (bare JSON or an SSE 'data:' line) into a message."""
+        data = data.strip()
+        if data.startswith("data:"):
+            data = data[len("data:"):].strip()
+        if not data or data == "[DONE]" or data.startswith(("event:", "id:", ":")):
+            return None
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.debug("Skipping non-JSON stream line: %s", data[:200])
+            return None
+        return message if isinstance(message, dict) else None
+
+    async def control_call(self, control_url: str, payload: Dict[str, Any]) -> None:
+        """Send a Live Call Control message to a call in progress (its monitor.controlUrl)."""
+        async with upstream_client("vapi") as client:
+            try:
+                response = await client.post(control_url, headers=self.headers, json=payload)
+                if response.status_code >= 300:
+                    raise Exception(f"VAPI control failed with status {response.status_code}: {response.text}")
+            except Exception as e:
+                raise Exception(f"Failed to control call: {str(e)}")
+
+    async def wrap_up_call(self, control_url: str, message: str) -> None:
+        """Have the assistant say `message` and hang up once it has been spoken."""
+        await self.control_call(control_url, {"type": "say", "content": message, "endCallAfterSpoken": True})
 
     async def send_message(self, conversation_id: str, message: str) -> Dict[str, Any]:
         """Send a message to VAPI."""
-        async with httpx.AsyncClient() as client:
+        async with upstream_client("vapi") as client:
             try:
                 response = await client.post(
                     f"{self.base_url}/conversations/{conversation_id}/messages",
@@ -106,15 +225,46 @@ class VAPIClient:
             except Exception as e:
                 raise Exception(f"Failed to send message: {str(e)}")
 
+    async def get_call(self, call_id: str) -> Dict[str, Any]:
+        """Fetch a call; the same response carries its status and, once ended, its analysis."""
+        async with upstream_client("vapi") as client:
+            try:
+                response = await client.get(
+                    f"{self.base_url}/call/{call_id}",
+                    headers=self.headers
+                )
+                if response.status_code != 200:
+                    raise Exception(f"Failed to get call: {response.text}")
+                return response.json()
+            except Exception as e:
+                raise Exception(f"Failed to get call: {str(e)}")
+
+    async def list_calls(self, updated_after: datetime, limit: int = 100,
+                         updated_until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Calls updated after `updated_after` (and at or before `updated_until`), newest first, each a full call record."""
+        params: Dict[str, Any] = {"updatedAtGt": _vapi_timestamp(updated_after), "limit": limit}
+        if updated_until is not None:
+            params["updatedAtLe"] = _vapi_timestamp(updated_until)
+        if self.phone_number_id:
+            params["phoneNumberId"] = self.phone_number_id
+        async with upstream_client("vapi") as client:
+            try:
+                response = await client.get(f"{self.base_url}/call", params=params, headers=self.headers)
+                if response.status_code != 200:
+                    raise Exception(f"Failed to list calls: {response.text}")
+                return response.json()
+            except Exception as e:
+                raise Exception(f"Failed to list calls: {str(e)}")
+
     async def get_call_status(self, call_id: str) -> str:
         """Get the status of a call."""
-        async with httpx.AsyncClient() as client:
+        async with upstream_client("vapi") as client:
             try:
                 response = await client.get(
                     f"{self.base_url}/call/{call_id}",
                     headers=self.headers
                 )
-                print(f"Response status: {response.status_code}")
+                logger.debug("Response status: %s", response.status_code)
                 # print(f"Response content: {response.text}") 
                 if response.status_code != 200:
                     raise Exception(f"Failed to get call status: {response.text}")
@@ -125,7 +275,7 @@ class VAPIClient:
 
     async def get_call_analysis(self, call_id: str) -> Dict[str, Any]:
         """Get the analysis of a completed call."""
-        async with httpx.AsyncClient() as client:
+        async with upstream_client("vapi") as client:
             try:
                 response = await client.get(
                     f"{self.base_url}/call/{call_id}",
@@ -139,39 +289,41 @@ class VAPIClient:
             except Exception as e:
                 raise Exception(f"Failed to get call analysis: {str(e)}")
 
-    async def wait_for_call_completion(self, call_id: str, max_attempts: int = 60, delay: int = 5, 
-                                     initial_delay: int = 15, max_retries: int = 3) -> None:
+    async def wait_for_call_completion(self, call_id: str, max_attempts: int = 60, delay: Optional[float] = None,
+                                     initial_delay: Optional[float] = None, max_retries: int = 3) -> None:
         """Wait for a call to complete, checking status periodically."""
         import asyncio
         
-        print(f"Waiting {initial_delay} seconds before checking call status...")
+        delay = self.poll_interval if delay is None else delay
+        initial_delay = self.poll_initial_delay if initial_delay is None else initial_delay
+        logger.info("Waiting %s seconds before checking call status...", initial_delay)
         await asyncio.sleep(initial_delay)
         
         retries = 0
         for _ in range(max_attempts):
             try:
                 status = await self.get_call_status(call_id)
-                print(f"Call status: {status}")
+                logger.info("Call status: %s", status)
                 
                 if status in ["ended", "completed"]:  
-                    print("Call completed successfully")
+                    logger.info("Call completed successfully")
                     return
                 elif status in ["failed", "error"]:
                     retries += 1
                     if retries >= max_retries:
                         raise Exception(f"Call failed with status: {status} after {max_retries} retries")
-                    print(f"Call failed (attempt {retries}/{max_retries}), retrying in {delay} seconds...")
+                    logger.warning("Call failed (attempt %s/%s), retrying in %s seconds...", retries, max_retries, delay)
                     await asyncio.sleep(delay)
                     continue
                 elif status in ["queued", "in-progress", "ringing"]:
-                    print(f"Call in progress (status: {status}), checking again in {delay} seconds...")
+                    logger.info("Call in progress (status: %s), checking again in %s seconds...", status, delay)
                 
                 await asyncio.sleep(delay)
             except Exception as e:
                 retries += 1
                 if retries >= max_retries:
                     raise Exception(f"Failed to check call status after {max_retries} retries: {str(e)}")
-                print(f"Error checking status (attempt {retries}/{max_retries}), retrying in {delay} seconds...")
+                logger.warning("Error checking status (attempt %s/%s), retrying in %s seconds...", retries, max_retries, delay)
                 await asyncio.sleep(delay)
         
         raise Exception("Call timed out waiting for completion")
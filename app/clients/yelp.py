@@ -3,6 +3,7 @@ import os
 import json
 from typing import List, Optional, Dict, Any
 import httpx
+from .http import upstream_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,13 +15,44 @@ class YelpClient:
             logger.error("❌ YELP_API_KEY not found in environment variables")
             raise ValueError("YELP_API_KEY not found in environment variables")
             
-        self.base_url = "https://api.yelp.com/v3"
+        self.base_url = os.getenv("YELP_API_BASE_URL", "https://api.yelp.com/v3")
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "accept": "application/json"
         }
         logger.info("✅ YelpClient initialized with API key")
 
+    @staticmethod
+    def _parse_business(business: Dict[str, Any]) -> Restaurant:
+        """Map a business from a Yelp search response onto our Restaurant model."""
+        location = business["location"]
+        categories = business.get("categories", [])
+        return Restaurant(
+            id=business["id"],
+            name=business["name"],
+            rating=business["rating"],
+            price=business.get("price"),
+            phone=business.get("phone"),
+            location=Location(
+                address1=location.get("address1"),
+                address2=location.get("address2"),
+                address3=location.get("address3"),
+                city=location["city"],
+                state=location["state"],
+                zip_code=location["zip_code"],
+                country=location.get("country", "US"),
+                display_address=location.get("display_address", [])
+            ),
+            coordinates=Coordinates(
+                latitude=business["coordinates"]["latitude"],
+                longitude=business["coordinates"]["longitude"]
+            ),
+            photos=[business.get("image_url")] if business.get("image_url") else [],
+            business_type="grocery" if any(cat["alias"] == "grocery" for cat in categories) else "restaurants",
+            categories=[Category(**cat) for cat in categories],
+            is_closed=business.get("is_closed", False)
+        )
+
     async def search_businesses(
         self,
         term: Optional[str] = None,
@@ -45,9 +77,9 @@ class YelpClient:
             if price:
                 params["price"] = price
                 
-            logger.info(f"🔍 Searching Yelp API with params: {params}")
+            logger.info("🔍 Searching Yelp API with params: %s", params)
             
-            async with httpx.AsyncClient() as client:
+            async with upstream_client("yelp") as client:
                 response = await client.get(
                     f"{self.base_url}/businesses/search",
                     params=params,
@@ -60,48 +92,23 @@ class YelpClient:
                 restaurants = []
                 for business in data.get("businesses", []):
                     try:
-                        restaurant = Restaurant(
-                            id=business["id"],
-                            name=business["name"],
-                            rating=business["rating"],
-                            price=business.get("price"),
-                            phone=business.get("phone"),
-                            location=Location(
-                                address1=business["location"].get("address1"),
-                                address2=business["location"].get("address2"),
-                                address3=business["location"].get("address3"),
-                                city=business["location"]["city"],
-                                state=business["location"]["state"],
-                                zip_code=business["location"]["zip_code"],
-                                country=business["location"].get("country", "US"),
-                                display_address=business["location"].get("display_address", [])
-                            ),
-                            coordinates=Coordinates(
-                                latitude=business["coordinates"]["latitude"],
-                                longitude=business["coordinates"]["longitude"]
-                            ),
-                            photos=[business.get("image_url")] if business.get("image_url") else [],
-                            business_type="restaurants" if "grocery" not in [cat["alias"] for cat in business.get("categories", [])] else "grocery"
-                            ,
-                            categories=[Category(**cat) for cat in business.get("categories", [])],
-                            is_closed=business.get("is_closed", False)
-                        )
+                        restaurant = self._parse_business(business)
                         restaurants.append(restaurant)
                     except Exception as e:
-                        logger.error(f"❌ Failed to parse restaurant {business.get('name')}: {str(e)}")
+                        logger.error("❌ Failed to parse restaurant %s: %s", business.get('name'), e)
                         continue
                 
-                logger.info(f"✅ Found {len(restaurants)} restaurants from Yelp")
+                logger.info("✅ Found %s restaurants from Yelp", len(restaurants))
                 return restaurants
                 
         except Exception as e:
-            logger.error(f"❌ Failed to search Yelp API: {str(e)}")
+            logger.error("❌ Failed to search Yelp API: %s", e)
             return []
 
     async def search_restaurants(self, params: SearchParams) -> List[Restaurant]:
         """Search for restaurants using Yelp API."""
         try:
-            logger.info(f"Making request to: {self.base_url}/businesses/search")
+            logger.info("Making request to: %s/businesses/search", self.base_url)
             
             # Convert parameters to Yelp API format
             search_params = {
@@ -117,10 +124,9 @@ class YelpClient:
             # Remove None values
             search_params = {k: v for k, v in search_params.items() if v is not None}
             
-            logger.info(f"Search params: {search_params}")  # Debug log
-            logger.info(f"Headers: {self.headers}")  # Debug log
+            logger.debug("Search params: %s", search_params)
             
-            async with httpx.AsyncClient() as client:
+            async with upstream_client("yelp") as client:
                 response = await client.get(
                     f"{self.base_url}/businesses/search",
                     headers=self.headers,
@@ -128,8 +134,8 @@ class YelpClient:
                 )
                 
                 if response.status_code != 200:
-                    logger.error(f"Response status: {response.status_code}")
-                    logger.error(f"Response text: {response.text}")
+                    logger.error("Response status: %s", response.status_code)
+                    logger.error("Response text: %s", response.text)
                     response.raise_for_status()
                     
                 data = response.json()
@@ -154,17 +160,17 @@ class YelpClient:
                 return restaurants
                 
         except httpx.HTTPError as e:
-            logger.error(f" Error: {str(e)}")
-            logger.error(f"Response: {e.response.text if hasattr(e, 'response') else 'No response'}")
+            logger.error(" Error: %s", e)
+            logger.error("Response: %s", e.response.text if hasattr(e, 'response') else 'No response')
             raise
         except Exception as e:
-            logger.error(f" Unexpected error: {str(e)}")
+            logger.error(" Unexpected error: %s", e)
             raise
 
     async def get_business_details(self, business_id: str) -> Optional[Restaurant]:
         """Get detailed information about a specific business."""
         try:
-            async with httpx.AsyncClient() as client:
+            async with upstream_client("yelp") as client:
                 response = await client.get(
                     f"{self.base_url}/businesses/{business_id}",
                     headers=self.headers
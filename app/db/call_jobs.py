@@ -0,0 +1,301 @@
+from __future__ import annotations
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from app.clients.supabase import SupabaseClient
+from app.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+class CallJob(BaseModel):
+    """A queued outbound call, claimed by one dispatcher worker at a time under a lease"""
+    id: int
+    restaurant_id: str
+    kind: str = "check_hours"
+    status: str = "pending"  # pending, running, succeeded, failed
+    attempts: int = 0
+    max_attempts: int = 3
+    run_after: Optional[datetime] = None
+    # Set by the scheduler: the restaurant's number and timezone, the calling window the
+    # job is due in, and its claim priority (expected answer rate plus boost)
+    phone: Optional[str] = None
+    timezone: Optional[str] = None
+    priority: float = 0.0
+    boost: float = 0.0
+    scheduled_at: Optional[datetime] = None
+    window_ends_at: Optional[datetime] = None
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    call_id: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class CallJobDB:
+    TABLE_NAME = "call_jobs"
+    CLAIM_RPC = "claim_call_jobs"  # see supabase/migrations
+    ENQUEUE_UNVERIFIED_RPC = "enqueue_unverified_restaurants"
+
+    def __init__(self):
+        self.supabase = SupabaseClient()
+
+    @property
+    def _table(self):
+        return self.supabase.client.table(self.TABLE_NAME)
+
+    @traced()
+    def enqueue(self, restaurant_id: str, kind: str = "check_hours",
+                max_attempts: Optional[int] = None, boost: float = 0.0) -> Optional[CallJob]:
+        """Queue a job, or return the restaurant's already open job of the same kind.
+
+        `boost` raises the job's priority within its calling window (e.g. a user asked for it).
+        """
+        try:
+            existing = self.get_open_job(restaurant_id, kind)
+            if existing:
+                return self._raise_boost(existing, boost)
+            data: Dict[str, Any] = {"restaurant_id": restaurant_id, "kind": kind, "boost": boost}
+            if max_attempts is not None:
+                data["max_attempts"] = max_attempts
+            response = self._table.insert(data).execute()
+            return CallJob(**response.data[0]) if response.data else None
+        except Exception as e:
+            # Lost a race with another enqueue: the open job exists now
+            existing = self.get_open_job(restaurant_id, kind)
+            if existing:
+                return self._raise_boost(existing, boost)
+            logger.error("❌ Failed to enqueue %s job for %s: %s", kind, restaurant_id, e)
+            raise Exception(f"Failed to enqueue call job: {str(e)}")
+
+    @traced()
+    def enqueue_many(self, restaurant_ids: List[str], kind: str = "check_hours",
+                     boost: float = 0.0) -> List[CallJob]:
+        """Queue jobs for several restaurants in one insert, reusing any that are already open."""
+        restaurant_ids = list(dict.fromkeys(restaurant_ids))
+        try:
+            response = self._table.select("*")\
+                .in_("restaurant_id", restaurant_ids)\
+                .eq("kind", kind)\
+                .in_("status", ["pending", "running"])\
+                .execute()
+            jobs = {row["restaurant_id"]: self._raise_boost(CallJob(**row), boost)
+                    for row in response.data or []}
+            missing = [rid for rid in restaurant_ids if rid not in jobs]
+            if missing:
+                try:
+                    response = self._table.insert(
+                        [{"restaurant_id": rid, "kind": kind, "boost": boost} for rid in missing]
+                    ).execute()
+                    jobs.update({row["restaurant_id"]: CallJob(**row) for row in response.data or []})
+                except Exception:
+                    # Some were queued concurrently; the open-job index rejected the whole insert
+                    for rid in missing:
+                        job = self.enqueue(rid, kind, boost=boost)
+                        if job:
+                            jobs[rid] = job
+            return [jobs[rid] for rid in restaurant_ids if rid in jobs]
+        except Exception as e:
+            logger.error("❌ Failed to enqueue %s %s jobs: %s", len(restaurant_ids), kind, e)
+            raise Exception(f"Failed to enqueue call jobs: {str(e)}")
+
+    def _raise_boost(self, job: CallJob, boost: float) -> CallJob:
+        """Give a waiting job at least `boost`, keeping the answer-rate part of its priority."""
+        if job.status != "pending" or boost <= job.boost:
+            return job
+        data = {"boost": boost, "priority": job.priority - job.boost + boost}
+        response = self._table.update(data).eq("id", job.id).eq("status", "pending").execute()
+        return CallJob(**response.data[0]) if response.data else job
+
+    @traced()
+    def enqueue_unverified(self, limit: int) -> int:
+        """Queue hours checks for up to `limit` restaurants with unverified hours."""
+        try:
+            response = self.supabase.client.rpc(
+                self.ENQUEUE_UNVERIFIED_RPC, {"p_limit": limit}
+            ).execute()
+            return int(response.data or 0)
+        except Exception as e:
+            logger.error("❌ Failed to enqueue unverified restaurants: %s", e)
+            return 0
+
+    @traced()
+    def claim(self, worker_id: str, limit: int, lease_seconds: int) -> List[CallJob]:
+        """Atomically lease up to `limit` runnable jobs to `worker_id`."""
+        try:
+            response = self.supabase.client.rpc(self.CLAIM_RPC, {
+                "p_worker": worker_id, "p_limit": limit, "p_lease_seconds": lease_seconds,
+            }).execute()
+            return [CallJob(**row) for row in response.data or []]
+        except Exception as e:
+            logger.error("❌ Failed to claim call jobs: %s", e)
+            return []
+
+    def _update_leased(self, job: CallJob, worker_id: str, data: Dict[str, Any]) -> bool:
+        """Update a job only while `worker_id` still holds its lease."""
+        response = self._table.update(data)\
+            .eq("id", job.id)\
+            .eq("lease_owner", worker_id)\
+            .eq("status", "running")\
+            .execute()
+        if not response.data:
+            logger.warning("⚠️ Lost the lease on call job %s", job.id)
+            return False
+        return True
+
+    @traced()
+    def renew_lease(self, job: CallJob, worker_id: str, lease_seconds: int) -> bool:
+        try:
+            return self._update_leased(job, worker_id, {
+                "lease_expires_at": (_now() + timedelta(seconds=lease_seconds)).isoformat(),
+            })
+        except Exception as e:
+            logger.error("❌ Failed to renew lease on call job %s: %s", job.id, e)
+            return False
+
+    @traced()
+    def complete(self, job: CallJob, worker_id: str, result: Dict[str, Any]) -> bool:
+        try:
+            return self._update_leased(job, worker_id, {
+                "status": "succeeded", "result": result, "last_error": None,
+                "call_id": result.get("call_id", job.call_id),
+                "lease_owner": None, "lease_expires_at": None,
+            })
+        except Exception as e:
+            logger.error("❌ Failed to complete call job %s: %s", job.id, e)
+            return False
+
+    @traced()
+    def fail(self, job: CallJob, worker_id: str, error: str,
+             retry_at: Optional[datetime] = None, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Record a failed attempt: back to pending until `retry_at`, or failed for good if None."""
+        try:
+            data: Dict[str, Any] = {
+                "status": "pending" if retry_at else "failed",
+                "last_error": error[:1000],
+                "lease_owner": None, "lease_expires_at": None,
+            }
+            if retry_at:
+                # The scheduler moves the retry into the first good calling slot after retry_at
+                data.update(run_after=retry_at.isoformat(), scheduled_at=None, window_ends_at=None)
+            if result is not None:
+                data["result"] = result
+                data["call_id"] = result.get("call_id", job.call_id)
+            return self._update_leased(job, worker_id, data)
+        except Exception as e:
+            logger.error("❌ Failed to record failure on call job %s: %s", job.id, e)
+            return False
+
+    @traced()
+    def release(self, job: CallJob, worker_id: str) -> bool:
+        """Hand an unfinished job back (e.g. on shutdown) without spending an attempt."""
+        try:
+            return self._update_leased(job, worker_id, {
+                "status": "pending", "attempts": max(job.attempts - 1, 0),
+                "lease_owner": None, "lease_expires_at": None,
+            })
+        except Exception as e:
+            logger.error("❌ Failed to release call job %s: %s", job.id, e)
+            return False
+
+    @traced()
+    def defer(self, job: CallJob, worker_id: str, run_after: datetime) -> bool:
+        """Put a job back until `run_after` without spending an attempt (e.g. its number is busy)."""
+        try:
+            return self._update_leased(job, worker_id, {
+                "status": "pending", "attempts": max(job.attempts - 1, 0),
+                "run_after": run_after.isoformat(), "scheduled_at": None, "window_ends_at": None,
+                "lease_owner": None, "lease_expires_at": None,
+            })
+        except Exception as e:
+            logger.error("❌ Failed to defer call job %s: %s", job.id, e)
+            return False
+
+    @traced()
+    def get_unscheduled(self, limit: int) -> List[CallJob]:
+        """Waiting jobs that need a calling slot: new ones, retries, and ones whose window closed unclaimed."""
+        try:
+            new = self._table.select("*")\
+                .eq("status", "pending")\
+                .is_("scheduled_at", "null")\
+                .order("created_at")\
+                .limit(limit)\
+                .execute()
+            jobs = [CallJob(**row) for row in new.data or []]
+            if len(jobs) < limit:
+                lapsed = self._table.select("*")\
+                    .eq("status", "pending")\
+                    .lt("window_ends_at", _now().isoformat())\
+                    .order("window_ends_at")\
+                    .limit(limit - len(jobs))\
+                    .execute()
+                jobs.extend(CallJob(**row) for row in lapsed.data or [])
+            return jobs
+        except Exception as e:
+            logger.error("❌ Failed to get unscheduled call jobs: %s", e)
+            return []
+
+    @traced()
+    def schedule(self, job: CallJob, data: Dict[str, Any]) -> bool:
+        """Record a waiting job's calling slot (run_after, window_ends_at, priority, ...)."""
+        try:
+            response = self._table.update({**data, "scheduled_at": _now().isoformat()})\
+                .eq("id", job.id)\
+                .eq("status", "pending")\
+                .execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error("❌ Failed to schedule call job %s: %s", job.id, e)
+            return False
+
+    @traced()
+    def complete_pending(self, restaurant_ids: List[str], result: Dict[str, Any],
+                         kind: str = "check_hours") -> int:
+        """Settle waiting jobs for restaurants another call already covered (shared numbers)."""
+        if not restaurant_ids:
+            return 0
+        try:
+            response = self._table.update({"status": "succeeded", "result": result, "last_error": None})\
+                .in_("restaurant_id", restaurant_ids)\
+                .eq("kind", kind)\
+                .eq("status", "pending")\
+                .execute()
+            return len(response.data or [])
+        except Exception as e:
+            logger.error("❌ Failed to complete pending jobs for %s restaurants: %s", len(restaurant_ids), e)
+            return 0
+
+    @traced()
+    def count_pending(self) -> Optional[int]:
+        try:
+            response = self._table.select("id", count="exact")\
+                .eq("status", "pending")\
+                .limit(1)\
+                .execute()
+            return response.count
+        except Exception as e:
+            logger.error("❌ Failed to count pending call jobs: %s", e)
+            return None
+
+    @traced()
+    def get_job(self, job_id: int) -> Optional[CallJob]:
+        try:
+            response = self._table.select("*").eq("id", job_id).execute()
+            return CallJob(**response.data[0]) if response.data else None
+        except Exception as e:
+            logger.error("❌ Failed to get call job %s: %s", job_id, e)
+            return None
+
+    @traced()
+    def get_open_job(self, restaurant_id: str, kind: str = "check_hours") -> Optional[CallJob]:
+        response = self._table.select("*")\
+            .eq("restaurant_id", restaurant_id)\
+            .eq("kind", kind)\
+            .in_("status", ["pending", "running"])\
+            .limit(1)\
+            .execute()
+        return CallJob(**response.data[0]) if response.data else None
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import logging
+from typing import Dict, List, Tuple
+from app.clients.supabase import SupabaseClient
+from app.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# (attempts, answered) by local hour of day
+HourStats = Dict[int, Tuple[int, int]]
+
+class CallSlotStatsDB:
+    """How often calls to each number were answered, by the restaurant's local hour."""
+    TABLE_NAME = "call_slot_stats"
+    RECORD_RPC = "record_call_attempt"  # see supabase/migrations
+    TOTALS_RPC = "call_slot_totals"
+
+    def __init__(self):
+        self.supabase = SupabaseClient()
+
+    @property
+    def _table(self):
+        return self.supabase.client.table(self.TABLE_NAME)
+
+    @traced()
+    def record_attempt(self, phone: str, local_hour: int, answered: bool) -> bool:
+        try:
+            self.supabase.client.rpc(self.RECORD_RPC, {
+                "p_phone": phone, "p_local_hour": local_hour, "p_answered": answered,
+            }).execute()
+            return True
+        except Exception as e:
+            logger.error("❌ Failed to record call attempt for %s: %s", phone, e)
+            return False
+
+    @traced()
+    def get_for_phones(self, phones: List[str]) -> Dict[str, HourStats]:
+        """Per-number history for the given numbers; numbers never called are left out."""
+        phones = list(dict.fromkeys(phones))
+        if not phones:
+            return {}
+        try:
+            response = self._table.select("phone,local_hour,attempts,answered")\
+                .in_("phone", phones)\
+                .execute()
+            stats: Dict[str, HourStats] = {}
+            for row in response.data or []:
+                stats.setdefault(row["phone"], {})[int(row["local_hour"])] = (
+                    int(row["attempts"]), int(row["answered"])
+                )
+            return stats
+        except Exception as e:
+            logger.error("❌ Failed to get call slot stats for %s numbers: %s", len(phones), e)
+            return {}
+
+    @traced()
+    def get_totals(self) -> HourStats:
+        """History across every number, by local hour."""
+        try:
+            response = self.supabase.client.rpc(self.TOTALS_RPC, {}).execute()
+            return {
+                int(row["local_hour"]): (int(row["attempts"]), int(row["answered"]))
+                for row in response.data or []
+            }
+        except Exception as e:
+            logger.error("❌ Failed to get call slot totals: %s", e)
+            return {}
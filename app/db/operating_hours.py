@@ -1,5 +1,12 @@
-from typing import Dict, Optional, Any, List
+import logging
+from typing import Dict, Iterator, Optional, Any, List
+from app.cache.invalidation import invalidation_bus
 from app.clients.supabase import SupabaseClient
+from app.db.restaurant_snapshot import restaurant_snapshot
+from app.models import StructuredHours
+from app.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 class OperatingHoursDB:
     TABLE_NAME = 'operating_hours'
@@ -7,6 +14,7 @@ class OperatingHoursDB:
     def __init__(self):
         self.supabase = SupabaseClient()
 
+    @traced()
     def get_hours(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
         """Get operating hours for a restaurant."""
         try:
@@ -16,17 +24,24 @@ class OperatingHoursDB:
                 .execute()
             
             if response.data:
-                print("✅ Found operating hours")
+                logger.info("✅ Found operating hours")
                 return response.data[0]
             return None
         except Exception as e:
-            print(f"❌ Failed to get operating hours: {str(e)}")
+            logger.error("❌ Failed to get operating hours: %s", e)
             return None
 
-    def update_hours(self, restaurant_id: str, time_open: str, time_closed: str, is_open: bool) -> bool:
-        """Update or create operating hours for a restaurant."""
+    def update_hours(
+        self,
+        restaurant_id: str,
+        time_open: Optional[str],
+        time_closed: Optional[str],
+        is_open: Optional[bool],
+        schedule: Optional[StructuredHours] = None
+    ) -> bool:
+        """Update or create operating hours for a restaurant, including the structured schedule if captured."""
         try:
-            print(f"🔄 Updating operating hours for restaurant: {restaurant_id}")
+            logger.info("🔄 Updating operating hours for restaurant: %s", restaurant_id)
             data = {
                 'restaurant_id': restaurant_id,
                 'time_open': time_open,
@@ -35,6 +50,8 @@ class OperatingHoursDB:
                 'is_hours_verified': True,  # Set to True since we're getting actual hours
                 'is_consenting': True  # Assuming consent when hours are provided
             }
+            if schedule is not None:
+                data['schedule'] = schedule.model_dump(mode='json')
             
             # Check if record exists
             existing = self.get_hours(restaurant_id)
@@ -45,23 +62,25 @@ class OperatingHoursDB:
                     .update(data)\
                     .eq('id', existing['id'])\
                     .execute()
-                print("✅ Operating hours updated successfully")
+                logger.info("✅ Operating hours updated successfully")
             else:
                 # Create new record
                 self.supabase.client.table(self.TABLE_NAME)\
                     .insert(data)\
                     .execute()
-                print("✅ Operating hours created successfully")
+                logger.info("✅ Operating hours created successfully")
+            invalidation_bus.publish("hours", restaurant_id)
             
             return True
         except Exception as e:
-            print(f"❌ Failed to update operating hours: {str(e)}")
+            logger.error("❌ Failed to update operating hours: %s", e)
             return False
 
+    @traced()
     def mark_hours_unverified(self, restaurant_id: str) -> bool:
         """Mark a restaurant's hours as unverified."""
         try:
-            print(f"🔄 Marking hours as unverified for restaurant: {restaurant_id}")
+            logger.info("🔄 Marking hours as unverified for restaurant: %s", restaurant_id)
             existing = self.get_hours(restaurant_id)
             
             data = {
@@ -81,16 +100,18 @@ class OperatingHoursDB:
                     .insert(data)\
                     .execute()
             
-            print("✅ Hours marked as unverified")
+            invalidation_bus.publish("hours", restaurant_id)
+            logger.info("✅ Hours marked as unverified")
             return True
         except Exception as e:
-            print(f"❌ Failed to mark hours as unverified: {str(e)}")
+            logger.error("❌ Failed to mark hours as unverified: %s", e)
             return False
 
+    @traced()
     def update_consent(self, restaurant_id: str, is_consenting: bool) -> bool:
         """Update the consent status for a restaurant."""
         try:
-            print(f"🔄 Updating consent status for restaurant: {restaurant_id}")
+            logger.info("🔄 Updating consent status for restaurant: %s", restaurant_id)
             existing = self.get_hours(restaurant_id)
             
             data = {
@@ -110,12 +131,14 @@ class OperatingHoursDB:
                     .insert(data)\
                     .execute()
             
-            print(f"✅ Consent status updated to: {is_consenting}")
+            invalidation_bus.publish("hours", restaurant_id)
+            logger.info("✅ Consent status updated to: %s", is_consenting)
             return True
         except Exception as e:
-            print(f"❌ Failed to update consent status: {str(e)}")
+            logger.error("❌ Failed to update consent status: %s", e)
             return False
 
+    @traced()
     def get_hours_bulk(self, restaurant_ids: List[str]) -> Dict[str, Dict[str, Any]]:
         """Get operating hours for multiple restaurants in one query."""
         try:
@@ -131,5 +154,40 @@ class OperatingHoursDB:
             
             return hours_map
         except Exception as e:
-            print(f"❌ Failed to get bulk operating hours: {str(e)}")
+            logger.error("❌ Failed to get bulk operating hours: %s", e)
             return {}
+
+    @traced()
+    def get_cached_hours_bulk(self, restaurant_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Hours for a listing page: from the mapped restaurant snapshot when it keeps them,
+        otherwise one query like get_hours_bulk."""
+        hours_map = restaurant_snapshot.hours(restaurant_ids)
+        return hours_map if hours_map is not None else self.get_hours_bulk(restaurant_ids)
+
+    def iter_hours_updated_after(
+        self, updated_after: str, chunk_size: int = 500
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield hours rows updated (or created) after `updated_after`, oldest change first,
+        in chunks keyed by (updated_at, restaurant_id)."""
+        after_id = None
+        while True:
+            try:
+                table = self.supabase.client.table(self.TABLE_NAME)
+                rows: List[Dict[str, Any]] = []
+                if after_id is not None:
+                    rows = table.select("*").eq("updated_at", updated_after)\
+                        .gt("restaurant_id", after_id)\
+                        .order("restaurant_id").limit(chunk_size).execute().data
+                if len(rows) < chunk_size:
+                    rows += table.select("*").gt("updated_at", updated_after)\
+                        .order("updated_at").order("restaurant_id")\
+                        .limit(chunk_size - len(rows)).execute().data
+            except Exception as e:
+                logger.error("❌ Failed to get updated operating hours: %s", e)
+                raise Exception(f"Failed to get updated operating hours: {str(e)}")
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            updated_after, after_id = rows[-1]["updated_at"], rows[-1]["restaurant_id"]
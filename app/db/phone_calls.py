@@ -0,0 +1,104 @@
+from __future__ import annotations
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from app.clients.supabase import SupabaseClient
+from app.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+class PhoneCallClaim(BaseModel):
+    """What acquire_phone_call decided for a number: acquired, recent or busy"""
+    outcome: str
+    call_id: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    ended_at: Optional[datetime] = None
+
+class PhoneCallDB:
+    TABLE_NAME = "phone_calls"
+    ACQUIRE_RPC = "acquire_phone_call"  # see supabase/migrations
+
+    def __init__(self):
+        self.supabase = SupabaseClient()
+
+    @property
+    def _table(self):
+        return self.supabase.client.table(self.TABLE_NAME)
+
+    @traced()
+    def acquire(self, phone: str, worker_id: str, lease_seconds: int, cooldown_seconds: int) -> PhoneCallClaim:
+        """Take `phone` for a call, or learn that it was called recently or is being called."""
+        try:
+            response = self.supabase.client.rpc(self.ACQUIRE_RPC, {
+                "p_phone": phone, "p_worker": worker_id,
+                "p_lease_seconds": lease_seconds, "p_cooldown_seconds": cooldown_seconds,
+            }).execute()
+            return PhoneCallClaim(**response.data[0])
+        except Exception as e:
+            logger.error("❌ Failed to acquire phone %s: %s", phone, e)
+            raise Exception(f"Failed to acquire phone: {str(e)}")
+
+    def _update_owned(self, phone: str, worker_id: str, data: Dict[str, Any]) -> bool:
+        """Update the number's call only while `worker_id` still owns it."""
+        response = self._table.update(data)\
+            .eq("phone", phone)\
+            .eq("owner", worker_id)\
+            .eq("status", "in_progress")\
+            .execute()
+        if not response.data:
+            logger.warning("⚠️ Lost the lease on phone %s", phone)
+            return False
+        return True
+
+    @traced()
+    def set_call_id(self, phone: str, worker_id: str, call_id: str) -> bool:
+        try:
+            return self._update_owned(phone, worker_id, {"call_id": call_id})
+        except Exception as e:
+            logger.error("❌ Failed to record call id for phone %s: %s", phone, e)
+            return False
+
+    @traced()
+    def renew_lease(self, phone: str, worker_id: str, lease_seconds: int) -> bool:
+        try:
+            return self._update_owned(phone, worker_id, {
+                "lease_expires_at": (_now() + timedelta(seconds=lease_seconds)).isoformat(),
+            })
+        except Exception as e:
+            logger.error("❌ Failed to renew lease on phone %s: %s", phone, e)
+            return False
+
+    @traced()
+    def finish(self, phone: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Record the ended call; its result is reused until the cooldown runs out."""
+        try:
+            return self._update_owned(phone, worker_id, {
+                "status": "ended", "result": result, "ended_at": _now().isoformat(),
+                "owner": None, "lease_expires_at": None,
+            })
+        except Exception as e:
+            logger.error("❌ Failed to finish call to phone %s: %s", phone, e)
+            return False
+
+    @traced()
+    def release(self, phone: str, worker_id: str) -> bool:
+        """Give up the number without an outcome; the next owner resumes any call already placed."""
+        try:
+            return self._update_owned(phone, worker_id, {"owner": None, "lease_expires_at": _now().isoformat()})
+        except Exception as e:
+            logger.error("❌ Failed to release phone %s: %s", phone, e)
+            return False
+
+    @traced()
+    def get_by_call_id(self, call_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = self._table.select("*").eq("call_id", call_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("❌ Failed to get phone call %s: %s", call_id, e)
+            return None
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
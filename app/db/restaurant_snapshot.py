@@ -0,0 +1,654 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from app.metrics import restaurant_snapshot_refreshes, restaurant_snapshot_rows
+
+try:
+    import numpy as np
+except ImportError:  # a declared dependency; if missing, listing and cached search read Supabase
+    np = None
+
+if TYPE_CHECKING:
+    from app.db.restaurants import RestaurantDB
+    from app.models import SearchParams
+
+logger = logging.getLogger(__name__)
+
+# Bits of the per-row flags column
+LIVE = 1
+IS_OPEN = 2
+IS_CLOSED = 4
+HOURS_VERIFIED = 8
+HAS_PHOTOS = 16
+HAS_HOURS = 32  # the file format only: an operating_hours row is stored for the restaurant
+
+MAX_CATEGORIES = 4  # category aliases kept per row; Yelp lists at most three
+_COLUMN_NAMES = ("latitude", "longitude", "rating", "price_tier", "flags",
+                 "name_id", "city_id", "type_id", "category_ids")
+_timestamp = TypeAdapter(datetime)
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return _timestamp.validate_python(value) if value else None
+
+def price_tiers(price: str) -> List[int]:
+    """'1,2' (as Yelp and the frontend send it) or '$$' (as stored) as price tiers."""
+    tiers = []
+    for part in price.split(","):
+        part = part.strip()
+        if part.isdigit():
+            tiers.append(int(part))
+        elif part and set(part) == {"$"}:
+            tiers.append(len(part))
+    return tiers
+
+class StringTable:
+    """Interned strings: each distinct value is kept once and rows refer to it by index.
+
+    Append-only, so a reader holding an older snapshot version can keep using it; -1 is
+    "no value", and the masks built here map it to False.
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._lowered: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, value: Optional[str]) -> int:
+        if not value:
+            return -1
+        index = self._ids.get(value)
+        if index is None:
+            index = self._ids[value] = len(self.values)
+            self.values.append(value)
+            self._lowered.append(value.lower())
+        return index
+
+    def _mask(self, test: Callable[[str], bool]) -> "np.ndarray":
+        # One entry per value plus a trailing False, which index -1 picks up
+        lowered = self._lowered[:]
+        mask = np.zeros(len(lowered) + 1, dtype=bool)
+        mask[:-1] = np.fromiter((test(value) for value in lowered), dtype=bool, count=len(lowered))
+        return mask
+
+    def containing(self, needle: str) -> "np.ndarray":
+        """Mask of values containing `needle`, ignoring case (ILIKE '%needle%')."""
+        needle = needle.lower()
+        return self._mask(lambda value: needle in value)
+
+    def equal_to(self, candidates: Iterable[str]) -> "np.ndarray":
+        """Mask of values equal to any of `candidates`, ignoring case."""
+        wanted = {candidate.strip().lower() for candidate in candidates if candidate and candidate.strip()}
+        return self._mask(lambda value: value in wanted)
+
+class _Columns:
+    """One version of the snapshot. Never changed once published: a refresh copies it,
+    applies the changed rows and swaps the copy in, so readers need no lock.
+    """
+
+    def __init__(self, size: int, tables: Optional[_Columns] = None):
+        self.rows: List[Optional[Dict[str, Any]]] = [None] * size
+        self.index: Dict[str, int] = {}
+        self.latitude = np.full(size, np.nan)
+        self.longitude = np.full(size, np.nan)
+        self.rating = np.zeros(size, dtype=np.float32)
+        self.price_tier = np.zeros(size, dtype=np.int8)
+        self.flags = np.zeros(size, dtype=np.uint8)
+        self.name_id = np.full(size, -1, dtype=np.int32)
+        self.city_id = np.full(size, -1, dtype=np.int32)
+        self.type_id = np.full(size, -1, dtype=np.int32)
+        self.category_ids = np.full((size, MAX_CATEGORIES), -1, dtype=np.int32)
+        # Shared with the version this one was copied from; they only ever grow
+        self.names = tables.names if tables else StringTable()
+        self.cities = tables.cities if tables else StringTable()
+        self.categories = tables.categories if tables else StringTable()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def live(self) -> "np.ndarray":
+        return (self.flags & LIVE).astype(bool)
+
+    def position(self, business_id: str) -> Optional[int]:
+        return self.index.get(business_id)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return dict(self.rows[i])
+
+    def hours(self, business_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        return None  # hours are only kept in the file format
+
+    def copy(self, extra: int = 0) -> _Columns:
+        size = len(self)
+        columns = _Columns(size + extra, tables=self)
+        columns.rows[:size] = self.rows
+        columns.index = dict(self.index)
+        for name in _COLUMN_NAMES:
+            getattr(columns, name)[:size] = getattr(self, name)
+        return columns
+
+    def put(self, i: int, row: Dict[str, Any]) -> None:
+        coordinates = row.get("coordinates") or {}
+        location = row.get("location") or {}
+        price = (row.get("price") or "").strip()
+        self.rows[i] = row
+        self.index[row["business_id"]] = i
+        self.latitude[i] = coordinates.get("latitude") if coordinates.get("latitude") is not None else np.nan
+        self.longitude[i] = coordinates.get("longitude") if coordinates.get("longitude") is not None else np.nan
+        self.rating[i] = row.get("rating") or 0.0
+        self.price_tier[i] = min(len(price), 127)
+        self.flags[i] = (
+            LIVE
+            | (IS_OPEN if row.get("is_open", True) else 0)
+            | (IS_CLOSED if row.get("is_closed") else 0)
+            | (HOURS_VERIFIED if row.get("is_hours_verified") else 0)
+            | (HAS_PHOTOS if row.get("photos") else 0)
+        )
+        self.name_id[i] = self.names.intern(row.get("name"))
+        self.city_id[i] = self.cities.intern(location.get("city"))
+        self.type_id[i] = self.categories.intern(row.get("business_type"))
+        aliases = [c.get("alias") for c in row.get("categories") or [] if isinstance(c, dict)]
+        ids = [self.categories.intern(alias) for alias in aliases if alias][:MAX_CATEGORIES]
+        self.category_ids[i] = ids + [-1] * (MAX_CATEGORIES - len(ids))
+
+    def remove(self, business_id: str) -> None:
+        i = self.index.pop(business_id, None)
+        if i is not None:
+            self.rows[i] = None
+            self.flags[i] = 0
+
+# --- Snapshot file ---------------------------------------------------------------
+# One snapshot shared by the workers on a host: a refresher process (`python -m
+# app.db.snapshot_refresher`) writes it and every worker maps it read-only. Layout: magic
+# and header length, a JSON header giving each section's offset, dtype and shape, then the
+# sections, each aligned to SECTION_ALIGN bytes: the fixed-width columns above, and
+# offset-indexed heaps for business ids (sorted), row and hours JSON, and the string
+# tables. A new version is written beside the old one and renamed over it.
+
+FILE_MAGIC = b"RSTSNAP\0"
+FILE_FORMAT = 1
+SECTION_ALIGN = 64
+_PREFIX = struct.Struct("<8sQ")  # magic, header length
+_TABLE_COLUMNS = {"names": ("name_id",), "cities": ("city_id",), "categories": ("type_id", "category_ids")}
+
+def _align(position: int) -> int:
+    return -(-position // SECTION_ALIGN) * SECTION_ALIGN
+
+def _file_identity(stat: os.stat_result) -> Tuple[int, int, int]:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def _heap(values: List[bytes]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Offsets of each value (and of the end) and the values back to back."""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.fromiter((len(value) for value in values), dtype=np.int64, count=len(values)))
+    return offsets, np.frombuffer(b"".join(values), dtype=np.uint8)
+
+def _string_table(table: StringTable) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """A table's distinct lowercase values framed by newlines ('\\nthai\\nsushi\\n'), so a
+    substring or a whole value is one `find` away; plus the map from the table's ids.
+    """
+    ids: Dict[str, int] = {}
+    remap = np.full(len(table.values) + 1, -1, dtype=np.int32)  # -1 stays -1
+    for i, value in enumerate(table.values):
+        remap[i] = ids.setdefault(value.lower().replace("\n", " "), len(ids))
+    offsets, heap = _heap([b"\n" + value.encode("utf-8") for value in ids] + [b"\n"])
+    return remap, offsets, heap
+
+def write_snapshot_file(
+    path: str, rows: List[Dict[str, Any]], hours: Dict[str, Dict[str, Any]],
+    generation: int, watermark: Optional[datetime],
+) -> int:
+    """Write `rows` and their operating hours (by restaurant id) as version `generation`
+    of the snapshot file, replacing `path` atomically. Returns the file's size.
+    """
+    rows = sorted(rows, key=lambda row: row["business_id"].encode("utf-8"))
+    columns = _Columns(len(rows))
+    for i, row in enumerate(rows):
+        columns.put(i, row)
+    hours_rows = [hours.get(row["business_id"]) for row in rows]
+    sections: Dict[str, "np.ndarray"] = {name: getattr(columns, name) for name in _COLUMN_NAMES}
+    sections["flags"] = columns.flags | np.fromiter(
+        (HAS_HOURS if row else 0 for row in hours_rows), dtype=np.uint8, count=len(rows))
+    for table, id_columns in _TABLE_COLUMNS.items():
+        remap, sections[f"{table}_offsets"], sections[f"{table}_heap"] = _string_table(getattr(columns, table))
+        for name in id_columns:
+            sections[name] = remap[getattr(columns, name)]
+    for name, values in (
+        ("business_ids", [row["business_id"].encode("utf-8") for row in rows]),
+        ("rows", [to_json(row) for row in rows]),
+        ("hours", [to_json(row) if row else b"" for row in hours_rows]),
+    ):
+        sections[f"{name}_offsets"], sections[f"{name}_heap"] = _heap(values)
+
+    layout: Dict[str, Dict[str, Any]] = {}
+    size = 0
+    for name, array in sections.items():
+        layout[name] = {"offset": size, "dtype": array.dtype.str, "shape": list(array.shape)}
+        size = _align(size + array.nbytes)
+    header = json.dumps({
+        "format": FILE_FORMAT, "generation": generation, "rows": len(rows),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "watermark": watermark.isoformat() if watermark else None, "sections": layout,
+    }).encode("utf-8")
+    base = _align(_PREFIX.size + len(header))
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(_PREFIX.pack(FILE_MAGIC, len(header)))
+            f.write(header)
+            for name, array in sections.items():
+                f.seek(base + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(base + size)
+            f.flush()
+            os.fsync(f.fileno())
+        # Readers holding the old version keep their mapping; new opens see this one
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return base + size
+
+class MappedStringTable:
+    """A string table in a mapped snapshot file. Builds the same masks as StringTable by
+    searching the mapped bytes, so no worker keeps its own list of the values.
+    """
+
+    def __init__(self, buffer: mmap.mmap, start: int, end: int, offsets: "np.ndarray"):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.offsets = offsets  # where each value's leading newline is, then the closing one
+
+    def _value_at(self, position: int) -> int:
+        return int(np.searchsorted(self.offsets, position - self.start, side="right")) - 1
+
+    def containing(self, needle: str) -> "np.ndarray":
+        """Mask of values containing `needle`, ignoring case (ILIKE '%needle%')."""
+        mask = np.zeros(len(self.offsets) - 1, dtype=bool)  # values plus the trailing False
+        encoded = needle.lower().encode("utf-8")
+        if not encoded:
+            mask[:-1] = True
+            return mask
+        if b"\n" in encoded:
+            return mask
+        matches = re.compile(re.escape(encoded)).finditer(self.buffer, self.start, self.end)
+        positions = np.fromiter((match.start() for match in matches), dtype=np.int64)
+        mask[np.searchsorted(self.offsets, positions - self.start, side="right") - 1] = True
+        return mask
+
+    def equal_to(self, candidates: Iterable[str]) -> "np.ndarray":
+        """Mask of values equal to any of `candidates`, ignoring case."""
+        mask = np.zeros(len(self.offsets) - 1, dtype=bool)
+        for candidate in candidates:
+            wanted = (candidate or "").strip().lower()
+            if not wanted or "\n" in wanted:
+                continue
+            position = self.buffer.find(b"\n" + wanted.encode("utf-8") + b"\n", self.start, self.end)
+            if position != -1:
+                mask[self._value_at(position)] = True
+        return mask
+
+class MappedColumns:
+    """One version of the snapshot file, mapped read-only.
+
+    The columns are NumPy views of the mapping, so every worker shares the one copy in the
+    page cache and only the rows and hours being returned are decoded. The mapping stays
+    valid for as long as a reader holds it, even after a newer file has replaced it.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.identity = _file_identity(os.fstat(f.fileno()))
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length = _PREFIX.unpack_from(self.buffer)
+        if magic != FILE_MAGIC:
+            raise ValueError(f"{path} is not a restaurant snapshot file")
+        header = json.loads(self.buffer[_PREFIX.size:_PREFIX.size + header_length])
+        if header["format"] != FILE_FORMAT:
+            raise ValueError(f"{path} has snapshot format {header['format']}, expected {FILE_FORMAT}")
+        self.generation: int = header["generation"]
+        self.watermark = parse_timestamp(header["watermark"])
+        self._size: int = header["rows"]
+        self._base = _align(_PREFIX.size + header_length)
+        self._layout: Dict[str, Dict[str, Any]] = header["sections"]
+        for name in _COLUMN_NAMES:
+            setattr(self, name, self._array(name))
+        for table in _TABLE_COLUMNS:
+            start, end = self._bounds(f"{table}_heap")
+            setattr(self, table, MappedStringTable(self.buffer, start, end, self._array(f"{table}_offsets")))
+        self._business_id_offsets = self._array("business_ids_offsets")
+        self._row_offsets = self._array("rows_offsets")
+        self._hours_offsets = self._array("hours_offsets")
+
+    def _array(self, name: str) -> "np.ndarray":
+        section = self._layout[name]
+        count = int(np.prod(section["shape"], dtype=np.int64))
+        array = np.frombuffer(self.buffer, dtype=np.dtype(section["dtype"]), count=count,
+                              offset=self._base + section["offset"])
+        return array.reshape(section["shape"])
+
+    def _bounds(self, name: str) -> Tuple[int, int]:
+        section = self._layout[name]
+        start = self._base + section["offset"]
+        return start, start + int(np.prod(section["shape"], dtype=np.int64))
+
+    def _value(self, heap: str, offsets: "np.ndarray", i: int) -> bytes:
+        start = self._base + self._layout[heap]["offset"]
+        return self.buffer[start + int(offsets[i]):start + int(offsets[i + 1])]
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def live(self) -> "np.ndarray":
+        return (self.flags & LIVE).astype(bool)
+
+    def position(self, business_id: str) -> Optional[int]:
+        """Row number of a restaurant, by binary search over the sorted ids."""
+        key = business_id.encode("utf-8")
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self._value("business_ids_heap", self._business_id_offsets, middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._size and self._value("business_ids_heap", self._business_id_offsets, low) == key:
+            return low
+        return None
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return json.loads(self._value("rows_heap", self._row_offsets, i))
+
+    def hours(self, business_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        found = {}
+        for business_id in business_ids:
+            i = self.position(business_id)
+            if i is not None and self.flags[i] & HAS_HOURS:
+                found[business_id] = json.loads(self._value("hours_heap", self._hours_offsets, i))
+        return found
+
+class RestaurantSnapshot:
+    """Columnar copy of the restaurants table, so listing and cached search can filter and
+    rank with NumPy and only decode the rows they return.
+
+    Coordinates, rating, price tier and flags are arrays; names, cities and categories are
+    interned string tables the rows point into. The raw rows are kept alongside for the
+    final page. Loaded in full at startup and every `full_reload_seconds` (which also drops
+    rows other workers deleted), and between those refreshed from rows whose updated_at
+    moved, re-reading `overlap_seconds` back for writes that committed late. Until the
+    first load completes, or without NumPy, `ready` is False and callers read Supabase.
+
+    With a `path` the snapshot is instead the file a refresher process keeps current:
+    it's mapped at start (so a new worker is warm at once, if the file exists) and
+    remapped whenever the file is replaced, checked every `file_poll_seconds`.
+    """
+
+    def __init__(self, enabled: bool = True, refresh_seconds: float = 30.0,
+                 full_reload_seconds: float = 3600.0, overlap_seconds: float = 5.0, chunk_size: int = 1000,
+                 path: Optional[str] = None, file_poll_seconds: float = 1.0):
+        self.enabled = enabled and np is not None
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.overlap_seconds = overlap_seconds
+        self.chunk_size = chunk_size
+        self.path = path
+        self.file_poll_seconds = file_poll_seconds
+        self.generation = 0  # bumped with every version published
+        self._columns: Optional[Any] = None  # _Columns, or MappedColumns with a path
+        self._file_identity: Optional[Tuple[int, int, int]] = None
+        self._watermark: Optional[datetime] = None  # newest updated_at applied
+        self._loaded_at = float("-inf")
+        self._write_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @classmethod
+    def from_env(cls) -> RestaurantSnapshot:
+        return cls(
+            enabled=os.getenv("RESTAURANT_SNAPSHOT", "true").lower() in ("1", "true", "yes"),
+            refresh_seconds=float(os.getenv("RESTAURANT_SNAPSHOT_REFRESH_SECONDS", "30")),
+            full_reload_seconds=float(os.getenv("RESTAURANT_SNAPSHOT_FULL_RELOAD_SECONDS", "3600")),
+            path=os.getenv("RESTAURANT_SNAPSHOT_FILE") or None,
+            file_poll_seconds=float(os.getenv("RESTAURANT_SNAPSHOT_FILE_POLL_SECONDS", "1")),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self._columns is not None
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        """Newest updated_at applied (a little earlier after a full load)."""
+        return self._watermark
+
+    def __len__(self) -> int:
+        columns = self._columns
+        return int(np.count_nonzero(columns.live)) if columns is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled, "ready": self.ready, "rows": len(self),
+            "source": "file" if self.path else "supabase", "generation": self.generation,
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+        }
+
+    def start(self, db: RestaurantDB) -> None:
+        if self._task is not None:
+            return
+        if not self.enabled:
+            if np is None:
+                logger.warning("⚠️ numpy not installed; restaurant snapshot disabled")
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        if self.path:
+            self._follow_file()
+            self._task = asyncio.create_task(self._run_mapped())
+            logger.info("📸 Restaurant snapshot following %s", self.path)
+            return
+        self._task = asyncio.create_task(self._run(db))
+        logger.info("📸 Restaurant snapshot started (refresh every %ss)", self.refresh_seconds)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task:
+            self.wake()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        """Refresh now instead of at the next interval (e.g. after this worker wrote rows)."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self, db: RestaurantDB) -> None:
+        while not self._stopping:
+            kind = "full" if time.monotonic() - self._loaded_at >= self.full_reload_seconds else "delta"
+            try:
+                await asyncio.to_thread(self.load if kind == "full" else self.refresh, db)
+                restaurant_snapshot_refreshes.inc(kind=kind, outcome="ok")
+            except Exception as e:
+                restaurant_snapshot_refreshes.inc(kind=kind, outcome="error")
+                logger.error("❌ Restaurant snapshot %s refresh failed: %s", kind, e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _run_mapped(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.file_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._follow_file()
+
+    def _follow_file(self) -> None:
+        try:
+            self.map_file()
+        except Exception as e:
+            restaurant_snapshot_refreshes.inc(kind="mapped", outcome="error")
+            logger.error("❌ Failed to map restaurant snapshot %s: %s", self.path, e)
+
+    def map_file(self) -> bool:
+        """Map the snapshot file if it was replaced since it was last mapped; returns whether it was."""
+        try:
+            identity = _file_identity(os.stat(self.path))
+        except FileNotFoundError:
+            if self._file_identity is None:
+                logger.debug("Restaurant snapshot %s not written yet", self.path)
+            return False
+        if identity == self._file_identity:
+            return False
+        # Remembered before opening, so a bad file is reported once rather than every poll
+        self._file_identity = identity
+        columns = MappedColumns(self.path)
+        with self._write_lock:
+            self._columns = columns
+            self._file_identity = columns.identity
+            self._watermark = columns.watermark
+            self.generation = columns.generation
+        restaurant_snapshot_rows.set(len(columns))
+        restaurant_snapshot_refreshes.inc(kind="mapped", outcome="ok")
+        logger.info("📸 Mapped restaurant snapshot generation %s: %s rows", columns.generation, len(columns))
+        return True
+
+    def load(self, db: RestaurantDB) -> None:
+        """Read the whole table and publish it as a fresh snapshot."""
+        start_time = time.perf_counter()
+        started_at = datetime.now(timezone.utc)
+        rows = [row for chunk in db.iter_cached_restaurant_rows(chunk_size=self.chunk_size) for row in chunk]
+        columns = _Columns(len(rows))
+        for i, row in enumerate(rows):
+            columns.put(i, row)
+        newest = max(filter(None, (parse_timestamp(row.get("updated_at")) for row in rows)), default=None)
+        with self._write_lock:
+            self._columns = columns
+            self.generation += 1
+            # Rows written while the load was paging may have been read before the write,
+            # so the first delta starts no later than the load did
+            self._watermark = min(newest, started_at) if newest else started_at
+            self._loaded_at = time.monotonic()
+        restaurant_snapshot_rows.set(len(rows))
+        logger.info("📸 Loaded restaurant snapshot: %s rows in %.2fs", len(rows), time.perf_counter() - start_time)
+
+    def refresh(self, db: RestaurantDB) -> int:
+        """Apply rows changed since the last load or refresh; returns how many changed."""
+        if self._watermark is None:
+            self.load(db)
+            return len(self)
+        since = self._watermark - timedelta(seconds=self.overlap_seconds)
+        changed = [
+            row for chunk in db.iter_restaurant_rows_updated_after(since.isoformat(), self.chunk_size)
+            for row in chunk
+        ]
+        with self._write_lock:
+            base = self._columns
+            fresh: Dict[str, Dict[str, Any]] = {}
+            for row in changed:  # oldest change first, so the newest version of a row wins
+                i = base.index.get(row["business_id"])
+                if i is None or base.rows[i].get("updated_at") != row.get("updated_at"):
+                    fresh[row["business_id"]] = row
+            if fresh:
+                columns = base.copy(extra=sum(1 for business_id in fresh if business_id not in base.index))
+                size = len(base)
+                for business_id, row in fresh.items():
+                    i = columns.index.get(business_id)
+                    if i is None:
+                        i, size = size, size + 1
+                    columns.put(i, row)
+                self._columns = columns
+                self.generation += 1
+            newest = max(filter(None, (parse_timestamp(row.get("updated_at")) for row in changed)), default=None)
+            if newest and newest > self._watermark:
+                self._watermark = newest
+        if fresh:
+            restaurant_snapshot_rows.set(len(self))
+            logger.info("📸 Applied %s changed restaurants to the snapshot", len(fresh))
+        return len(fresh)
+
+    def discard(self, *business_ids: str) -> None:
+        """Drop deleted rows now; deletes nobody announced go at the next full reload.
+
+        A mapped file is read-only: its refresher drops them and writes a new version.
+        """
+        with self._write_lock:
+            base = self._columns
+            if not isinstance(base, _Columns) or not any(business_id in base.index for business_id in business_ids):
+                return
+            columns = base.copy()
+            for business_id in business_ids:
+                columns.remove(business_id)
+            self._columns = columns
+            self.generation += 1
+        restaurant_snapshot_rows.set(len(self))
+
+    def rows(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Stored rows in snapshot order, up to `limit`. Copies, so callers may add keys."""
+        columns = self._columns
+        matches = np.flatnonzero(columns.live)
+        if limit:
+            matches = matches[:limit]
+        return [columns.row(i) for i in matches]
+
+    def row(self, business_id: str) -> Optional[Dict[str, Any]]:
+        """One restaurant's stored row (a copy), or None if it isn't in the snapshot."""
+        columns = self._columns
+        i = columns.position(business_id) if columns is not None else None
+        return columns.row(i) if i is not None else None
+
+    def hours(self, business_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Stored operating hours by restaurant id, for snapshots that keep them (a mapped
+        file); None otherwise, and callers read Supabase.
+        """
+        columns = self._columns
+        return columns.hours(business_ids) if columns is not None else None
+
+    def search(self, params: SearchParams) -> List[Dict[str, Any]]:
+        """Rows matching a cached search, best rated first, for the requested page only.
+
+        Name and city contain the term and location, price matches by tier ('2' finds
+        '$$'), categories match the business type or a category alias, and open_now keeps
+        restaurants open and not closed; RestaurantDB's Supabase fallback asks for the same.
+        """
+        columns = self._columns
+        mask = columns.live
+        if params.term:
+            mask = mask & columns.names.containing(params.term)[columns.name_id]
+        if params.location:
+            mask = mask & columns.cities.containing(params.location)[columns.city_id]
+        if params.price:
+            mask = mask & np.isin(columns.price_tier, price_tiers(params.price))
+        if params.categories:
+            wanted = columns.categories.equal_to(params.categories)
+            mask = mask & (wanted[columns.type_id] | wanted[columns.category_ids].any(axis=1))
+        if params.open_now:
+            mask = mask & ((columns.flags & (IS_OPEN | IS_CLOSED)) == IS_OPEN)
+        matches = np.flatnonzero(mask)
+        if params.sort_by != "distance":  # no origin to measure from; keep stored order
+            matches = matches[np.argsort(-columns.rating[matches], kind="stable")]
+        offset = params.offset or 0
+        end = offset + params.limit if params.limit else None
+        return [columns.row(i) for i in matches[offset:end]]
+
+restaurant_snapshot = RestaurantSnapshot.from_env()
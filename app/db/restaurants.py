@@ -1,57 +1,112 @@
 from __future__ import annotations
 import logging
-from typing import List, Optional, Dict, Any
+import os
+import time
+from typing import Iterator, List, Optional, Dict, Any
+from pydantic_core import to_json
+from app.cache.invalidation import InvalidationEvent, invalidation_bus
+from app.cache.shared_cache import backend_from_url
+from app.cache.single_flight import SingleFlight
+from app.cache.ttl_cache import TTLCache
+from app.cache.two_tier import TwoTierCache
 from app.clients.supabase import SupabaseClient
 from app.clients.yelp import YelpClient
+from app.db.restaurant_snapshot import price_tiers, restaurant_snapshot
+from app.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Restaurant detail cache shared by every RestaurantDB instance: an in-process LRU in front
+# of an optional cross-worker tier (RESTAURANT_CACHE_URL=redis://... or local://host:port)
+_RESTAURANT_CACHE_TTL = float(os.getenv("RESTAURANT_CACHE_TTL_SECONDS", "300"))
+restaurant_cache: TwoTierCache[Restaurant] = TwoTierCache(
+    namespace="restaurant",
+    local=TTLCache(ttl_seconds=_RESTAURANT_CACHE_TTL, max_size=5_000),
+    shared=backend_from_url(os.getenv("RESTAURANT_CACHE_URL")),
+    encode=lambda restaurant: to_json(restaurant, by_alias=True),
+    decode=lambda raw: Restaurant.model_validate_json(raw),
+    shared_ttl_seconds=_RESTAURANT_CACHE_TTL,
+)
+
+def _apply_restaurant_change(event: InvalidationEvent) -> None:
+    restaurant_cache.invalidate_local(*event.keys, version=event.version)
+    if event.deleted:
+        restaurant_snapshot.discard(*event.keys)
+    else:
+        restaurant_snapshot.wake()
+
+# Writes on any worker reach this worker's detail cache and snapshot
+invalidation_bus.subscribe("restaurant", _apply_restaurant_change)
+
+# Concurrent identical Yelp searches share one upstream call and one DB write
+search_flight = SingleFlight()
+
 class RestaurantDB:
     def __init__(self):
         self.supabase = SupabaseClient()
         self.yelp = YelpClient()
         logger.info("✅ RestaurantDB initialized")
 
+    @traced()
     async def create_restaurant(self, restaurant: Restaurant) -> Dict[str, Any]:
         """Create a new restaurant record."""
         try:
             data = restaurant.model_dump()
             self.supabase.store_restaurant(data)
-            logger.info(f"✅ Created restaurant {restaurant.name}")
+            await restaurant_cache.invalidate(restaurant.business_id)
+            invalidation_bus.publish("restaurant", restaurant.business_id)
+            logger.info("✅ Created restaurant %s", restaurant.name)
             return data
         except Exception as e:
-            logger.error(f"❌ Failed to create restaurant: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to create restaurant: %s", e, exc_info=True)
             raise Exception(f"Failed to create restaurant: {str(e)}")
 
+    @traced()
     async def get_restaurant(self, business_id: str) -> Optional[Restaurant]:
-        """Get a restaurant from storage, if not found fetch from Yelp."""
+        """Get a restaurant from cache or storage, if not found fetch from Yelp.
+
+        Returns a copy, so callers may modify it without touching the cached instance.
+        """
         try:
-            # Try database first
+            cached = await restaurant_cache.get(business_id)
+            if cached is not None:
+                return cached.model_copy()
+
+            # Try database next; a write announced after this read began keeps it out of the cache
+            read_at = time.time()
             stored = self.supabase.get_restaurant(business_id)
             if stored:
-                logger.info(f"✅ Found restaurant {business_id} in database")
-                return Restaurant(**stored)
+                logger.info("✅ Found restaurant %s in database", business_id)
+                restaurant = Restaurant(**stored)
+                await restaurant_cache.set(business_id, restaurant, version=read_at)
+                return restaurant.model_copy()
 
             # If not in database, get from Yelp
             restaurant = await self.yelp.get_business_details(business_id)
             if restaurant:
                 # Store it
                 await self.create_restaurant(restaurant)
-                logger.info(f"✅ Fetched and stored restaurant {business_id} from Yelp")
-                return restaurant
+                await restaurant_cache.set(business_id, restaurant)
+                logger.info("✅ Fetched and stored restaurant %s from Yelp", business_id)
+                return restaurant.model_copy()
 
-            logger.info(f"ℹ️ Restaurant {business_id} not found")
+            logger.info("ℹ️ Restaurant %s not found", business_id)
             return None
         except Exception as e:
-            logger.error(f"❌ Failed to get restaurant: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to get restaurant: %s", e, exc_info=True)
             raise Exception(f"Failed to get restaurant: {str(e)}")
 
+    @traced()
     async def search_restaurants(self, params: SearchParams) -> List[Restaurant]:
         """
-        Search for restaurants using the Yelp API
+        Search for restaurants using the Yelp API. Identical concurrent searches are coalesced.
         """
+        return await search_flight.do(params.normalized_key(), lambda: self._search_yelp(params))
+
+    @traced()
+    async def _search_yelp(self, params: SearchParams) -> List[Restaurant]:
         try:
-            logger.info(f"🔍 Searching Yelp with params: {params}")
+            logger.info("🔍 Searching Yelp with params: %s", params)
             restaurants = await self.yelp.search_businesses(
                 term=params.term,
                 location=params.location,
@@ -61,87 +116,105 @@ class RestaurantDB:
                 sort_by=params.sort_by
             )
             
-            logger.info(f"✅ Found {len(restaurants)} restaurants from Yelp")
+            logger.info("✅ Found %s restaurants from Yelp", len(restaurants))
             
-            # Store all restaurants in cache
-            for restaurant in restaurants:
+            # Store all restaurants in cache with a single write
+            if restaurants:
                 try:
-                    await self.create_restaurant(restaurant)
+                    self.bulk_upsert_restaurants(restaurants)
                 except Exception as store_error:
-                    logger.error(f"❌ Failed to cache restaurant {restaurant.name}: {str(store_error)}")
-                    # Continue with next restaurant even if one fails to cache
-                    continue
+                    logger.error("❌ Failed to cache Yelp results: %s", store_error)
                 
             return restaurants
             
         except Exception as e:
-            logger.error(f"❌ Failed to search Yelp: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to search Yelp: %s", e, exc_info=True)
             raise Exception(f"Yelp API search failed: {str(e)}")
 
+    @traced()
     async def search_cached_restaurants(self, params: SearchParams) -> List[Restaurant]:
         """
-        Search for restaurants in our database cache
+        Search for restaurants in our database cache. With the in-memory snapshot loaded,
+        matching and ranking happen there and only the requested page is decoded.
         """
         try:
-            logger.info(f"🔍 Searching cache with params: {params}")
-            # Use Supabase's built-in filtering
+            logger.info("🔍 Searching cache with params: %s", params)
+            if restaurant_snapshot.ready:
+                rows = restaurant_snapshot.search(params)
+                logger.info("✅ Found %s restaurants in snapshot", len(rows))
+                return decode_restaurant_rows(rows)
+            # Same filters, order and page as the snapshot search, done by Supabase
             restaurants = self.supabase.search_restaurants(
                 term=params.term,
                 location=params.location,
-                price=params.price,
-                categories=params.categories
+                prices=["$" * tier for tier in price_tiers(params.price)] if params.price else None,
+                categories=params.categories,
+                open_now=params.open_now,
+                by_rating=params.sort_by != "distance",
+                offset=params.offset or 0,
+                limit=params.limit,
             )
             
             if not restaurants:
                 logger.info("ℹ️ No results found in cache")
                 return []
                 
-            logger.info(f"✅ Found {len(restaurants)} restaurants in cache")
-            return [Restaurant(**r) for r in restaurants]
+            logger.info("✅ Found %s restaurants in cache", len(restaurants))
+            return decode_restaurant_rows(restaurants)
             
         except Exception as e:
-            logger.error(f"❌ Failed to search cache: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to search cache: %s", e, exc_info=True)
             raise Exception(f"Database search failed: {str(e)}")
 
+    @traced()
     async def update_restaurant(self, business_id: str, data: Dict[str, Any]) -> None:
         """Update a restaurant's information."""
         try:
-            logger.info(f"🔄 Updating restaurant {business_id} with new data")
+            logger.info("🔄 Updating restaurant %s with new data", business_id)
             self.supabase.update_restaurant(business_id, data)
-            logger.info(f"✅ Successfully updated restaurant {business_id}")
+            await restaurant_cache.invalidate(business_id)
+            invalidation_bus.publish("restaurant", business_id)
+            logger.info("✅ Successfully updated restaurant %s", business_id)
         except Exception as e:
-            logger.error(f"❌ Error updating restaurant {business_id}: {str(e)}", exc_info=True)
+            logger.error("❌ Error updating restaurant %s: %s", business_id, e, exc_info=True)
             raise Exception(f"Failed to update restaurant: {str(e)}")
 
+    @traced()
     def delete_restaurant(self, business_id: str) -> bool:
         """Delete a restaurant."""
         try:
             self.supabase.delete_restaurant(business_id)
-            logger.info(f"✅ Deleted restaurant {business_id}")
+            restaurant_cache.invalidate_nowait(business_id)
+            invalidation_bus.publish("restaurant", business_id, deleted=True)
+            logger.info("✅ Deleted restaurant %s", business_id)
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to delete restaurant: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to delete restaurant: %s", e, exc_info=True)
             raise Exception(f"Failed to delete restaurant: {str(e)}")
 
+    @traced()
     def bulk_upsert_restaurants(self, restaurants: List[Restaurant]) -> List[Dict[str, Any]]:
         """Bulk upsert restaurants (insert or update based on business_id)."""
         try:
             data = [rest.model_dump() for rest in restaurants]
             self.supabase.bulk_upsert_restaurants(data)
-            logger.info(f"✅ Bulk upserted {len(restaurants)} restaurants")
+            restaurant_cache.invalidate_nowait(*(rest.business_id for rest in restaurants))
+            invalidation_bus.publish("restaurant", *(rest.business_id for rest in restaurants))
+            logger.info("✅ Bulk upserted %s restaurants", len(restaurants))
             return data
         except Exception as e:
-            logger.error(f"❌ Failed to bulk upsert restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to bulk upsert restaurants: %s", e, exc_info=True)
             raise Exception(f"Failed to bulk upsert restaurants: {str(e)}")
 
+    @traced()
     async def search_by_phone(self, phone: str) -> List[Restaurant]:
         """Search restaurants by phone number."""
         try:
             # First check database
             stored = self.supabase.search_by_phone(phone)
             if stored:
-                logger.info(f"✅ Found {len(stored)} restaurants in database with phone {phone}")
-                return [Restaurant(**r) for r in stored]
+                logger.info("✅ Found %s restaurants in database with phone %s", len(stored), phone)
+                return decode_restaurant_rows(stored)
 
             # If not in database, search Yelp
             restaurants = await self.yelp.search_by_phone(phone)
@@ -151,27 +224,92 @@ class RestaurantDB:
                 try:
                     await self.create_restaurant(restaurant)
                 except Exception as store_error:
-                    logger.error(f"❌ Failed to cache restaurant {restaurant.name}: {str(store_error)}")
+                    logger.error("❌ Failed to cache restaurant %s: %s", restaurant.name, store_error)
                     # Continue with next restaurant even if one fails to cache
                     continue
                 
-            logger.info(f"✅ Found {len(restaurants)} restaurants with phone {phone}")
+            logger.info("✅ Found %s restaurants with phone %s", len(restaurants), phone)
             return restaurants
         except Exception as e:
-            logger.error(f"❌ Failed to search by phone: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to search by phone: %s", e, exc_info=True)
             raise Exception(f"Failed to search by phone: {str(e)}")
 
+    @traced()
+    def get_stored_by_phone(self, phone: str) -> List[Restaurant]:
+        """Stored restaurants sharing a phone number, without falling back to Yelp."""
+        return decode_restaurant_rows(self.supabase.search_by_phone(phone))
+
+    @traced()
+    def get_stored_version(self, business_id: str) -> Optional[Dict[str, Any]]:
+        """The stored row's updated_at ({"updated_at": ...}), or None if it isn't stored.
+
+        For conditional GETs, so a match skips reading the restaurant. The snapshot is
+        used when ready; it trails writes no further than this worker's restaurant cache
+        does, as both are invalidated by the same announcements.
+        """
+        if restaurant_snapshot.ready:
+            row = restaurant_snapshot.row(business_id)
+            if row is not None:
+                return {"updated_at": row.get("updated_at")}
+        return self.supabase.get_restaurant(business_id, columns="updated_at")
+
+    @traced()
+    def get_stored_rows_by_ids(self, business_ids: List[str], columns: str = "*") -> List[Dict[str, Any]]:
+        """Raw stored rows for a batch of restaurants; IDs that aren't stored are left out."""
+        return self.supabase.get_restaurants_by_ids(list(dict.fromkeys(business_ids)), columns)
+
+    @traced()
     def get_cached_restaurants(self, limit: Optional[int] = None) -> List[Restaurant]:
         """Get restaurants from the database cache."""
+        return decode_restaurant_rows(self.get_cached_restaurant_rows(limit))
+
+    @traced()
+    def get_cached_restaurant_rows(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get raw restaurant rows from the database cache, for callers that batch-decode them."""
         try:
             logger.info("🔍 Getting cached restaurants...")
+            if restaurant_snapshot.ready:
+                return restaurant_snapshot.rows(limit)
             stored = self.supabase.get_restaurants(limit)
-            logger.info(f"✅ Found {len(stored)} cached restaurants")
-            return [Restaurant(**r) for r in stored]
+            logger.info("✅ Found %s cached restaurants", len(stored))
+            return stored
         except Exception as e:
-            logger.error(f"❌ Failed to get cached restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to get cached restaurants: %s", e, exc_info=True)
             raise Exception(f"Failed to get cached restaurants: {str(e)}")
 
+    def iter_cached_restaurant_rows(
+        self, chunk_size: int = 500, limit: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield raw restaurant rows in keyset-paginated chunks, up to `limit` rows in total."""
+        last_id = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            rows = self.supabase.get_restaurants_after(last_id, size)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < size:
+                return
+            last_id = rows[-1]["business_id"]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def iter_restaurant_rows_updated_after(
+        self, updated_after: str, chunk_size: int = 500
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield raw rows updated (or created) after `updated_after`, oldest change first, in keyset chunks."""
+        position = (updated_after, None)
+        while True:
+            rows = self.supabase.get_restaurants_updated_after(*position, chunk_size)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            position = (rows[-1]["updated_at"], rows[-1]["business_id"])
+
+    @traced()
     def get_stored_restaurants(self, limit: Optional[int] = None) -> List[Restaurant]:
         """Get all restaurants from storage."""
         try:
@@ -196,29 +334,30 @@ class RestaurantDB:
                     restaurant = Restaurant(**data)
                     restaurants.append(restaurant)
                 except Exception as e:
-                    logger.error(f"⚠️ Error formatting restaurant {data.get('business_id')}: {str(e)}")
+                    logger.error("⚠️ Error formatting restaurant %s: %s", data.get('business_id'), e)
                     continue
             
             if limit:
                 restaurants = restaurants[:limit]
                 
-            logger.info(f"✅ Found {len(restaurants)} stored restaurants")
+            logger.info("✅ Found %s stored restaurants", len(restaurants))
             return restaurants
         except Exception as e:
-            logger.error(f"❌ Failed to get stored restaurants: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to get stored restaurants: %s", e, exc_info=True)
             raise Exception(f"Failed to get stored restaurants: {str(e)}")
             
+    @traced()
     def get_restaurants_without_hours(self) -> List[Dict[str, Any]]:
         try:
             logger.info("🔍 Getting restaurants without hours...")
             restaurants = self.supabase.get_restaurants_without_hours()
-            logger.info(f"✅ Found {len(restaurants)} restaurants without hours")
+            logger.info("✅ Found %s restaurants without hours", len(restaurants))
             return restaurants
         except Exception as e:
-            logger.error(f"❌ Failed to get restaurants without hours: {str(e)}", exc_info=True)
+            logger.error("❌ Failed to get restaurants without hours: %s", e, exc_info=True)
             raise Exception(f"Failed to get restaurants without hours: {str(e)}")
 
 # Import models at the bottom
-from app.models import Restaurant, SearchParams
+from app.models import Restaurant, SearchParams, decode_restaurant_rows
 
 # No need for update_forward_refs() since we're not defining any Pydantic models in this file
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""Keeps the shared restaurant snapshot file current; run one per host next to the workers:
+
+    python -m app.db.snapshot_refresher --path /dev/shm/restaurants.snapshot
+
+Workers with RESTAURANT_SNAPSHOT_FILE set to the same path map the file read-only (see
+app/db/restaurant_snapshot.py) instead of each loading the table from Supabase, so memory
+per worker stays flat as workers are added and a new worker is warm as soon as it starts.
+"""
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Same environment as the app, read before any module looks at it
+load_dotenv(Path(__file__).resolve().parent.parent.parent / ".env")
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from app.cache.invalidation import InvalidationEvent, invalidation_bus
+from app.db.operating_hours import OperatingHoursDB
+from app.db.restaurant_snapshot import MappedColumns, RestaurantSnapshot, np, parse_timestamp, write_snapshot_file
+from app.db.restaurants import RestaurantDB
+from app.metrics import restaurant_snapshot_refreshes
+from app.structured_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+class SnapshotRefresher:
+    """Tracks restaurants and their hours like a worker's in-memory snapshot does (a full
+    load every `full_reload_seconds`, deltas by updated_at between) and writes the file
+    again as the next generation whenever either changed.
+
+    Writes announced on the invalidation bus wake it at once, at most every
+    `min_interval_seconds`, so workers see them within a file poll or two.
+    """
+
+    def __init__(self, path: str, restaurant_db: RestaurantDB, hours_db: OperatingHoursDB,
+                 refresh_seconds: float = 30.0, full_reload_seconds: float = 3600.0,
+                 overlap_seconds: float = 5.0, chunk_size: int = 1000, min_interval_seconds: float = 1.0):
+        self.path = path
+        self.restaurant_db = restaurant_db
+        self.hours_db = hours_db
+        self.snapshot = RestaurantSnapshot(
+            refresh_seconds=refresh_seconds, full_reload_seconds=full_reload_seconds,
+            overlap_seconds=overlap_seconds, chunk_size=chunk_size,
+        )
+        self.min_interval_seconds = min_interval_seconds
+        self.hours: Dict[str, Dict[str, Any]] = {}
+        self.generation = self._existing_generation(path)
+        self._hours_watermark: Optional[datetime] = None
+        self._loaded_at = float("-inf")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def _existing_generation(path: str) -> int:
+        # Carry on from the file already there, so generations only grow across restarts
+        try:
+            return MappedColumns(path).generation
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def refresh(self, full: bool) -> bool:
+        """Bring restaurants and hours up to date; returns whether a new version was written."""
+        before = self.snapshot.generation
+        if full:
+            self.snapshot.load(self.restaurant_db)
+            self._load_hours()
+            self._loaded_at = time.monotonic()
+        else:
+            hours_changed = self._read_hours()
+            self.snapshot.refresh(self.restaurant_db)
+            if not hours_changed and self.snapshot.generation == before:
+                return False
+        self.write()
+        return True
+
+    def _load_hours(self) -> None:
+        started_at = datetime.now(timezone.utc)
+        hours: Dict[str, Dict[str, Any]] = {}
+        for chunk in self.hours_db.iter_hours_updated_after(_EPOCH.isoformat(), self.snapshot.chunk_size):
+            for row in chunk:
+                hours[row["restaurant_id"]] = row
+        newest = max(filter(None, (parse_timestamp(row.get("updated_at")) for row in hours.values())), default=None)
+        self.hours = hours
+        self._hours_watermark = min(newest, started_at) if newest else started_at
+
+    def _read_hours(self) -> int:
+        """Apply hours changed since the last read; returns how many changed."""
+        since = self._hours_watermark - timedelta(seconds=self.snapshot.overlap_seconds)
+        changed = 0
+        for chunk in self.hours_db.iter_hours_updated_after(since.isoformat(), self.snapshot.chunk_size):
+            for row in chunk:
+                # The overlap reads some rows again; only count real changes
+                if self.hours.get(row["restaurant_id"]) != row:
+                    self.hours[row["restaurant_id"]] = row
+                    changed += 1
+                updated_at = parse_timestamp(row.get("updated_at"))
+                if updated_at and updated_at > self._hours_watermark:
+                    self._hours_watermark = updated_at
+        return changed
+
+    def write(self) -> None:
+        start_time = time.perf_counter()
+        rows = self.snapshot.rows()
+        size = write_snapshot_file(self.path, rows, self.hours, self.generation + 1, self.snapshot.watermark)
+        self.generation += 1
+        logger.info(
+            "💾 Wrote restaurant snapshot generation %s: %s rows, %s hours, %.1f MB in %.2fs",
+            self.generation, len(rows), len(self.hours), size / 1e6, time.perf_counter() - start_time,
+        )
+
+    def wake(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _apply_change(self, event: InvalidationEvent) -> None:
+        if event.entity == "restaurant" and event.deleted:
+            self.snapshot.discard(*event.keys)
+        self.wake()
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        invalidation_bus.subscribe("restaurant", self._apply_change)
+        invalidation_bus.subscribe("hours", self._apply_change)
+        while True:
+            full = time.monotonic() - self._loaded_at >= self.snapshot.full_reload_seconds
+            kind = "full" if full else "delta"
+            try:
+                await asyncio.to_thread(self.refresh, full)
+                restaurant_snapshot_refreshes.inc(kind=kind, outcome="ok")
+            except Exception as e:
+                restaurant_snapshot_refreshes.inc(kind=kind, outcome="error")
+                logger.error("❌ Restaurant snapshot file %s refresh failed: %s", kind, e)
+            await asyncio.sleep(self.min_interval_seconds)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.snapshot.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+async def _main(args: argparse.Namespace) -> None:
+    refresher = SnapshotRefresher(
+        args.path, RestaurantDB(), OperatingHoursDB(),
+        refresh_seconds=args.refresh_seconds, full_reload_seconds=args.full_reload_seconds,
+    )
+    if args.once:
+        await asyncio.to_thread(refresher.refresh, True)
+        return
+    await invalidation_bus.start()
+    try:
+        await refresher.run()
+    finally:
+        await invalidation_bus.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the restaurant snapshot file workers map")
+    parser.add_argument("--path", default=os.getenv("RESTAURANT_SNAPSHOT_FILE"),
+                        required=not os.getenv("RESTAURANT_SNAPSHOT_FILE"))
+    parser.add_argument("--refresh-seconds", type=float,
+                        default=float(os.getenv("RESTAURANT_SNAPSHOT_REFRESH_SECONDS", "30")))
+    parser.add_argument("--full-reload-seconds", type=float,
+                        default=float(os.getenv("RESTAURANT_SNAPSHOT_FULL_RELOAD_SECONDS", "3600")))
+    parser.add_argument("--once", action="store_true", help="write one version and exit")
+    args = parser.parse_args()
+    configure_logging()
+    if np is None:
+        parser.error("numpy is required to write the restaurant snapshot")
+    asyncio.run(_main(args))
@@ -1,9 +1,14 @@
 from __future__ import annotations
 import logging
+import os
+import time
 from typing import Dict, Optional
 from datetime import datetime
 from pydantic import BaseModel
+from app.cache.invalidation import InvalidationEvent, invalidation_bus
+from app.cache.ttl_cache import TTLCache
 from app.clients.supabase import SupabaseClient
+from app.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +20,36 @@ class User(BaseModel):
     search_credits: int = 0  # smallint in db
     is_premium: bool = False
 
+class UserStatus(BaseModel):
+    """The parts of a user record the search path needs"""
+    search_credits: int = 0
+    is_premium: bool = False
+
+class SearchCreditResult(UserStatus):
+    """Outcome of an atomic credit consumption"""
+    permitted: bool
+
+# Per-process cache of user status, shared by every UserDB instance
+user_status_cache: TTLCache[UserStatus] = TTLCache(
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+    max_size=10_000
+)
+
+def _apply_user_change(event: InvalidationEvent) -> None:
+    for user_id in event.keys:
+        user_status_cache.invalidate(user_id, version=event.version)
+
+# Credit and premium changes on any worker reach this worker's cache
+invalidation_bus.subscribe("user", _apply_user_change)
+
 class UserDB:
     TABLE_NAME = "user_table"
+    CONSUME_CREDIT_RPC = "consume_search_credit"  # see supabase/migrations
 
     def __init__(self):
         self.supabase = SupabaseClient()
 
+    @traced()
     async def create_user(self, user_data: Dict):
         try:
             # Add timestamps
@@ -31,48 +60,68 @@ class UserDB:
                 user_data["search_credits"] = 3
             
             response =  self.supabase.client.table(self.TABLE_NAME).upsert(user_data).execute()
-            logger.info(f"✅ User created/updated successfully: {user_data['user_id']}")
+            invalidation_bus.publish("user", user_data["user_id"])
+            logger.info("✅ User created/updated successfully: %s", user_data['user_id'])
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to create user: {str(e)}")
+            logger.error("❌ Failed to create user: %s", e)
             return False
 
+    @traced()
     async def get_user(self, user_id: str) -> Optional[User]:
         try:
+            read_at = time.time()
             response = self.supabase.client.table(self.TABLE_NAME).select("*").eq('user_id', user_id).execute()
             if response.data and len(response.data) > 0:
-                return User(**response.data[0])
+                user = User(**response.data[0])
+                user_status_cache.set(user_id, UserStatus(
+                    search_credits=user.search_credits, is_premium=user.is_premium
+                ), version=read_at)
+                return user
             return None
         except Exception as e:
-            logger.error(f"❌ Failed to get user: {str(e)}")
+            logger.error("❌ Failed to get user: %s", e)
             return None
 
-    async def is_search_permitted(self, user_id: str) -> bool:
+    @traced()
+    async def consume_search_credit(self, user_id: str) -> Optional[SearchCreditResult]:
+        """Consume one search credit (premium users are never charged) in a single atomic RPC."""
         try:
-            user = await self.get_user(user_id)
-            logger.info(f"🔍 Checking search credits for user {user_id}")
-            logger.info(f"✅ User info: {user}")
-            
-            if not user:
-                logger.error(f"❌ User {user_id} not found")
-                return False
-                
-            if user.is_premium:
-                logger.info(f"✅ User {user_id} is premium")
-                return True
-                
-            if user.search_credits > 0:
-                logger.info(f"✅ User {user_id} has {user.search_credits} search credits")
-                self.supabase.client.table(self.TABLE_NAME).update({
-                    'search_credits': user.search_credits - 1,
-                    'updated_at': 'now()',
-                    'is_premium': user.is_premium
-                }).eq('user_id', user_id).execute()
-                return True
-                
-            logger.info(f"❌ User {user_id} does not have enough search credits")
-            return False
-            
+            response = self.supabase.client.rpc(
+                self.CONSUME_CREDIT_RPC, {"p_user_id": user_id}
+            ).execute()
+            if not response.data:
+                user_status_cache.invalidate(user_id)
+                return None
+            result = SearchCreditResult(**response.data[0])
+            # Other workers drop their copy; this one writes through so the next search
+            # sees the new balance / premium flag
+            version = invalidation_bus.publish("user", user_id)
+            user_status_cache.set(user_id, UserStatus(
+                search_credits=result.search_credits, is_premium=result.is_premium
+            ), version=version)
+            return result
         except Exception as e:
-            logger.error(f"❌ Failed to check search permission: {str(e)}", exc_info=True)
-            return False
\ No newline at end of file
+            logger.error("❌ Failed to consume search credit: %s", e, exc_info=True)
+            return None
+
+    @traced()
+    async def is_search_permitted(self, user_id: str) -> bool:
+        """Check and consume a search credit. Call once per search."""
+        # Premium users never spend credits, so a cached premium flag needs no round trip
+        cached = user_status_cache.get(user_id)
+        if cached and cached.is_premium:
+            return True
+
+        result = await self.consume_search_credit(user_id)
+        if not result:
+            logger.error("❌ User %s not found or credit check failed", user_id)
+            return False
+        if not result.permitted:
+            logger.info("❌ User %s does not have enough search credits", user_id)
+            return False
+        logger.info(
+            "✅ User %s search permitted (premium=%s, credits left=%s)",
+            user_id, result.is_premium, result.search_credits,
+        )
+        return True
@@ -0,0 +1,82 @@
+from __future__ import annotations
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.clients.google_custom_search import GoogleCustomImageSearch
+    from app.clients.vapi import VAPIClient
+    from app.db.call_jobs import CallJobDB
+    from app.db.call_slots import CallSlotStatsDB
+    from app.db.operating_hours import OperatingHoursDB
+    from app.db.phone_calls import PhoneCallDB
+    from app.db.restaurants import RestaurantDB
+    from app.db.users import UserDB
+
+logger = logging.getLogger(__name__)
+
+# Process-wide services. Nothing here is built at import: each is created on first use
+# (normally by init_services() in the app lifespan) and then shared. Routes take them
+# through Depends(...), so they can be swapped with app.dependency_overrides.
+
+@lru_cache(maxsize=None)
+def get_restaurant_db() -> RestaurantDB:
+    from app.db.restaurants import RestaurantDB
+    return RestaurantDB()
+
+@lru_cache(maxsize=None)
+def get_operating_hours_db() -> OperatingHoursDB:
+    from app.db.operating_hours import OperatingHoursDB
+    return OperatingHoursDB()
+
+@lru_cache(maxsize=None)
+def get_user_db() -> UserDB:
+    from app.db.users import UserDB
+    return UserDB()
+
+@lru_cache(maxsize=None)
+def get_call_job_db() -> CallJobDB:
+    from app.db.call_jobs import CallJobDB
+    return CallJobDB()
+
+@lru_cache(maxsize=None)
+def get_phone_call_db() -> PhoneCallDB:
+    from app.db.phone_calls import PhoneCallDB
+    return PhoneCallDB()
+
+@lru_cache(maxsize=None)
+def get_call_slot_stats_db() -> CallSlotStatsDB:
+    from app.db.call_slots import CallSlotStatsDB
+    return CallSlotStatsDB()
+
+@lru_cache(maxsize=None)
+def get_vapi_client() -> VAPIClient:
+    from app.clients.vapi import VAPIClient
+    return VAPIClient()
+
+@lru_cache(maxsize=None)
+def get_image_search() -> GoogleCustomImageSearch:
+    from app.clients.google_custom_search import GoogleCustomImageSearch
+    return GoogleCustomImageSearch()
+
+SERVICES = (
+    get_restaurant_db, get_operating_hours_db, get_user_db, get_call_job_db,
+    get_phone_call_db, get_call_slot_stats_db, get_vapi_client, get_image_search,
+)
+
+def init_services() -> None:
+    """Build every service up front so missing configuration fails at startup, not on a request."""
+    from app.auth.clerk import get_clerk_secret_key
+    get_clerk_secret_key()
+    for provider in SERVICES:
+        service = provider()
+        # Connect now rather than on the first request
+        supabase = getattr(service, "supabase", None)
+        if supabase is not None:
+            supabase.connect()
+    logger.info("✅ Services initialized")
+
+def reset_services() -> None:
+    """Forget built services, e.g. after the environment changed."""
+    for provider in SERVICES:
+        provider.cache_clear()
@@ -1,38 +1,130 @@
-from fastapi import FastAPI, BackgroundTasks, Depends, Request
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Read .env once, before any module looks at the environment
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 import asyncio
 import logging
 import os
 import time
-from .routers import restaurants, vapi, users
-from .db.restaurants import RestaurantDB
-from .clients.vapi import VAPIClient
+from .routers import restaurants, vapi, users, admin
+from .cache.invalidation import invalidation_bus
+from .db.restaurants import restaurant_cache, search_flight
+from .db.restaurant_snapshot import restaurant_snapshot
+from .db.users import user_status_cache
+from .dependencies import (
+    get_call_job_db,
+    get_call_slot_stats_db,
+    get_operating_hours_db,
+    get_phone_call_db,
+    get_restaurant_db,
+    get_vapi_client,
+    init_services,
+)
+from .services.call_dispatcher import CallDispatcher
+from .services.call_events import call_poller
 from app.middleware.auth import ClerkAuthMiddleware
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    force=True
+from app.responses import MIN_COMPRESS_SIZE
+from app.structured_logging import configure_logging, dropped_records
+from app.tracing import start_trace
+from app.metrics import (
+    http_request_duration,
+    http_requests_in_flight,
+    registry as metrics_registry,
 )
+
+# Configure logging: records are formatted and written by a background thread
+configure_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are built here rather than at import, so importing the app is cheap and
+    # needs no credentials; missing configuration still fails before serving traffic.
+    start_time = time.perf_counter()
+    await asyncio.to_thread(init_services)
+    # Writes on other workers invalidate this worker's caches from here on
+    await invalidation_bus.start()
+
+    # Hours-verification calls; any number of workers can run this, leases keep them apart
+    dispatcher = None
+    if os.getenv("DISPATCH_ENABLED", "true").lower() in ("1", "true", "yes"):
+        dispatcher = CallDispatcher.from_env(
+            get_call_job_db(), get_vapi_client(), get_restaurant_db(), get_operating_hours_db(),
+            get_phone_call_db(), get_call_slot_stats_db(),
+        )
+        dispatcher.start()
+    app.state.dispatcher = dispatcher
+    # Loads in the background; listing and cached search read Supabase until it's ready
+    restaurant_snapshot.start(get_restaurant_db())
+    logger.info("🚀 Startup complete in %.2fs", time.perf_counter() - start_time)
+    yield
+    if dispatcher:
+        await dispatcher.stop()
+    await call_poller.stop()
+    await restaurant_snapshot.stop()
+    await invalidation_bus.stop()
+
 app = FastAPI(
     title="Restaurant Holiday Hours API",
     docs_url="/api/docs",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan
 )
 
 auth = ClerkAuthMiddleware()
 
+# Compress everything else; responses that negotiated their own encoding (conditional JSON,
+# streamed NDJSON) pass through untouched.
+# Registered before the http middlewares so it sees complete bodies and can apply minimum_size.
+app.add_middleware(GZipMiddleware, minimum_size=MIN_COMPRESS_SIZE)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    duration = time.time() - start_time
+    start_time = time.perf_counter()
+    http_requests_in_flight.inc()
+    status_code = 500
+    trace_id = None
+    try:
+        with start_trace(
+            f"{request.method} {request.url.path}",
+            traceparent=request.headers.get("traceparent"),
+            method=request.method,
+            path=request.url.path,
+        ) as span:
+            response = await call_next(request)
+            status_code = response.status_code
+            if span is not None:
+                trace_id = span.trace.trace_id
+                span.set_attribute("status", status_code)
+                response.headers["X-Trace-Id"] = trace_id
+    finally:
+        http_requests_in_flight.dec()
+        duration = time.perf_counter() - start_time
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            duration,
+            route=getattr(route, "path", "unmatched"),
+            method=request.method,
+            status=str(status_code),
+        )
     logger.info(
-        f"Method: {request.method} Path: {request.url.path} "
-        f"Status: {response.status_code} Duration: {duration:.2f}s"
+        "Method: %s Path: %s Status: %s Duration: %.2fs",
+        request.method, request.url.path, status_code, duration,
+        extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "trace_id": trace_id,
+        }
     )
     return response
 
@@ -53,47 +145,49 @@ app.add_middleware(
 app.include_router(restaurants.router, prefix="/api/restaurants", tags=["restaurants"])
 app.include_router(vapi.router, prefix="/api/vapi", tags=["vapi"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/stats")
+async def cache_stats():
+    return {
+        "user_status_cache": user_status_cache.stats(),
+        "restaurant_cache": {
+            **restaurant_cache.local.stats(), "shared_hits": restaurant_cache.shared_hits
+        },
+        "search_single_flight": search_flight.stats(),
+        "restaurant_snapshot": restaurant_snapshot.stats(),
+    }
+
+def _collect_cache_metrics():
+    for name, stats in (
+        ("user_status", user_status_cache.stats()),
+        ("restaurant", restaurant_cache.local.stats()),
+    ):
+        yield "cache_hits", "Cache hits by cache", {"cache": name}, stats["hits"]
+        yield "cache_misses", "Cache misses by cache", {"cache": name}, stats["misses"]
+        yield "cache_entries", "Entries currently cached", {"cache": name}, stats["size"]
+    yield ("cache_shared_hits", "Hits served by the shared cache tier",
+           {"cache": "restaurant"}, restaurant_cache.shared_hits)
+    flight = search_flight.stats()
+    yield "search_single_flight_leaders", "Yelp searches actually executed", {}, flight["leaders"]
+    yield "search_single_flight_followers", "Yelp searches served by a concurrent leader", {}, flight["followers"]
+    yield "search_single_flight_coalescing_ratio", "Fraction of Yelp searches coalesced", {}, flight["coalescing_ratio"]
+    yield "log_records_dropped", "Log records dropped because the queue was full", {}, dropped_records()
+
+metrics_registry.add_collector(_collect_cache_metrics)
+
+@app.get("/api/metrics")
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/me")
 async def get_user_profile(token: str = Depends(auth)):
     return {"token": token}
 
-async def call_dispatch_loop():
-    while True:
-        try:
-            await dispatch_calls()
-        except Exception as e:
-            logger.error(f"Error in dispatch loop: {str(e)}")
-        await asyncio.sleep(60)  # Wait for 60 seconds before next dispatch
-
-async def dispatch_calls():
-    try:
-        db = RestaurantDB()
-        restaurants = db.get_restaurants_without_hours()
-        
-        if not restaurants:
-            return
-            
-        vapi_client = VAPIClient()
-        for restaurant in restaurants:
-            try:
-                await vapi_client.get_restaurant_hours(restaurant["business_id"])
-            except Exception as e:
-                logger.error(f"Failed to get hours for {restaurant['business_id']}: {str(e)}")
-                continue
-                
-    except Exception as e:
-        logger.error(f"Failed to dispatch calls: {str(e)}")
-
-@app.on_event("startup")
-async def startup_event():
-    background_tasks = BackgroundTasks()
-    background_tasks.add_task(call_dispatch_loop)
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,230 @@
+"""In-process Prometheus-style metrics.
+
+Recording is a dict lookup plus an increment under a lock, so it's cheap enough for the
+hot path. Everything is rendered in the text exposition format at `/api/metrics`.
+"""
+from __future__ import annotations
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last)], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), total[0]) for k, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(
+        self, collector: Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]
+    ) -> None:
+        """Register a scrape-time callback yielding (name, help, labels, value) gauge samples."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        # Group collector samples by name: a metric family's lines must be contiguous
+        families: Dict[str, Tuple[str, List[str]]] = {}
+        for collector in self._collectors:
+            for name, documentation, labels, value in collector():
+                sample = f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}"
+                families.setdefault(name, (documentation, []))[1].append(sample)
+        for name, (documentation, samples) in families.items():
+            lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge"])
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# HTTP server
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template, method and status",
+    ("route", "method", "status"),
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled"
+)
+http_requests_in_flight.set(0)
+
+# Outbound calls
+upstream_request_duration = registry.histogram(
+    "upstream_request_duration_seconds", "Outbound call latency by upstream and outcome",
+    ("upstream", "outcome"),
+)
+
+# Search path and call dispatch
+restaurant_searches = registry.counter(
+    "restaurant_search_total", "Searches by where results came from (cache, yelp, empty, denied)",
+    ("source",),
+)
+cache_invalidations = registry.counter(
+    "cache_invalidations_total", "Cross-worker cache invalidations by entity and direction (sent, received, failed)",
+    ("entity", "direction"),
+)
+restaurant_snapshot_rows = registry.gauge(
+    "restaurant_snapshot_rows", "Restaurants in this worker's snapshot (in memory or mapped)"
+)
+restaurant_snapshot_rows.set(0)
+restaurant_snapshot_refreshes = registry.counter(
+    "restaurant_snapshot_refreshes_total", "Snapshot refreshes by kind (full, delta, mapped) and outcome (ok, error)",
+    ("kind", "outcome"),
+)
+dispatch_queue_depth = registry.gauge(
+    "dispatch_queue_depth", "Call jobs waiting to be dialed"
+)
+dispatch_queue_depth.set(0)
+dispatch_calls_in_flight = registry.gauge(
+    "dispatch_calls_in_flight", "Calls this worker currently has in progress"
+)
+dispatch_calls_in_flight.set(0)
+dispatch_jobs = registry.counter(
+    "dispatch_jobs_total", "Finished call job attempts by outcome (succeeded, retried, deferred, failed, released)",
+    ("outcome",),
+)
+call_attempts = registry.counter(
+    "call_attempts_total", "Finished calls by whether they were answered, feeding the call scheduler",
+    ("answered",),
+)
+
+# VAPI call completion
+vapi_webhook_events = registry.counter(
+    "vapi_webhook_events_total",
+    "VAPI webhook events by type and outcome (waiter, persisted, parsed, wrapped_up, ignored)",
+    ("type", "outcome"),
+)
+call_early_ends = registry.counter(
+    "call_early_ends_total", "Calls wrapped up once the live transcript had what we needed (captured, withdrawn)",
+    ("reason",),
+)
+vapi_call_completions = registry.counter(
+    "vapi_call_completions_total", "Finished calls by how the result arrived (webhook, poll)",
+    ("source",),
+)
+vapi_poll_requests = registry.counter(
+    "vapi_poll_requests_total", "Requests the call poller made, one call (get) or many (list)",
+    ("kind",),
+)
+vapi_calls_tracked = registry.gauge(
+    "vapi_calls_tracked", "In-flight calls the call poller is watching"
+)
+vapi_calls_tracked.set(0)
+
+def observe_upstream(upstream: str, seconds: float, status: Optional[int] = None) -> None:
+    """Record one outbound call; `status` None means it failed before a response."""
+    if status is None:
+        outcome = "error"
+    else:
+        outcome = f"{status // 100}xx"
+    upstream_request_duration.observe(seconds, upstream=upstream, outcome=outcome)
@@ -3,6 +3,7 @@ from fastapi import Request, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import logging
 from app.auth.clerk import verify_auth_token
+from app.tracing import start_span
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +15,15 @@ class ClerkAuthMiddleware(HTTPBearer):
     async def __call__(
         self, request: Request
     ) -> Optional[HTTPAuthorizationCredentials]:
+        with start_span("ClerkAuthMiddleware"):
+            return await self._authenticate(request)
+
+    async def _authenticate(self, request: Request) -> Optional[HTTPAuthorizationCredentials]:
         try:
             # Skip auth for health check and other public endpoints
             public_paths = {"/api/health", "/api/docs", "/api/openapi.json", "/openapi.json"}
             if request.url.path in public_paths:
-                logger.info(f"ℹ️ Skipping auth for public path: {request.url.path}")
+                logger.info("ℹ️ Skipping auth for public path: %s", request.url.path)
                 return None
 
             # Get credentials
@@ -49,13 +54,13 @@ class ClerkAuthMiddleware(HTTPBearer):
 
             # Add user data to request state for use in route handlers
             request.state.user = user_data
-            logger.info(f"✅ Request authenticated successfully for user {user_data['user_id']}")
+            logger.info("✅ Request authenticated successfully for user %s", user_data.user_id)
             return credentials
 
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"❌ Authentication error: {str(e)}")
+            logger.error("❌ Authentication error: %s", e)
             raise HTTPException(
                 status_code=401,
                 detail="Authentication failed"
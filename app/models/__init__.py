@@ -5,10 +5,15 @@ from .base import (
     Coordinates,
     Location,
     Category,
+    HoursInterval,
+    HoursOverride,
+    StructuredHours,
     OperatingHours,
     Restaurant,
     RestaurantWithHours,
-    SearchParams
+    SearchParams,
+    decode_restaurant_rows,
+    decode_restaurant_rows_with_hours
 )
 
 # Import everything from vapi.py
@@ -22,17 +27,20 @@ from .vapi import (
     VAPICallRequest,
     VAPICallResponse,
     BusinessHoursResponse,
-    CallAnalysisResponse
+    CallAnalysisResponse,
+    CheckHoursBatchRequest
 )
 
 # Re-export all models
 __all__ = [
     # Restaurant models
-    'Coordinates', 'Location', 'Category', 'OperatingHours',
+    'Coordinates', 'Location', 'Category', 'HoursInterval', 'HoursOverride',
+    'StructuredHours', 'OperatingHours',
     'Restaurant', 'RestaurantWithHours', 'SearchParams',
+    'decode_restaurant_rows', 'decode_restaurant_rows_with_hours',
     
     # VAPI models
     'PhoneNumber', 'Customer', 'Assistant', 'Squad', 'Cost',
     'Message', 'VAPICallRequest', 'VAPICallResponse',
-    'BusinessHoursResponse', 'CallAnalysisResponse'
+    'BusinessHoursResponse', 'CallAnalysisResponse', 'CheckHoursBatchRequest'
 ]
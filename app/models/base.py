@@ -1,7 +1,36 @@
 from __future__ import annotations
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
-from datetime import datetime
+from pydantic import BaseModel, Field, TypeAdapter, field_validator, model_validator
+from typing import Any, List, Optional, Dict
+from datetime import date, datetime
+import re
+import struct
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+_TIME_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*m?\.?\s*$", re.IGNORECASE)
+
+def parse_time_to_minutes(value: str) -> int:
+    """Parse '10:00 AM', '10am', '22:30', 'noon' or 'midnight' into minutes after midnight."""
+    text = value.strip().lower()
+    if text == "noon":
+        return 12 * 60
+    if text == "midnight":
+        return 0
+    match = _TIME_RE.match(text)
+    if not match:
+        raise ValueError(f"Unrecognized time: {value!r}")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid 12-hour time: {value!r}")
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if hour > 24 or minute > 59 or (hour == 24 and minute):
+        raise ValueError(f"Invalid time: {value!r}")
+    return hour * 60 + minute
+
+def format_minutes(minutes: int) -> str:
+    """Format minutes after midnight as 24-hour 'HH:MM'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
 
 class Coordinates(BaseModel):
     latitude: float
@@ -21,12 +50,204 @@ class Category(BaseModel):
     alias: str
     title: str
 
+# Packed hours layout (little-endian): version byte, then per weekday a count byte followed by
+# (open, close) uint16 minute pairs, 0xFF marking a weekday with no known hours; then an override count (uint16) and per override the
+# date ordinal (uint32), a closed flag byte, a name length byte + UTF-8 name and its intervals.
+_HOURS_PACK_VERSION = 1
+_NO_INTERVALS = 0xFF
+
+class HoursInterval(BaseModel):
+    """A single open period, normalized to 24-hour 'HH:MM'. A close at or before the open spans midnight."""
+    time_open: str
+    time_closed: str
+
+    @field_validator("time_open", "time_closed", mode="before")
+    @classmethod
+    def normalize_time(cls, v):
+        return format_minutes(parse_time_to_minutes(v)) if isinstance(v, str) else v
+
+    @property
+    def open_minutes(self) -> int:
+        return parse_time_to_minutes(self.time_open)
+
+    @property
+    def close_minutes(self) -> int:
+        return parse_time_to_minutes(self.time_closed)
+
+class HoursOverride(BaseModel):
+    """Date-specific hours (holidays, special events) that replace the weekly schedule."""
+    date: date
+    name: Optional[str] = None
+    is_closed: bool = False
+    intervals: List[HoursInterval] = []
+
+    @model_validator(mode="after")
+    def closed_or_open(self) -> HoursOverride:
+        # Neither would read as closed by accident (e.g. a misspelt 'closed' key)
+        if self.is_closed and self.intervals:
+            raise ValueError(f"Override for {self.date} is closed but lists hours")
+        if not self.is_closed and not self.intervals:
+            raise ValueError(f"Override for {self.date} needs is_closed or at least one interval")
+        return self
+
+_WEEKDAY_NAMES: Dict[str, str] = {
+    **{day[:length]: day for day in WEEKDAYS for length in range(3, len(day) + 1)},
+    "tues": "tuesday", "weds": "wednesday", "thur": "thursday", "thurs": "thursday",
+}
+_WEEKDAY_GROUPS = {
+    "weekdays": WEEKDAYS[:5], "weekday": WEEKDAYS[:5],
+    "weekends": WEEKDAYS[5:], "weekend": WEEKDAYS[5:],
+    "daily": WEEKDAYS, "everyday": WEEKDAYS, "every day": WEEKDAYS, "all week": WEEKDAYS,
+}
+_WEEKDAY_LIST_RE = re.compile(r"\s*(?:,|/|&|\band\b)\s*")
+_WEEKDAY_RANGE_RE = re.compile(r"\s*(?:-|–|\bto\b|\bthrough\b|\bthru\b)\s*")
+
+def _weekday(name: str, key: str) -> str:
+    day = _WEEKDAY_NAMES.get(name.strip().rstrip(".").lower())
+    if day is None:
+        raise ValueError(f"Unknown weekday {name!r} in {key!r}")
+    return day
+
+def _expand_weekdays(key: str) -> List[str]:
+    """Weekdays named by a schedule key: one day, a range (wrapping past Sunday), a list
+    or a group. Anything else raises ValueError rather than being guessed at."""
+    if not isinstance(key, str):
+        raise ValueError(f"Weekday key must be a string, not {key!r}")
+    days: List[str] = []
+    for part in _WEEKDAY_LIST_RE.split(key.strip().lower()):
+        group = _WEEKDAY_GROUPS.get(" ".join(part.split()))
+        if group:
+            days.extend(group)
+            continue
+        ends = _WEEKDAY_RANGE_RE.split(part)
+        if len(ends) == 1:
+            days.append(_weekday(part, key))
+        elif len(ends) == 2:
+            first, last = (WEEKDAYS.index(_weekday(end, key)) for end in ends)
+            days.extend(WEEKDAYS[(first + i) % 7] for i in range((last - first) % 7 + 1))
+        else:
+            raise ValueError(f"Ambiguous weekday range {part!r} in {key!r}")
+    return list(dict.fromkeys(days))
+
+def _weekday_intervals(key: str, value: Any) -> Any:
+    """A day's intervals as a list: a single interval or None/'closed' is accepted too."""
+    if value is None or (isinstance(value, str) and value.strip().lower() == "closed"):
+        return []
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, str):
+        ends = _WEEKDAY_RANGE_RE.split(value.strip())
+        if len(ends) == 2:
+            return [{"time_open": ends[0], "time_closed": ends[1]}]
+    if isinstance(value, list):
+        return value
+    raise ValueError(f"Unrecognized hours for {key!r}: {value!r}")
+
+class StructuredHours(BaseModel):
+    """Per-weekday interval lists plus dated overrides."""
+    weekly: Dict[str, List[HoursInterval]] = {}
+    overrides: List[HoursOverride] = []
+
+    @field_validator("weekly", mode="before")
+    @classmethod
+    def normalize_weekdays(cls, v):
+        """Accept keys like 'Mon', 'Mon-Fri', 'Sat & Sun', 'weekdays' or 'daily', expanded to
+        weekdays. A day named by two keys with different hours is rejected as ambiguous."""
+        if not isinstance(v, dict):
+            return v
+        weekly: Dict[str, Any] = {}
+        for key, intervals in v.items():
+            intervals = _weekday_intervals(key, intervals)
+            for day in _expand_weekdays(key):
+                if day in weekly and weekly[day] != intervals:
+                    raise ValueError(f"Conflicting hours for {day} (from {key!r})")
+                weekly[day] = intervals
+        return weekly
+
+    def intervals_for(self, day: date) -> List[HoursInterval]:
+        """Intervals that apply on a given date, honouring overrides."""
+        for override in self.overrides:
+            if override.date == day:
+                return [] if override.is_closed else override.intervals
+        return self.weekly.get(WEEKDAYS[day.weekday()], [])
+
+    @classmethod
+    def from_analysis(cls, structured_data: Dict[str, Any]) -> Optional[StructuredHours]:
+        """Build a schedule from VAPI structured call data, or None if the call captured none."""
+        weekly = structured_data.get("weekly_hours") or {}
+        overrides = structured_data.get("holiday_hours") or []
+        if not weekly and not overrides:
+            return None
+        return cls(weekly=weekly, overrides=overrides)
+
+    def pack(self) -> bytes:
+        """Encode into a compact binary form for in-memory caches."""
+        out = bytearray(struct.pack("<B", _HOURS_PACK_VERSION))
+        for day in WEEKDAYS:
+            if day in self.weekly:
+                _pack_intervals(out, self.weekly[day])
+            else:
+                out += struct.pack("<B", _NO_INTERVALS)
+        out += struct.pack("<H", len(self.overrides))
+        for override in self.overrides:
+            name = (override.name or "").encode("utf-8")[:255]
+            out += struct.pack("<IBB", override.date.toordinal(), override.is_closed, len(name))
+            out += name
+            _pack_intervals(out, override.intervals)
+        return bytes(out)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> StructuredHours:
+        """Decode the output of `pack`."""
+        view = memoryview(data)
+        if view[0] != _HOURS_PACK_VERSION:
+            raise ValueError(f"Unsupported packed hours version: {view[0]}")
+        offset = 1
+        weekly = {}
+        for day in WEEKDAYS:
+            if view[offset] == _NO_INTERVALS:
+                offset += 1
+                continue
+            weekly[day], offset = _unpack_intervals(view, offset)
+        (count,) = struct.unpack_from("<H", view, offset)
+        offset += 2
+        overrides = []
+        for _ in range(count):
+            ordinal, is_closed, name_len = struct.unpack_from("<IBB", view, offset)
+            offset += 6
+            name = bytes(view[offset:offset + name_len]).decode("utf-8") or None
+            offset += name_len
+            intervals, offset = _unpack_intervals(view, offset)
+            overrides.append(HoursOverride.model_construct(
+                date=date.fromordinal(ordinal), name=name,
+                is_closed=bool(is_closed), intervals=intervals
+            ))
+        return cls.model_construct(weekly=weekly, overrides=overrides)
+
+def _pack_intervals(out: bytearray, intervals: List[HoursInterval]) -> None:
+    out += struct.pack("<B", len(intervals))
+    for interval in intervals:
+        out += struct.pack("<HH", interval.open_minutes, interval.close_minutes)
+
+def _unpack_intervals(view: memoryview, offset: int):
+    count = view[offset]
+    offset += 1
+    intervals = []
+    for _ in range(count):
+        open_minutes, close_minutes = struct.unpack_from("<HH", view, offset)
+        offset += 4
+        intervals.append(HoursInterval.model_construct(
+            time_open=format_minutes(open_minutes), time_closed=format_minutes(close_minutes)
+        ))
+    return intervals, offset
+
 class OperatingHours(BaseModel):
     time_open: Optional[str] = None
     time_closed: Optional[str] = None
     is_hours_verified: bool = False
     is_consenting: bool = False
     is_open: Optional[bool] = None
+    schedule: Optional[StructuredHours] = None
 
 class Restaurant(BaseModel):
     business_id: str = Field(..., alias="id")
@@ -60,6 +281,17 @@ class SearchParams(BaseModel):
     offset: Optional[int] = None
     open_now: Optional[bool] = None
 
+    def normalized_key(self) -> tuple:
+        """Hashable key under which equivalent searches compare equal."""
+        def norm(text: Optional[str]) -> Optional[str]:
+            return " ".join(text.lower().split()) if text else None
+        price = ",".join(sorted(p.strip() for p in self.price.split(","))) if self.price else None
+        categories = tuple(sorted({c.strip().lower() for c in self.categories})) if self.categories else None
+        return (
+            norm(self.term), norm(self.location), self.radius, self.limit, self.sort_by,
+            price, categories, self.offset, self.open_now
+        )
+
 class User(BaseModel):
     user_id: str
     email: str
@@ -73,12 +305,22 @@ class User(BaseModel):
 # Import any external schemas here
 # from app.models.vapi import VAPICallRequest, VAPICallResponse  # example
 
-# Update forward refs for all models that reference other models
-Coordinates.update_forward_refs()
-Location.update_forward_refs()
-Category.update_forward_refs()
-OperatingHours.update_forward_refs()
-Restaurant.update_forward_refs()
-RestaurantWithHours.update_forward_refs()
-SearchParams.update_forward_refs()
-User.update_forward_refs()
+
+
+# Batch decoding for rows read back from our own database. Cached TypeAdapters validate a
+# whole result set in one call, and hours are merged into the raw rows so each row is
+# validated exactly once instead of validate -> dump -> revalidate.
+_restaurant_rows_adapter = TypeAdapter(List[Restaurant])
+_restaurant_with_hours_rows_adapter = TypeAdapter(List[RestaurantWithHours])
+
+def decode_restaurant_rows(rows: List[Dict[str, Any]]) -> List[Restaurant]:
+    """Decode a list of `restaurants` table rows into Restaurant models."""
+    return _restaurant_rows_adapter.validate_python(rows)
+
+def decode_restaurant_rows_with_hours(
+    rows: List[Dict[str, Any]], hours_map: Dict[str, Dict[str, Any]]
+) -> List[RestaurantWithHours]:
+    """Decode `restaurants` rows joined with their `operating_hours` rows. Mutates `rows`."""
+    for row in rows:
+        row["operating_hours"] = hours_map.get(row["business_id"])
+    return _restaurant_with_hours_rows_adapter.validate_python(rows)
@@ -97,23 +97,21 @@ class BusinessHoursResponse(BaseModel):
     time_closed: str  # Fixed the typo in 'closed'
     withdrawing_consent: bool
     is_correct_restaraunt: bool  # Keeping the original spelling from the API
+    weekly_hours: Optional[Dict[str, List[HoursInterval]]] = None  # e.g. {"monday": [{"time_open": "11:00 AM", ...}]}
+    holiday_hours: Optional[List[HoursOverride]] = None
 
 class CallAnalysisResponse(BaseModel):
     """Response model for call analysis."""
     success: bool
     data: BusinessHoursResponse
 
+class CheckHoursBatchRequest(BaseModel):
+    """Restaurants to queue hours checks for in one request."""
+    restaurant_ids: List[str] = Field(..., min_length=1, max_length=100)
+
 # Import any external schemas here if needed
-# from app.models.base import SomeModel
-
-# Update forward refs for all models that reference other models
-PhoneNumber.update_forward_refs()
-Customer.update_forward_refs()
-Assistant.update_forward_refs()
-Squad.update_forward_refs()
-Cost.update_forward_refs()
-Message.update_forward_refs()
-VAPICallRequest.update_forward_refs()
-VAPICallResponse.update_forward_refs()
-BusinessHoursResponse.update_forward_refs()
-CallAnalysisResponse.update_forward_refs()
+from app.models.base import HoursInterval, HoursOverride
+
+# These two reference models imported above, after their definitions
+BusinessHoursResponse.model_rebuild()
+CallAnalysisResponse.model_rebuild()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import gzip
+import functools
+import hashlib
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic_core import to_json
+from .cache.ttl_cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # a declared dependency; if missing, only gzip is offered
+    brotli = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+MIN_COMPRESS_SIZE = 1000  # bytes; smaller bodies aren't worth the CPU or the header overhead
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized by pydantic-core's Rust encoder.
+
+    Models are encoded directly (by alias, matching FastAPI's response_model output), so
+    routes returning this skip FastAPI's response_model revalidation and the stdlib encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content, by_alias=True)
+
+def ndjson_lines(items: Iterable[Any]) -> bytes:
+    """Encode items as newline-delimited JSON."""
+    return b"".join(to_json(item, by_alias=True) + b"\n" for item in items)
+
+def wants_ndjson(accept: str | None, response_format: str | None = None) -> bool:
+    """Whether the client opted into NDJSON via `?format=ndjson` or the Accept header."""
+    if response_format:
+        return response_format.lower() == "ndjson"
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streams NDJSON, compressed here when the client accepts it.
+
+    Each chunk is flushed through the compressor as it's written; GZipMiddleware would
+    hold rows back until zlib's buffer fills. Setting Content-Encoding keeps the
+    middleware out of it.
+    """
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(
+        self, content: AsyncIterator[bytes], accept_encoding: Optional[str] = None, **kwargs
+    ):
+        headers = dict(kwargs.pop("headers", None) or {})
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is not None:
+            content = _compress_stream(content, encoding)
+            headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+        super().__init__(content, media_type=self.media_type, headers=headers, **kwargs)
+
+async def _compress_stream(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """Compress `chunks`, flushing after each so the client can decode it right away."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip framing
+        compress, finish = compressor.compress, compressor.flush
+        flush = functools.partial(compressor.flush, zlib.Z_SYNC_FLUSH)
+    async for chunk in chunks:
+        data = compress(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+# ---------------------------------------------------------------------------
+# Conditional GET and negotiated compression
+
+# Encoded bodies keyed by ETag, so hot responses are serialized and compressed once
+_encoded_bodies: TTLCache[Dict[str, bytes]] = TTLCache(ttl_seconds=300, max_size=256)
+
+def weak_etag(versions: Iterable[Any]) -> str:
+    """Weak ETag over an ordered sequence of row versions."""
+    digest = hashlib.blake2b(digest_size=16)
+    for version in versions:
+        digest.update(str(version).encode("utf-8"))
+        digest.update(b"\x1f")
+    return f'W/"{digest.hexdigest()}"'
+
+def row_version(row: Optional[Dict[str, Any]]) -> Any:
+    """A cheap version token for a table row: its updated_at, or its contents if untracked."""
+    if not row:
+        return None
+    return row.get("updated_at") or tuple(sorted(row.items(), key=lambda item: item[0]))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.replace("W/", "", 1) == opaque:
+            return True
+    return False
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick 'br' (if available) or 'gzip' from an Accept-Encoding header, honouring q=0."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def conditional_json_response(
+    request: Request, etag: str, render: Callable[[], Any]
+) -> Response:
+    """JSON response honouring If-None-Match and Accept-Encoding.
+
+    `render` is only called when no encoded body is cached for this ETag, so a hit skips
+    model building, serialization and compression entirely.
+    """
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    bodies = _encoded_bodies.get(etag)
+    if bodies is None:
+        bodies = {"identity": to_json(render(), by_alias=True)}
+        _encoded_bodies.set(etag, bodies)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding is None or len(bodies["identity"]) < MIN_COMPRESS_SIZE:
+        return Response(bodies["identity"], media_type=JSON_MEDIA_TYPE, headers=headers)
+
+    if encoding not in bodies:
+        bodies[encoding] = _compress(bodies["identity"], encoding)
+    headers["Content-Encoding"] = encoding
+    return Response(bodies[encoding], media_type=JSON_MEDIA_TYPE, headers=headers)
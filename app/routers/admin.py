@@ -0,0 +1,69 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from ..auth.admin import require_admin
+from ..db.operating_hours import OperatingHoursDB
+from ..db.restaurants import RestaurantDB
+from ..dependencies import get_operating_hours_db, get_restaurant_db
+from ..services.restaurant_export import (
+    EXPORT_FORMATS, encode_export, export_encoder, export_watermark, iter_export_rows, stream_export,
+)
+from ..tracing import trace_buffer
+
+router = APIRouter(dependencies=[require_admin])
+
+@router.get("/traces")
+async def list_traces(
+    min_duration_ms: float = Query(0, ge=0, description="Only traces at least this slow"),
+    limit: int = Query(20, ge=1, le=200)
+):
+    """Recently finished traces from the in-memory buffer, slowest first."""
+    traces = trace_buffer.query(min_duration_ms=min_duration_ms, limit=limit)
+    return [
+        {**{k: t[k] for k in ("trace_id", "name", "start", "duration_ms", "status")},
+         "spans": len(t["spans"])}
+        for t in traces
+    ]
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """A single trace with all of its spans."""
+    trace = trace_buffer.get(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+@router.get("/export/restaurants")
+async def export_restaurants(
+    export_format: str = Query(
+        "ndjson", alias="format", description=f"One of: {', '.join(EXPORT_FORMATS)}"
+    ),
+    since: Optional[datetime] = Query(
+        None, description="Only restaurants whose row or hours changed after this (incremental export)"
+    ),
+    chunk_size: int = Query(500, ge=1, le=1000, description="Rows read per chunk"),
+    db: RestaurantDB = Depends(get_restaurant_db),
+    oh_db: OperatingHoursDB = Depends(get_operating_hours_db),
+):
+    """Stream every stored restaurant joined with its operating hours. X-Export-Watermark is
+    a few seconds before the export started: pass it as `since` next time for the changes
+    after this one.
+    """
+    try:
+        encoder = export_encoder(export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    started_at = datetime.now(timezone.utc)
+    pieces = encode_export(iter_export_rows(db, oh_db, since, chunk_size), encoder)
+    return StreamingResponse(
+        stream_export(pieces),
+        media_type=encoder.media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="restaurants-{started_at:%Y%m%dT%H%M%SZ}.{encoder.extension}"'
+            ),
+            "X-Export-Watermark": export_watermark(started_at).isoformat(),
+        },
+    )
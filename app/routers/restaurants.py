@@ -4,59 +4,106 @@ from typing import List, Optional
 from ..db.restaurants import RestaurantDB
 from ..db.operating_hours import OperatingHoursDB
 from ..db.users import UserDB
-from ..clients.google_custom_search import image_search
+from ..clients.google_custom_search import GoogleCustomImageSearch
+from ..dependencies import get_image_search, get_operating_hours_db, get_restaurant_db, get_user_db
 from ..auth.clerk import require_auth, optional_auth, get_optional_user, UserData
+from ..responses import (
+    FastJSONResponse,
+    NDJSONStreamingResponse,
+    conditional_json_response,
+    etag_matches,
+    ndjson_lines,
+    row_version,
+    wants_ndjson,
+    weak_etag,
+)
+from ..metrics import restaurant_searches
 import httpx
 import asyncio
 import logging
+from ..tracing import traced
 from urllib.parse import quote
-from ..models import Restaurant, SearchParams, RestaurantWithHours, OperatingHours
+from ..models import Restaurant, SearchParams, RestaurantWithHours, OperatingHours, decode_restaurant_rows_with_hours
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-db = RestaurantDB()
-oh_db = OperatingHoursDB()
-user_db = UserDB()
+
+
+async def _stream_restaurants_with_hours(
+    db: RestaurantDB, oh_db: OperatingHoursDB, limit: Optional[int], chunk_size: int
+):
+    """Read restaurants from storage in chunks and write each chunk as NDJSON as soon as it's ready."""
+    chunks = db.iter_cached_restaurant_rows(chunk_size=chunk_size, limit=limit)
+    while True:
+        rows = await asyncio.to_thread(next, chunks, None)
+        if rows is None:
+            return
+        hours_map = await asyncio.to_thread(
+            oh_db.get_cached_hours_bulk, [r["business_id"] for r in rows]
+        )
+        yield ndjson_lines(decode_restaurant_rows_with_hours(rows, hours_map))
 
 
 @router.get("/", response_model=List[RestaurantWithHours])
+@traced()
 async def get_cached_restaurants(
+    request: Request,
     limit: Optional[int] = Query(None, description="Maximum number of restaurants to return"),
     fetch_images: Optional[bool] = Query(False, description="Whether to fetch missing images"),
-    user: Optional[dict] = optional_auth
+    response_format: Optional[str] = Query(
+        None, alias="format",
+        description="'json' (default) or 'ndjson' to stream one restaurant per line"
+    ),
+    chunk_size: int = Query(500, ge=1, le=1000, description="Rows read per chunk when streaming"),
+    user: Optional[dict] = optional_auth,
+    db: RestaurantDB = Depends(get_restaurant_db),
+    oh_db: OperatingHoursDB = Depends(get_operating_hours_db),
 ) -> List[RestaurantWithHours]:
     """
     Get cached restaurants. Authentication is optional - authenticated users get access to image fetching.
+    Send `Accept: application/x-ndjson` (or `?format=ndjson`) to stream results instead of
+    building the whole list in memory.
     """
+    if wants_ndjson(request.headers.get("accept"), response_format):
+        return NDJSONStreamingResponse(
+            _stream_restaurants_with_hours(db, oh_db, limit, chunk_size),
+            accept_encoding=request.headers.get("accept-encoding"),
+        )
+
     try:
         logger.info("🔄 Fetching cached restaurants")
         
         # Get restaurants from cache using asyncio.to_thread for CPU-bound operations
-        restaurants = await asyncio.to_thread(db.get_cached_restaurants, limit)
-        logger.info(f"📦 Found {len(restaurants)} restaurants in cache")
+        rows = await asyncio.to_thread(db.get_cached_restaurant_rows, limit)
+        logger.info("📦 Found %s restaurants in cache", len(rows))
         
-        if not restaurants:
+        if not rows:
             # Return empty list instead of 404
             logger.info("ℹ️ No restaurants found in cache")
             return []
         
         # Get operating hours for each restaurant
-        restaurant_ids = [r.business_id for r in restaurants]
-        logger.info(f"⏰ Fetching hours for {len(restaurant_ids)} restaurants")
-        hours_map = await asyncio.to_thread(oh_db.get_hours_bulk, restaurant_ids)
+        restaurant_ids = [r["business_id"] for r in rows]
+        logger.info("⏰ Fetching hours for %s restaurants", len(restaurant_ids))
+        hours_map = await asyncio.to_thread(oh_db.get_cached_hours_bulk, restaurant_ids)
         
-        # Combine restaurants with their hours
-        results = []
-        for restaurant in restaurants:
-            hours = hours_map.get(restaurant.business_id)
-            results.append(RestaurantWithHours(
-                **restaurant.model_dump(),
-                operating_hours=hours
-            ))
+        if not fetch_images:
+            # Row versions identify the payload, so unchanged listings skip building it
+            etag = weak_etag(
+                (r["business_id"], row_version(r), row_version(hours_map.get(r["business_id"])))
+                for r in rows
+            )
+            return conditional_json_response(
+                request, etag, lambda: decode_restaurant_rows_with_hours(rows, hours_map)
+            )
+
+        # Combine restaurants with their hours, validating each row once
+        results = decode_restaurant_rows_with_hours(rows, hours_map)
             
         # Optionally fetch missing images
         if fetch_images:
+            image_search = get_image_search()
             for restaurant in results:
                 if not restaurant.image_url:
                     try:
@@ -66,14 +113,14 @@ async def get_cached_restaurants(
                             # Update in database
                             await db.update_restaurant(restaurant.business_id, {"image_url": image_url})
                     except Exception as e:
-                        logger.error(f"❌ Failed to fetch image for {restaurant.name}: {str(e)}", exc_info=True)
+                        logger.error("❌ Failed to fetch image for %s: %s", restaurant.name, e, exc_info=True)
                         continue
         
-        logger.info(f"✅ Successfully processed {len(results)} restaurants")
-        return results
+        logger.info("✅ Successfully processed %s restaurants", len(results))
+        return FastJSONResponse(results)
             
     except Exception as e:
-        logger.error(f"❌ Error in get_cached_restaurants: {str(e)}", exc_info=True)
+        logger.error("❌ Error in get_cached_restaurants: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch restaurants: {str(e)}"
@@ -81,6 +128,7 @@ async def get_cached_restaurants(
 
 
 @router.get("/search")
+@traced()
 async def search_restaurants(
     request: Request,
     term: Optional[str] = None,
@@ -92,14 +140,15 @@ async def search_restaurants(
     categories: Optional[str] = None,
     offset: Optional[int] = None,
     open_now: Optional[bool] = None,
-    user: Optional[UserData] = optional_auth
+    user: Optional[UserData] = optional_auth,
+    db: RestaurantDB = Depends(get_restaurant_db),
+    user_db: UserDB = Depends(get_user_db),
 ) -> List[Restaurant]:
     """
     Search for restaurants. Always search local database first.
     If user is authenticated and no results found, then search Yelp API.
     """
     try:
-        db = RestaurantDB()
         params = SearchParams(
             term=term,
             location=location,
@@ -112,17 +161,18 @@ async def search_restaurants(
             open_now=open_now
         )
         
-        logger.info(f"🔍 Searching with params: {params}")
-        logger.info(f"👤 User authenticated: {user.first_name} {user.last_name}")
+        logger.info("🔍 Searching with params: %s", params)
+        logger.info("👤 User authenticated: %s %s", user.first_name, user.last_name)
 
         is_search_permitted = await user_db.is_search_permitted(user.user_id)
-        logger.info(f"✅ User search permitted: {is_search_permitted}") 
+        logger.info("✅ User search permitted: %s", is_search_permitted) 
         # Always search local cache first
         logger.info("🔄 Searching local cache...")
         restaurants = await db.search_cached_restaurants(params)
         if restaurants:
-            logger.info(f"✅ Found {len(restaurants)} restaurants in cache")
-            return restaurants
+            logger.info("✅ Found %s restaurants in cache", len(restaurants))
+            restaurant_searches.inc(source="cache")
+            return FastJSONResponse(restaurants)
             
         # If no results in cache and user is authenticated, try Yelp API
         if (not restaurants or len(restaurants) < 10) and is_search_permitted:
@@ -130,17 +180,19 @@ async def search_restaurants(
                 logger.info("🔄 No cache results, attempting Yelp API search...")
                 restaurants = await db.search_restaurants(params)
                 if restaurants:
-                    logger.info(f"✅ Found {len(restaurants)} restaurants from Yelp")
-                    return restaurants
+                    logger.info("✅ Found %s restaurants from Yelp", len(restaurants))
+                    restaurant_searches.inc(source="yelp")
+                    return FastJSONResponse(restaurants)
                 logger.info("⚠️ No results from Yelp API")
             except Exception as e:
-                logger.error(f"❌ Yelp search failed: {str(e)}")
+                logger.error("❌ Yelp search failed: %s", e)
         
         logger.info("ℹ️ No restaurants found")
+        restaurant_searches.inc(source="empty" if is_search_permitted else "denied")
         return []
             
     except Exception as e:
-        logger.error(f"❌ Search operation failed: {str(e)}", exc_info=True)
+        logger.error("❌ Search operation failed: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Search operation failed: {str(e)}"
@@ -148,10 +200,24 @@ async def search_restaurants(
 
 
 @router.get("/{business_id}", response_model=Restaurant)
-async def get_restaurant_details(business_id: str, auth: dict = require_auth) -> Restaurant:
+@traced()
+async def get_restaurant_details(
+    request: Request,
+    business_id: str,
+    auth: dict = require_auth,
+    db: RestaurantDB = Depends(get_restaurant_db),
+    image_search: GoogleCustomImageSearch = Depends(get_image_search),
+) -> Restaurant:
     """Get detailed information about a specific restaurant."""
     try:
-        logger.info(f"🔍 Fetching restaurant details for {business_id}")
+        logger.info("🔍 Fetching restaurant details for %s", business_id)
+        # Tagged by the stored row's version, so a revalidation is answered before the
+        # restaurant is read, images are looked up or anything is serialized
+        version = await asyncio.to_thread(db.get_stored_version, business_id)
+        etag = weak_etag([business_id, row_version(version)]) if version else None
+        if etag and etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
         restaurant = await db.get_restaurant(business_id)
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
@@ -162,29 +228,34 @@ async def get_restaurant_details(business_id: str, auth: dict = require_auth) ->
             images = await image_search.search_images(search_query, num=5)  # Get more images for detail view
             if images:
                 restaurant.photos = images
-                logger.info(f"✅ Found {len(images)} images for {restaurant.name}")
+                logger.info("✅ Found %s images for %s", len(images), restaurant.name)
             else:
-                logger.warning(f"⚠️ No images found for {restaurant.name}")
+                logger.warning("⚠️ No images found for %s", restaurant.name)
                 
-        return restaurant
+        if etag is None:
+            # Just fetched from Yelp and stored; tagged from the next request on
+            return FastJSONResponse(restaurant)
+        return conditional_json_response(request, etag, lambda: restaurant)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error in get_restaurant_details: {str(e)}", exc_info=True)
+        logger.error("❌ Error in get_restaurant_details: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/search/phone", response_model=List[Restaurant])
+@traced()
 async def search_by_phone(
     phone: str = Query(..., description="Phone number to search for"),
-    auth: dict = require_auth
+    auth: dict = require_auth,
+    db: RestaurantDB = Depends(get_restaurant_db),
 ) -> List[Restaurant]:
     """
     Search for restaurants by phone number.
     Phone number should be in E.164 format (+14157492060).
     """
     try:
-        logger.info(f"📞 Searching for restaurants by phone number: {phone}")
-        return await db.search_by_phone(phone)
+        logger.info("📞 Searching for restaurants by phone number: %s", phone)
+        return FastJSONResponse(await db.search_by_phone(phone))
     except Exception as e:
-        logger.error(f"❌ Error in search_by_phone: {str(e)}", exc_info=True)
+        logger.error("❌ Error in search_by_phone: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
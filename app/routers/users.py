@@ -1,20 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
 from ..auth.clerk import require_auth, UserData
 from ..db.users import UserDB
+from ..dependencies import get_user_db
 import logging
+from ..tracing import traced
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["users"])  # Remove prefix, it's handled in main.py
-db = UserDB()
 
 @router.post("/initialize")
-async def initialize_user(user: UserData = require_auth):
+@traced()
+async def initialize_user(user: UserData = require_auth, db: UserDB = Depends(get_user_db)):
     """
     Initialize or update a user in our database when they sign in through Clerk.
     """
     try:
-        logger.info(f"👤 Initializing user: {user.first_name} {user.last_name}")
+        logger.info("👤 Initializing user: %s %s", user.first_name, user.last_name)
         
         # Convert Clerk user data to our format
         user_data = {
@@ -39,5 +41,5 @@ async def initialize_user(user: UserData = require_auth):
         }
         
     except Exception as e:
-        logger.error(f"Failed to initialize user: {str(e)}")
+        logger.error("Failed to initialize user: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,23 +1,44 @@
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Optional
+from fastapi import APIRouter, Body, HTTPException, Depends, Request, Response
+from typing import Any, Dict, Optional
+import asyncio
+from ..auth.vapi_webhook import require_vapi_secret
 from ..clients.vapi import VAPIClient
+from ..db.call_jobs import CallJob, CallJobDB
 from ..db.operating_hours import OperatingHoursDB
 from ..db.restaurants import RestaurantDB
+from ..db.phone_calls import PhoneCallDB
+from ..dependencies import (
+    get_call_job_db,
+    get_operating_hours_db,
+    get_phone_call_db,
+    get_restaurant_db,
+    get_vapi_client,
+)
+from ..metrics import call_early_ends, vapi_webhook_events
 from ..middleware.auth import ClerkAuthMiddleware
+from ..models.vapi import CheckHoursBatchRequest
+from ..services.call_events import call_report, call_waiters
+from ..services.call_transcripts import WRAP_UP_MESSAGE, call_transcripts
+from ..services.hours_check import apply_call_result
 import logging
+from ..tracing import traced
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-vapi_client = VAPIClient()
 auth = ClerkAuthMiddleware()
 
+# Checks someone asked for go ahead of background verification within a calling window
+USER_REQUEST_BOOST = 1.0
+
 @router.post("/call/{phone_number}")
+@traced()
 async def make_call(
     phone_number: str, 
     message: Optional[str] = "This is a call from Hungry Monkey",
-    token: str = Depends(auth)
+    token: str = Depends(auth),
+    vapi_client: VAPIClient = Depends(get_vapi_client),
 ):
     """Make a call using VAPI."""
     try:
@@ -29,9 +50,11 @@ async def make_call(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/call-analysis/{call_id}")
+@traced()
 async def get_call_analysis(
     call_id: str,
-    token: str = Depends(auth)
+    token: str = Depends(auth),
+    vapi_client: VAPIClient = Depends(get_vapi_client),
 ):
     """Get the analysis and structured output from a completed call."""
     try:
@@ -43,51 +66,192 @@ async def get_call_analysis(
             detail=str(e)
         )
 
-@router.get("/check-hours/{restaurant_id}")
+def _job_view(job: CallJob, request: Request) -> Dict[str, Any]:
+    """What clients see of a check-hours job; the outcome fields fill in once a call has ended."""
+    result = job.result or {}
+    return {
+        "job_id": job.id,
+        "restaurant_id": job.restaurant_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after,
+        "window_ends_at": job.window_ends_at,
+        "timezone": job.timezone,
+        "call_id": job.call_id,
+        "successEvaluation": result.get("successEvaluation"),
+        "structured_data": result.get("structured_data"),
+        "hours_updated": result.get("hours_updated"),
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "status_url": str(request.url_for("get_call_job", job_id=job.id)),
+    }
+
+def _wake_dispatcher(request: Request) -> None:
+    # Without a local dispatcher (DISPATCH_ENABLED=false) another worker picks the job up on its next poll
+    dispatcher = getattr(request.app.state, "dispatcher", None)
+    if dispatcher is not None:
+        dispatcher.wake()
+
+@router.api_route("/check-hours/{restaurant_id}", methods=["GET", "POST"], status_code=202)
+@traced()
 async def check_hours(
     restaurant_id: str,
-    token: str = Depends(auth)
+    request: Request,
+    response: Response,
+    token: str = Depends(auth),
+    restaurant_db: RestaurantDB = Depends(get_restaurant_db),
+    job_db: CallJobDB = Depends(get_call_job_db),
 ):
+    """Queue a call to check a restaurant's hours; poll status_url for the outcome.
+
+    The call is placed in the restaurant's next local calling window, so run_after may be hours away.
+    """
     try:
-        hours_db = OperatingHoursDB()
-        restaurant_db = RestaurantDB()
-        print(f"🔍 Calling to check hours for restaurant: {restaurant_id}")
-        # get phone number from restaurant id
         restaurant = await restaurant_db.get_restaurant(restaurant_id)
-        phone_number = restaurant.phone
+        if not restaurant:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        job = await asyncio.to_thread(job_db.enqueue, restaurant_id, boost=USER_REQUEST_BOOST)
+        if not job:
+            raise HTTPException(status_code=500, detail="Failed to queue hours check")
+        _wake_dispatcher(request)
+        view = _job_view(job, request)
+        response.headers["Location"] = view["status_url"]
+        logger.info("📋 Queued hours check job %s for restaurant %s", job.id, restaurant_id)
+        return view
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error queueing hours check for restaurant %s: %s", restaurant_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        call_id = await vapi_client.make_call(phone_number, "This is a call to check hours")
-        await vapi_client.wait_for_call_completion(call_id)
-        analysis = await vapi_client.get_call_analysis(call_id)
-        structured_data = analysis.get("structuredData", {})
-        successEvaluation = analysis.get("successEvaluation", False)
+@router.post("/check-hours", status_code=202)
+@traced()
+async def check_hours_batch(
+    batch: CheckHoursBatchRequest,
+    request: Request,
+    token: str = Depends(auth),
+    job_db: CallJobDB = Depends(get_call_job_db),
+):
+    """Queue hours checks for many restaurants at once (unknown IDs fail their job)."""
+    try:
+        jobs = await asyncio.to_thread(job_db.enqueue_many, batch.restaurant_ids, boost=USER_REQUEST_BOOST)
+        _wake_dispatcher(request)
+        logger.info("📋 Queued %s hours check jobs", len(jobs))
+        return {"jobs": [_job_view(job, request) for job in jobs]}
+    except Exception as e:
+        logger.error("Error queueing %s hours checks: %s", len(batch.restaurant_ids), e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+@traced()
+async def get_call_job(
+    job_id: int,
+    request: Request,
+    token: str = Depends(auth),
+    job_db: CallJobDB = Depends(get_call_job_db),
+):
+    """Progress of a queued call: pending, running, succeeded or failed, with the captured hours."""
+    job = await asyncio.to_thread(job_db.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_view(job, request)
+
+@router.post("/webhook", dependencies=[require_vapi_secret])
+async def vapi_webhook(
+    payload: Dict[str, Any] = Body(...),
+    job_db: CallJobDB = Depends(get_call_job_db),
+    hours_db: OperatingHoursDB = Depends(get_operating_hours_db),
+    restaurant_db: RestaurantDB = Depends(get_restaurant_db),
+    phone_db: PhoneCallDB = Depends(get_phone_call_db),
+    vapi_client: VAPIClient = Depends(get_vapi_client),
+):
+    """Receive VAPI server messages (status-update, end-of-call-report, transcript).
 
-        if successEvaluation and structured_data and "time_open" in structured_data and "time_closed" in structured_data:
-            print(f"✅ Updating hours for restaurant: {restaurant_id}")
-            hours_db.update_hours(restaurant_id, structured_data.get("time_open"), structured_data.get("time_closed"), structured_data.get("is_open"))
+    A call this worker is waiting on is handed its result directly. Otherwise the call
+    was placed by another worker and the report is applied here to every restaurant
+    with the called number; that worker's slow fallback poll then finds the call ended
+    and writes the same hours again.
 
-        return {"successEvaluation": successEvaluation, "message": f"Got hours from VAPI. {structured_data}"}
+    Transcript lines are parsed as they arrive; once today's hours and the restaurant's
+    consent have been heard, the assistant is told to wrap up and hang up.
+    """
+    message = payload.get("message") or {}
+    event_type = message.get("type", "unknown")
+    if event_type.startswith("transcript"):
+        event_type = "transcript"  # also sent as transcript[transcriptType="final"]
+    call_id = (message.get("call") or {}).get("id")
+    outcome = "ignored"
+    try:
+        if call_id and event_type == "transcript":
+            outcome = await _follow_transcript(vapi_client, call_id, message)
+            logger.debug("📨 VAPI transcript for call %s: %s", call_id, outcome)
+            return {"received": True}
+        if call_id and event_type == "status-update":
+            if message.get("status") == "ended":
+                call_transcripts.discard(call_id)
+            if call_waiters.set_status(call_id, message.get("status")):
+                outcome = "waiter"
+        elif call_id and event_type == "end-of-call-report":
+            call_transcripts.discard(call_id)
+            report = call_report(message)
+            if call_waiters.resolve(call_id, report):
+                outcome = "waiter"
+            else:
+                phone_call = await asyncio.to_thread(phone_db.get_by_call_id, call_id)
+                if phone_call:
+                    await apply_call_result(
+                        phone_call["phone"], call_id, report["analysis"], restaurant_db, hours_db, job_db
+                    )
+                    outcome = "persisted"
+                else:
+                    logger.warning("⚠️ End-of-call report for unknown call %s", call_id)
+        logger.info("📨 VAPI %s for call %s: %s", event_type, call_id, outcome)
+        return {"received": True}
     except Exception as e:
-        logger.error(f"Error checking hours for restaurant {restaurant_id}: {str(e)}")
+        outcome = "error"
+        logger.error("❌ Failed to handle VAPI %s for call %s: %s", event_type, call_id, e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        known = event_type in ("status-update", "end-of-call-report", "transcript")
+        vapi_webhook_events.inc(type=event_type if known else "other", outcome=outcome)
+
+async def _follow_transcript(vapi_client: VAPIClient, call_id: str, message: Dict[str, Any]) -> str:
+    """Feed one transcript line to the call's parser and wrap the call up once it has what we need."""
+    reason = call_transcripts.feed(call_id, message, vapi_client.early_end_confidence)
+    if reason is None:
+        return "parsed"
+    control_url = ((message.get("call") or {}).get("monitor") or {}).get("controlUrl")
+    if not control_url:
+        logger.warning("⚠️ Call %s could wrap up (%s) but has no control URL", call_id, reason)
+        return "parsed"
+    try:
+        await vapi_client.wrap_up_call(control_url, WRAP_UP_MESSAGE)
+    except Exception as e:
+        # The call may have ended meanwhile; otherwise it just runs to its natural end
+        logger.warning("⚠️ Failed to wrap up call %s: %s", call_id, e)
+        return "parsed"
+    call_early_ends.inc(reason=reason)
+    logger.info("✂️ Wrapping up call %s early (%s)", call_id, reason)
+    return "wrapped_up"
 
 @router.get("/test/test_check_hours")
-async def check_hours():
+@traced()
+async def check_hours(hours_db: OperatingHoursDB = Depends(get_operating_hours_db)):
     try:
-        hours_db = OperatingHoursDB()
-        restaurant_db = RestaurantDB()
         structured_data = {
             "time_open": "10:00 AM",
             "time_closed": "2:00 PM",
             "is_open": True,
         }
-        print(f"✅ Got hours from VAPI: {structured_data}")
+        logger.info("✅ Got hours from VAPI: %s", structured_data)
         if structured_data and "time_open" in structured_data and "time_closed" in structured_data:
             hours_db.update_hours("jJigeJake", structured_data.get("time_open"), structured_data.get("time_closed"), structured_data.get("is_open"))
 
         return {"status": "success", "message": f"Got hours from VAPI. {structured_data}"}
     except Exception as e:
-        logger.error(f"Error checking hours for restaurant : {str(e)}")
+        logger.error("Error checking hours for restaurant : %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Import models at the bottom
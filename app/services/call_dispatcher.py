@@ -0,0 +1,257 @@
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+from app.clients.vapi import VAPIClient
+from app.db.call_jobs import CallJob, CallJobDB
+from app.db.call_slots import CallSlotStatsDB
+from app.db.operating_hours import OperatingHoursDB
+from app.db.phone_calls import PhoneCallDB
+from app.db.restaurants import RestaurantDB
+from app.metrics import dispatch_calls_in_flight, dispatch_jobs, dispatch_queue_depth
+from app.services.call_schedule import CallScheduler
+from app.services.hours_check import CallDeferred, HoursChecker
+from app.tracing import start_trace
+
+logger = logging.getLogger(__name__)
+
+class CallUnsuccessful(Exception):
+    """The call completed but didn't capture usable hours; worth another attempt later."""
+
+    def __init__(self, message: str, result: Dict[str, Any]):
+        super().__init__(message)
+        self.result = result
+
+class CallDispatcher:
+    """Works through the call_jobs queue with a bounded number of concurrent calls.
+
+    Each pass tops the queue up with a small batch of unverified restaurants, has the
+    CallScheduler place new jobs in a local calling window, then leases only as many
+    jobs as there are free call slots, highest priority first among those whose window
+    is open. Leases are renewed while a call is in progress; a worker that dies stops
+    renewing and its jobs are reclaimed elsewhere. Failed attempts are retried with
+    exponential backoff and jitter, in the next good window after it. Calls go through
+    HoursChecker, so a number shared by several restaurants is dialed once.
+    """
+
+    def __init__(
+        self,
+        job_db: CallJobDB,
+        vapi_client: VAPIClient,
+        restaurant_db: RestaurantDB,
+        hours_db: OperatingHoursDB,
+        phone_db: PhoneCallDB,
+        scheduler: CallScheduler,
+        concurrency: int = 3,
+        batch_size: int = 5,
+        lease_seconds: int = 300,
+        poll_seconds: float = 15.0,
+        refill_seconds: float = 60.0,
+        refill_batch: int = 25,
+        retry_base_seconds: float = 60.0,
+        retry_max_seconds: float = 3600.0,
+        shutdown_grace_seconds: float = 10.0,
+        phone_cooldown_seconds: int = 6 * 3600,
+        busy_retry_seconds: float = 60.0,
+        worker_id: Optional[str] = None,
+    ):
+        self.job_db = job_db
+        self.vapi_client = vapi_client
+        self.restaurant_db = restaurant_db
+        self.hours_db = hours_db
+        self.scheduler = scheduler
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.refill_seconds = refill_seconds
+        self.refill_batch = refill_batch
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.shutdown_grace_seconds = shutdown_grace_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.checker = HoursChecker(
+            vapi_client, restaurant_db, hours_db, phone_db, job_db, self.worker_id,
+            lease_seconds=lease_seconds, cooldown_seconds=phone_cooldown_seconds,
+            busy_retry_seconds=busy_retry_seconds, scheduler=scheduler,
+        )
+        self._active: Dict[int, CallJob] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._loop_task: Optional[asyncio.Task] = None
+        self._lease_task: Optional[asyncio.Task] = None
+        self._last_refill = float("-inf")
+
+    @classmethod
+    def from_env(cls, job_db: CallJobDB, vapi_client: VAPIClient, restaurant_db: RestaurantDB,
+                 hours_db: OperatingHoursDB, phone_db: PhoneCallDB,
+                 stats_db: CallSlotStatsDB) -> "CallDispatcher":
+        return cls(
+            job_db, vapi_client, restaurant_db, hours_db, phone_db,
+            CallScheduler.from_env(job_db, restaurant_db, stats_db),
+            concurrency=int(os.getenv("DISPATCH_CONCURRENCY", "3")),
+            batch_size=int(os.getenv("DISPATCH_BATCH_SIZE", "5")),
+            lease_seconds=int(os.getenv("DISPATCH_LEASE_SECONDS", "300")),
+            poll_seconds=float(os.getenv("DISPATCH_POLL_SECONDS", "15")),
+            refill_seconds=float(os.getenv("DISPATCH_REFILL_SECONDS", "60")),
+            refill_batch=int(os.getenv("DISPATCH_REFILL_BATCH", "25")),
+            retry_base_seconds=float(os.getenv("DISPATCH_RETRY_BASE_SECONDS", "60")),
+            retry_max_seconds=float(os.getenv("DISPATCH_RETRY_MAX_SECONDS", "3600")),
+            phone_cooldown_seconds=int(os.getenv("DISPATCH_PHONE_COOLDOWN_SECONDS", "21600")),
+            busy_retry_seconds=float(os.getenv("DISPATCH_BUSY_RETRY_SECONDS", "60")),
+        )
+
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run())
+            self._lease_task = asyncio.create_task(self._renew_leases())
+            logger.info("📞 Call dispatcher %s started (concurrency=%s)", self.worker_id, self.concurrency)
+
+    async def stop(self) -> None:
+        """Stop claiming, give in-flight calls a grace period, then hand the rest back."""
+        self._stopping = True
+        self.wake()
+        if self._loop_task:
+            await self._loop_task
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=self.shutdown_grace_seconds)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self._lease_task:
+            self._lease_task.cancel()
+            await asyncio.gather(self._lease_task, return_exceptions=True)
+        logger.info("📞 Call dispatcher %s stopped", self.worker_id)
+
+    def wake(self) -> None:
+        """Claim immediately instead of waiting for the next poll (e.g. after an enqueue)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._active)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            claimed_full_batch = False
+            try:
+                await self._refill_if_due()
+                await self._schedule()
+                free = self.concurrency - len(self._active)
+                if free > 0:
+                    want = min(free, self.batch_size)
+                    jobs = await asyncio.to_thread(
+                        self.job_db.claim, self.worker_id, want, self.lease_seconds
+                    )
+                    for job in jobs:
+                        self._spawn(job)
+                    claimed_full_batch = len(jobs) == want
+            except Exception as e:
+                logger.error("❌ Error in dispatch loop: %s", e, exc_info=True)
+            if claimed_full_batch and len(self._active) < self.concurrency:
+                continue  # more work is likely waiting and there are still free slots
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refill_if_due(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop.time() - self._last_refill < self.refill_seconds:
+            return
+        self._last_refill = loop.time()
+        queued = await asyncio.to_thread(self.job_db.enqueue_unverified, self.refill_batch)
+        if queued:
+            logger.info("📋 Queued %s restaurants for hours verification", queued)
+        pending = await asyncio.to_thread(self.job_db.count_pending)
+        if pending is not None:
+            dispatch_queue_depth.set(pending)
+
+    async def _schedule(self, max_batches: int = 10) -> None:
+        for _ in range(max_batches):
+            scheduled = await asyncio.to_thread(self.scheduler.schedule_pending)
+            if scheduled < self.scheduler.batch_size:
+                return
+
+    def _spawn(self, job: CallJob) -> None:
+        self._active[job.id] = job
+        dispatch_calls_in_flight.set(len(self._active))
+        task = asyncio.create_task(self._process(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, job: CallJob) -> None:
+        outcome = "failed"
+        try:
+            with start_trace(f"dispatch {job.kind}", job_id=job.id, restaurant_id=job.restaurant_id):
+                result = await self._execute(job)
+            if not result.get("successEvaluation"):
+                raise CallUnsuccessful(f"Call {result.get('call_id')} did not capture hours", result)
+            # The checker has already marked the restaurant verified, so a refill can't re-queue it
+            await asyncio.to_thread(self.job_db.complete, job, self.worker_id, self._job_result(result))
+            outcome = "succeeded"
+            logger.info("✅ Call job %s succeeded for %s", job.id, job.restaurant_id)
+        except asyncio.CancelledError:
+            outcome = "released"
+            await asyncio.to_thread(self.job_db.release, job, self.worker_id)
+            raise
+        except CallDeferred as e:
+            outcome = "deferred"
+            logger.info("⏳ Call job %s for %s deferred: %s", job.id, job.restaurant_id, e)
+            await asyncio.to_thread(self.job_db.defer, job, self.worker_id, e.run_after)
+        except Exception as e:
+            # A missing restaurant or unusable phone number won't fix itself on retry
+            retry_at = None if isinstance(e, ValueError) else self._retry_at(job)
+            outcome = "retried" if retry_at else "failed"
+            logger.warning(
+                "⚠️ Call job %s for %s failed (attempt %s/%s): %s",
+                job.id, job.restaurant_id, job.attempts, job.max_attempts, e
+            )
+            result = self._job_result(e.result) if isinstance(e, CallUnsuccessful) else None
+            await asyncio.to_thread(self.job_db.fail, job, self.worker_id, str(e), retry_at, result)
+        finally:
+            dispatch_jobs.inc(outcome=outcome)
+            self._active.pop(job.id, None)
+            dispatch_calls_in_flight.set(len(self._active))
+            self.wake()
+
+    async def _execute(self, job: CallJob) -> Dict[str, Any]:
+        if job.kind != "check_hours":
+            raise ValueError(f"Unknown call job kind: {job.kind}")
+        return await self.checker.check(job.restaurant_id)
+
+    @staticmethod
+    def _job_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """What a job keeps of a check: the outcome, not the raw analysis."""
+        return {k: v for k, v in result.items() if k != "analysis"}
+
+    def _retry_at(self, job: CallJob) -> Optional[datetime]:
+        if job.attempts >= job.max_attempts:
+            return None
+        return datetime.now(timezone.utc) + timedelta(seconds=self.backoff_seconds(job.attempts))
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """Exponential backoff with jitter, so retries from a burst of failures spread out."""
+        cap = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** max(attempt - 1, 0))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    async def _renew_leases(self) -> None:
+        interval = max(self.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            for job in list(self._active.values()):
+                renewed = await asyncio.to_thread(
+                    self.job_db.renew_lease, job, self.worker_id, self.lease_seconds
+                )
+                if not renewed:
+                    logger.warning("⚠️ Call job %s lease could not be renewed", job.id)
+            await asyncio.to_thread(self.checker.renew_leases)
@@ -0,0 +1,348 @@
+from __future__ import annotations
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+from app.clients.vapi import VAPIClient
+from app.metrics import vapi_call_completions, vapi_calls_tracked, vapi_poll_requests
+
+logger = logging.getLogger(__name__)
+
+# Once VAPI says a call ended, how long to wait for its end-of-call-report before fetching it
+REPORT_GRACE_SECONDS = 10.0
+ENDED_STATUSES = ("ended", "completed")
+# Slack for clock skew between us and VAPI when asking for calls updated since a time
+LIST_SKEW_SECONDS = 5.0
+# Weight of each finished call in the running estimate of how long calls take
+DURATION_EWMA_ALPHA = 0.2
+
+class CallWaiter:
+    """One coroutine waiting on a call; webhook events or the poller resolve it."""
+
+    def __init__(self, call_id: str):
+        self.call_id = call_id
+        self.status: Optional[str] = None
+        self.ended_at: Optional[float] = None
+        self.source: Optional[str] = None
+        self.report: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def ended(self) -> bool:
+        return self.status == "ended"
+
+    def set_status(self, status: Optional[str]) -> None:
+        self.status = status
+        if self.ended and self.ended_at is None:
+            self.ended_at = asyncio.get_running_loop().time()
+
+    def resolve(self, report: Dict[str, Any], source: str = "webhook") -> None:
+        if not self.report.done():
+            self.source = source
+            self.report.set_result(report)
+
+    def fail(self, error: Exception) -> None:
+        if not self.report.done():
+            self.report.set_exception(error)
+
+class CallWaiters:
+    """Calls this process is waiting on, keyed by VAPI call id.
+
+    The webhook can land on any worker; events for calls another process is waiting
+    on aren't found here and are handled by the caller instead.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, CallWaiter] = {}
+        # Told about every event for a registered call (the poller reschedules on them)
+        self.on_event: Optional[Callable[[str], None]] = None
+
+    def register(self, call_id: str) -> CallWaiter:
+        waiter = self._waiters.get(call_id)
+        if waiter is None:
+            waiter = self._waiters[call_id] = CallWaiter(call_id)
+        return waiter
+
+    def discard(self, call_id: str) -> None:
+        self._waiters.pop(call_id, None)
+
+    def set_status(self, call_id: str, status: Optional[str]) -> bool:
+        waiter = self._waiters.get(call_id)
+        if waiter is None:
+            return False
+        waiter.set_status(status)
+        self._notify(call_id)
+        return True
+
+    def resolve(self, call_id: str, report: Dict[str, Any]) -> bool:
+        waiter = self._waiters.get(call_id)
+        if waiter is None:
+            return False
+        waiter.resolve(report)
+        self._notify(call_id)
+        return True
+
+    def _notify(self, call_id: str) -> None:
+        if self.on_event is not None:
+            self.on_event(call_id)
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+call_waiters = CallWaiters()
+
+def call_report(call: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of an ended call (a GET /call body or end-of-call-report) the checker uses."""
+    return {"analysis": call.get("analysis") or {}, "endedReason": call.get("endedReason")}
+
+class TrackedCall:
+    """The poller's bookkeeping for one in-flight call"""
+
+    def __init__(self, call_id: str, vapi_client: VAPIClient, waiter: CallWaiter, now: float):
+        self.call_id = call_id
+        self.vapi_client = vapi_client
+        self.waiter = waiter
+        self.started = now
+        self.next_check = now
+        self.retries = 0
+        # When we last knew the call's state; nothing listed as updated since means unchanged
+        self.seen_at = _utcnow() - timedelta(seconds=LIST_SKEW_SECONDS)
+
+class CallPoller:
+    """One task that checks on every call this process is waiting on.
+
+    Each call is checked on its own schedule: the gap halves as the call approaches
+    the expected duration (a running average of finished calls) and grows again once
+    it runs long, between the client's poll interval (the webhook fallback interval
+    when webhooks are on) and max_poll_interval. When several calls are due at once
+    they are covered by one list request for calls updated since they were last seen;
+    otherwise each is fetched once, and that one record gives both its status and, if
+    it ended, its analysis. Finished calls resolve their CallWaiter.
+    """
+
+    def __init__(self, waiters: CallWaiters = call_waiters, batch_threshold: int = 3,
+                 list_limit: int = 100, max_retries: int = 3):
+        self.waiters = waiters
+        self.batch_threshold = batch_threshold
+        self.list_limit = list_limit
+        self.max_retries = max_retries
+        self.expected_seconds: Optional[float] = None
+        self._calls: Dict[str, TrackedCall] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        waiters.on_event = self._on_event
+
+    def track(self, vapi_client: VAPIClient, call_id: str) -> CallWaiter:
+        """Start watching a call; the returned waiter resolves when it ends."""
+        loop = asyncio.get_running_loop()
+        self._ensure_running(loop)
+        waiter = self.waiters.register(call_id)
+        call = TrackedCall(call_id, vapi_client, waiter, loop.time())
+        call.next_check = call.started + max(vapi_client.poll_initial_delay, self.interval(vapi_client, 0.0))
+        self._calls[call_id] = call
+        vapi_calls_tracked.set(len(self._calls))
+        self._wakeup.set()
+        return waiter
+
+    def untrack(self, call_id: str) -> None:
+        self._calls.pop(call_id, None)
+        self.waiters.discard(call_id)
+        vapi_calls_tracked.set(len(self._calls))
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def interval(self, vapi_client: VAPIClient, age: float) -> float:
+        """Seconds until the next check of a call `age` seconds old."""
+        floor = vapi_client.fallback_poll_interval if vapi_client.webhook_url else vapi_client.poll_interval
+        ceiling = max(vapi_client.max_poll_interval, floor)
+        expected = self.expected_seconds or vapi_client.expected_call_seconds
+        remaining = expected - age
+        # Close in on the expected end; past it, back off the longer the call runs
+        gap = remaining / 2 if remaining > 0 else floor - remaining / 4
+        return min(max(gap, floor), ceiling)
+
+    def _ensure_running(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is not loop:
+            self._calls.clear()
+            self._task = None
+            self._loop = loop
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    def _on_event(self, call_id: str) -> None:
+        call = self._calls.get(call_id)
+        if call is None:
+            return
+        if call.waiter.report.done():
+            self._learn(call, None)
+            self._calls.pop(call_id, None)
+            vapi_calls_tracked.set(len(self._calls))
+        elif call.waiter.ended:
+            call.next_check = min(call.next_check, call.waiter.ended_at + REPORT_GRACE_SECONDS)
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                for call_id in [c.call_id for c in self._calls.values() if c.waiter.report.done()]:
+                    self._calls.pop(call_id, None)
+                vapi_calls_tracked.set(len(self._calls))
+                now = loop.time()
+                due = [c for c in self._calls.values() if c.next_check <= now]
+                if due:
+                    await self._check(due)
+                    continue
+                timeout = min((c.next_check for c in self._calls.values()), default=now + 3600) - now
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("❌ Error in call poller: %s", e, exc_info=True)
+                await asyncio.sleep(1)
+
+    async def _check(self, due: List[TrackedCall]) -> None:
+        groups: Dict[int, List[TrackedCall]] = {}
+        for call in due:
+            groups.setdefault(id(call.vapi_client), []).append(call)
+        for calls in groups.values():
+            if len(calls) >= self.batch_threshold:
+                calls = await self._check_listed(calls)
+            if calls:
+                await asyncio.gather(*(self._fetch(call) for call in calls))
+
+    async def _check_listed(self, calls: List[TrackedCall]) -> List[TrackedCall]:
+        """Settle due calls with list requests; returns those it couldn't account for."""
+        vapi_client = calls[0].vapi_client
+        seen_at = _utcnow()
+        since = min(c.seen_at for c in calls)
+        listed: Dict[str, Dict[str, Any]] = {}
+        until: Optional[datetime] = None
+        complete = False
+        try:
+            # Page back from the newest; bounded so a busy account can't turn this into a crawl
+            for _ in range(len(calls) // self.list_limit + 2):
+                page = await vapi_client.list_calls(since, self.list_limit, updated_until=until)
+                vapi_poll_requests.inc(kind="list")
+                listed.update((record.get("id"), record) for record in page)
+                oldest = min((_parse_timestamp(r.get("updatedAt")) for r in page), key=_sort_key, default=None)
+                if len(page) < self.list_limit or oldest is None or oldest == until:
+                    complete = len(page) < self.list_limit
+                    break
+                until = oldest
+        except Exception as e:
+            logger.warning("⚠️ Listing calls failed, fetching %s one by one: %s", len(calls), e)
+        unaccounted = []
+        for call in calls:
+            record = listed.get(call.call_id)
+            if record is not None:
+                self._observe(call, record, seen_at)
+            elif complete:
+                # Not updated since we last saw it, so still in progress
+                call.seen_at = seen_at - timedelta(seconds=LIST_SKEW_SECONDS)
+                self._reschedule(call)
+            else:
+                unaccounted.append(call)
+        return unaccounted
+
+    async def _fetch(self, call: TrackedCall) -> None:
+        seen_at = _utcnow()
+        try:
+            record = await call.vapi_client.get_call(call.call_id)
+            vapi_poll_requests.inc(kind="get")
+        except Exception as e:
+            call.retries += 1
+            if call.retries >= self.max_retries:
+                call.waiter.fail(Exception(f"Failed to check call status after {self.max_retries} retries: {str(e)}"))
+                self._calls.pop(call.call_id, None)
+                return
+            logger.warning("Error checking status of call %s (attempt %s/%s): %s",
+                           call.call_id, call.retries, self.max_retries, e)
+            call.next_check = asyncio.get_running_loop().time() + call.vapi_client.poll_interval
+            return
+        self._observe(call, record, seen_at)
+
+    def _observe(self, call: TrackedCall, record: Dict[str, Any], seen_at: datetime) -> None:
+        call.retries = 0
+        call.seen_at = seen_at - timedelta(seconds=LIST_SKEW_SECONDS)
+        status = record.get("status", "unknown")
+        logger.debug("Call %s status: %s", call.call_id, status)
+        if status in ENDED_STATUSES:
+            self._learn(call, record)
+            call.waiter.resolve(call_report(record), source="poll")
+            self._calls.pop(call.call_id, None)
+            vapi_calls_tracked.set(len(self._calls))
+        else:
+            self._reschedule(call)
+
+    def _reschedule(self, call: TrackedCall) -> None:
+        now = asyncio.get_running_loop().time()
+        call.next_check = now + self.interval(call.vapi_client, now - call.started)
+        if call.waiter.ended:
+            call.next_check = min(call.next_check, call.waiter.ended_at + REPORT_GRACE_SECONDS)
+
+    def _learn(self, call: TrackedCall, record: Optional[Dict[str, Any]]) -> None:
+        """Fold a finished call's duration into the expected duration."""
+        duration = _record_duration(record) if record else None
+        if duration is None:
+            duration = asyncio.get_running_loop().time() - call.started
+        if self.expected_seconds is None:
+            self.expected_seconds = duration
+        else:
+            self.expected_seconds += DURATION_EWMA_ALPHA * (duration - self.expected_seconds)
+
+call_poller = CallPoller()
+
+async def wait_for_call_end(
+    vapi_client: VAPIClient,
+    call_id: str,
+    timeout: float = 900.0,
+    poller: CallPoller = call_poller,
+) -> Dict[str, Any]:
+    """Wait for a call to end and return its report: the analysis and why it ended.
+
+    With a webhook configured the end-of-call-report resolves this directly and the
+    shared poller only backs it up at the fallback interval; without one the poller
+    is how the call's end is found.
+    """
+    waiter = poller.track(vapi_client, call_id)
+    try:
+        report = await asyncio.wait_for(waiter.report, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise Exception(f"Call {call_id} timed out waiting for completion")
+    finally:
+        poller.untrack(call_id)
+    vapi_call_completions.inc(source=waiter.source or "webhook")
+    return report
+
+def _record_duration(record: Dict[str, Any]) -> Optional[float]:
+    created, ended = _parse_timestamp(record.get("createdAt")), _parse_timestamp(record.get("endedAt"))
+    if created is None or ended is None or ended < created:
+        return None
+    return (ended - created).total_seconds()
+
+def _sort_key(value: Optional[datetime]) -> datetime:
+    return value or datetime.max.replace(tzinfo=timezone.utc)
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
@@ -0,0 +1,289 @@
+from __future__ import annotations
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from pydantic import BaseModel
+from app.clients.vapi import to_e164
+from app.db.call_jobs import CallJob, CallJobDB
+from app.db.call_slots import CallSlotStatsDB, HourStats
+from app.db.restaurants import RestaurantDB
+from app.metrics import call_attempts
+from app.models.base import parse_time_to_minutes
+from app.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Mid-morning and mid-afternoon: staff are in but not serving the lunch or dinner rush
+DEFAULT_CALL_WINDOWS = "10:00-11:30,14:00-17:00"
+
+# Where a state spans two zones this is the one most of its restaurants are in;
+# _STATE_SPLITS below moves the rest by coordinates
+STATE_TIMEZONES = {
+    "AL": "America/Chicago", "AK": "America/Anchorage", "AZ": "America/Phoenix",
+    "AR": "America/Chicago", "CA": "America/Los_Angeles", "CO": "America/Denver",
+    "CT": "America/New_York", "DC": "America/New_York", "DE": "America/New_York",
+    "FL": "America/New_York", "GA": "America/New_York", "HI": "Pacific/Honolulu",
+    "IA": "America/Chicago", "ID": "America/Boise", "IL": "America/Chicago",
+    "IN": "America/Indiana/Indianapolis", "KS": "America/Chicago", "KY": "America/New_York",
+    "LA": "America/Chicago", "MA": "America/New_York", "MD": "America/New_York",
+    "ME": "America/New_York", "MI": "America/Detroit", "MN": "America/Chicago",
+    "MO": "America/Chicago", "MS": "America/Chicago", "MT": "America/Denver",
+    "NC": "America/New_York", "ND": "America/Chicago", "NE": "America/Chicago",
+    "NH": "America/New_York", "NJ": "America/New_York", "NM": "America/Denver",
+    "NV": "America/Los_Angeles", "NY": "America/New_York", "OH": "America/New_York",
+    "OK": "America/Chicago", "OR": "America/Los_Angeles", "PA": "America/New_York",
+    "PR": "America/Puerto_Rico", "RI": "America/New_York", "SC": "America/New_York",
+    "SD": "America/Chicago", "TN": "America/Chicago", "TX": "America/Chicago",
+    "UT": "America/Denver", "VA": "America/New_York", "VT": "America/New_York",
+    "WA": "America/Los_Angeles", "WI": "America/Chicago", "WV": "America/New_York",
+    "WY": "America/Denver",
+}
+
+PROVINCE_TIMEZONES = {
+    "AB": "America/Edmonton", "BC": "America/Vancouver", "MB": "America/Winnipeg",
+    "NB": "America/Moncton", "NL": "America/St_Johns", "NS": "America/Halifax",
+    "ON": "America/Toronto", "PE": "America/Halifax", "QC": "America/Toronto",
+    "SK": "America/Regina", "YT": "America/Whitehorse",
+}
+
+# Approximate zone lines for states that straddle two: (latitude, longitude) -> zone
+_STATE_SPLITS: Dict[str, Callable[[float, float], Optional[str]]] = {
+    "FL": lambda lat, lon: "America/Chicago" if lon < -85.0 else None,
+    "ID": lambda lat, lon: "America/Los_Angeles" if lat > 45.5 else None,
+    "IN": lambda lat, lon: "America/Chicago" if lon < -86.9 and (lat > 41.0 or lat < 38.5) else None,
+    "KS": lambda lat, lon: "America/Denver" if lon < -101.5 else None,
+    "KY": lambda lat, lon: "America/Chicago" if lon < -86.0 else None,
+    "MI": lambda lat, lon: "America/Menominee" if lon < -87.6 and lat > 45.0 else None,
+    "ND": lambda lat, lon: "America/Denver" if lon < -101.3 and lat < 47.0 else None,
+    "NE": lambda lat, lon: "America/Denver" if lon < -101.4 else None,
+    "OR": lambda lat, lon: "America/Boise" if lon > -117.9 and lat < 44.5 else None,
+    "SD": lambda lat, lon: "America/Denver" if lon < -100.5 else None,
+    "TN": lambda lat, lon: "America/New_York" if lon > -85.35 else None,
+    "TX": lambda lat, lon: "America/Denver" if lon < -104.9 else None,
+}
+
+# VAPI endedReason values that say whether someone picked up; anything else (errors,
+# failures to connect) says nothing about the number and isn't counted
+ANSWERED_REASONS = {
+    "customer-ended-call", "assistant-ended-call", "assistant-said-end-call-phrase",
+    "assistant-forwarded-call", "exceeded-max-duration", "silence-timed-out",
+}
+UNANSWERED_REASONS = {"customer-did-not-answer", "customer-busy", "voicemail"}
+
+def _zone_by_coordinates(lat: float, lon: float) -> Optional[str]:
+    """Rough US zone from longitude bands, for rows without a usable state."""
+    if 18.0 < lat < 23.0 and -161.0 < lon < -154.0:
+        return "Pacific/Honolulu"
+    if lat > 51.0 and lon < -129.0:
+        return "America/Anchorage"
+    if not (24.0 < lat < 50.0 and -125.0 < lon < -66.0):
+        return None
+    if lon < -114.5:
+        return "America/Los_Angeles"
+    if lon < -102.0:
+        return "America/Denver"
+    if lon < -87.5:
+        return "America/Chicago"
+    return "America/New_York"
+
+def restaurant_timezone(row: Dict[str, Any]) -> Optional[str]:
+    """IANA timezone for a stored restaurant row, from location.state and coordinates."""
+    location = row.get("location") or {}
+    coordinates = row.get("coordinates") or {}
+    lat, lon = coordinates.get("latitude"), coordinates.get("longitude")
+    has_coordinates = lat is not None and lon is not None and (lat, lon) != (0, 0)
+    state = (location.get("state") or "").strip().upper()
+    country = (location.get("country") or "US").strip().upper()
+    if country == "CA":
+        return PROVINCE_TIMEZONES.get(state)
+    if country != "US":
+        return None
+    zone = STATE_TIMEZONES.get(state)
+    if zone and has_coordinates and state in _STATE_SPLITS:
+        zone = _STATE_SPLITS[state](float(lat), float(lon)) or zone
+    if zone is None and has_coordinates:
+        zone = _zone_by_coordinates(float(lat), float(lon))
+    return zone
+
+def parse_call_windows(spec: str) -> List[Tuple[int, int]]:
+    """Parse '10:00-11:30,14:00-17:00' into (start, end) minutes after local midnight."""
+    windows = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        start, sep, end = part.partition("-")
+        if not sep:
+            raise ValueError(f"Invalid call window: {part!r}")
+        start_minutes, end_minutes = parse_time_to_minutes(start), parse_time_to_minutes(end)
+        if end_minutes <= start_minutes:
+            raise ValueError(f"Call window ends before it starts: {part!r}")
+        windows.append((start_minutes, end_minutes))
+    if not windows:
+        raise ValueError("No call windows configured")
+    return sorted(windows)
+
+class CallSlot(BaseModel):
+    """One stretch of a calling window, at most an hour long, in the restaurant's timezone"""
+    starts_at: datetime
+    ends_at: datetime
+    local_hour: int
+    answer_rate: float
+
+class CallScheduler:
+    """Decides when each queued call should be placed.
+
+    Jobs are only dialed inside the restaurant's local calling windows. Each window is
+    split into hourly slots scored by the number's answer rate in that local hour,
+    smoothed toward the rate across all numbers so new numbers start from the global
+    pattern. A job gets the earliest slot within `tolerance` of the best one in the
+    next `lookahead_days`, and that slot's rate (plus the job's boost) becomes its
+    claim priority, so while windows are open the likeliest answers go first.
+    """
+
+    def __init__(
+        self,
+        job_db: CallJobDB,
+        restaurant_db: RestaurantDB,
+        stats_db: CallSlotStatsDB,
+        windows: str = DEFAULT_CALL_WINDOWS,
+        default_timezone: str = "America/Chicago",
+        lookahead_days: int = 2,
+        prior_weight: float = 4.0,
+        tolerance: float = 0.05,
+        batch_size: int = 100,
+    ):
+        self.job_db = job_db
+        self.restaurant_db = restaurant_db
+        self.stats_db = stats_db
+        self.windows = parse_call_windows(windows)
+        self.default_timezone = default_timezone
+        self.lookahead_days = max(1, lookahead_days)
+        self.prior_weight = prior_weight
+        self.tolerance = tolerance
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_env(cls, job_db: CallJobDB, restaurant_db: RestaurantDB,
+                 stats_db: CallSlotStatsDB) -> "CallScheduler":
+        return cls(
+            job_db, restaurant_db, stats_db,
+            windows=os.getenv("DISPATCH_CALL_WINDOWS", DEFAULT_CALL_WINDOWS),
+            default_timezone=os.getenv("DISPATCH_DEFAULT_TIMEZONE", "America/Chicago"),
+            lookahead_days=int(os.getenv("DISPATCH_LOOKAHEAD_DAYS", "2")),
+        )
+
+    def zone(self, name: Optional[str]) -> ZoneInfo:
+        try:
+            return ZoneInfo(name or self.default_timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("⚠️ Unknown timezone %s, using %s", name, self.default_timezone)
+            return ZoneInfo(self.default_timezone)
+
+    def local_hour(self, timezone_name: Optional[str], at: Optional[datetime] = None) -> int:
+        return (at or _now()).astimezone(self.zone(timezone_name)).hour
+
+    def slots(self, timezone_name: Optional[str], not_before: datetime) -> List[CallSlot]:
+        """Hour-long pieces of the calling windows from `not_before` through the lookahead."""
+        zone = self.zone(timezone_name)
+        first_day = not_before.astimezone(zone).date()
+        slots = []
+        for offset in range(self.lookahead_days + 1):
+            day = first_day + timedelta(days=offset)
+            for start, end in self.windows:
+                cursor = start
+                while cursor < end:
+                    stop = min(end, (cursor // 60 + 1) * 60)
+                    starts_at, ends_at = _local(day, cursor, zone), _local(day, stop, zone)
+                    if ends_at > not_before:
+                        slots.append(CallSlot(
+                            starts_at=max(starts_at, not_before), ends_at=ends_at,
+                            local_hour=cursor // 60, answer_rate=0.0,
+                        ))
+                    cursor = stop
+        return slots
+
+    def answer_rate(self, hour: int, history: HourStats, totals: HourStats) -> float:
+        """Expected share of answered calls in a local hour, shrunk toward all numbers' rate."""
+        total_attempts, total_answered = totals.get(hour, (0, 0))
+        prior = (total_answered + 1) / (total_attempts + 2)
+        attempts, answered = history.get(hour, (0, 0))
+        return (answered + self.prior_weight * prior) / (attempts + self.prior_weight)
+
+    def best_slot(self, timezone_name: Optional[str], not_before: datetime,
+                  history: HourStats, totals: HourStats) -> Optional[CallSlot]:
+        slots = self.slots(timezone_name, not_before)
+        for slot in slots:
+            slot.answer_rate = self.answer_rate(slot.local_hour, history, totals)
+        if not slots:
+            return None
+        best = max(slot.answer_rate for slot in slots)
+        return next(slot for slot in slots if slot.answer_rate >= best - self.tolerance)
+
+    def record_attempt(self, phone: str, timezone_name: Optional[str], dialed_at: datetime,
+                       ended_reason: Optional[str]) -> Optional[bool]:
+        """Learn from a finished call: answered or not, in the local hour it was placed."""
+        if ended_reason in ANSWERED_REASONS:
+            answered = True
+        elif ended_reason in UNANSWERED_REASONS:
+            answered = False
+        else:
+            return None
+        self.stats_db.record_attempt(phone, self.local_hour(timezone_name, dialed_at), answered)
+        call_attempts.inc(answered=str(answered).lower())
+        return answered
+
+    @traced()
+    def schedule_pending(self) -> int:
+        """Give a calling slot to waiting jobs that have none (or whose window closed)."""
+        jobs = self.job_db.get_unscheduled(self.batch_size)
+        if not jobs:
+            return 0
+        rows = self.restaurant_db.get_stored_rows_by_ids(
+            [job.restaurant_id for job in jobs], "business_id,phone,location,coordinates"
+        )
+        restaurants = {row["business_id"]: row for row in rows}
+        phones: Dict[str, str] = {}
+        for rid, row in restaurants.items():
+            try:
+                phones[rid] = to_e164(row.get("phone") or "")
+            except ValueError:
+                pass
+        history = self.stats_db.get_for_phones(list(phones.values()))
+        totals = self.stats_db.get_totals()
+
+        now = _now()
+        scheduled = 0
+        for job in jobs:
+            data = self._slot_data(job, restaurants.get(job.restaurant_id), phones.get(job.restaurant_id),
+                                   history, totals, now)
+            if self.job_db.schedule(job, data):
+                scheduled += 1
+        logger.info("🗓️ Scheduled %s call jobs", scheduled)
+        return scheduled
+
+    def _slot_data(self, job: CallJob, row: Optional[Dict[str, Any]], phone: Optional[str],
+                   history: Dict[str, HourStats], totals: HourStats, now: datetime) -> Dict[str, Any]:
+        if row is None or phone is None:
+            # Nothing to schedule around; run it now and let the checker fail it
+            return {"run_after": now.isoformat(), "window_ends_at": None, "priority": job.boost}
+        timezone_name = restaurant_timezone(row)
+        not_before = max(now, job.run_after or now)
+        slot = self.best_slot(timezone_name, not_before, history.get(phone, {}), totals)
+        data: Dict[str, Any] = {"phone": phone, "timezone": timezone_name or self.default_timezone}
+        if slot is None:
+            data.update(run_after=not_before.isoformat(), window_ends_at=None, priority=job.boost)
+        else:
+            data.update(run_after=slot.starts_at.isoformat(), window_ends_at=slot.ends_at.isoformat(),
+                        priority=round(slot.answer_rate + job.boost, 4))
+        return data
+
+def _local(day: date, minutes: int, zone: ZoneInfo) -> datetime:
+    """A local wall-clock time as UTC; minutes may be 24:00, the next midnight."""
+    # Aware arithmetic is wall-clock, so the UTC offset is the one in force at that time
+    local = datetime.combine(day, time(0), tzinfo=zone) + timedelta(minutes=minutes)
+    return local.astimezone(timezone.utc)
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
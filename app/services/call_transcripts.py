@@ -0,0 +1,243 @@
+from __future__ import annotations
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.models.base import parse_time_to_minutes
+
+logger = logging.getLogger(__name__)
+
+# What the assistant says before hanging up once everything has been captured
+WRAP_UP_MESSAGE = "That's everything I needed. Thank you so much for your time, have a great day!"
+
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+_MINUTE_WORDS = {"fifteen": 15, "thirty": 30, "forty five": 45, "forty-five": 45}
+_NUMBER_WORD_RE = re.compile(
+    r"\b(" + "|".join(_NUMBER_WORDS) + r")(?:\s+(" + "|".join(_MINUTE_WORDS) + r"))?(?:\s+o'?clock)?\b",
+    re.IGNORECASE,
+)
+
+_TIME = r"(?:\b\d{1,2}(?::\d{2})?(?:\s*[ap]\.?\s?m\b\.?)?|noon|midnight)"
+_RANGE_RE = re.compile(
+    rf"(?P<open>{_TIME})\s*(?:-|–|to|till|til|until|through)\s*(?P<close>{_TIME})", re.IGNORECASE
+)
+_OPENS_RE = re.compile(rf"\bopen(?:s|ing)?\s+(?:at|from)\s+(?P<time>{_TIME})", re.IGNORECASE)
+_CLOSES_RE = re.compile(rf"\b(?:close[sd]?|closing)\s+(?:at|by)\s+(?P<time>{_TIME})|\buntil\s+(?P<until>{_TIME})",
+                        re.IGNORECASE)
+_HOURS_TOPIC_RE = re.compile(r"\b(?:open|close[sd]?|closing|hours|until|from)\b", re.IGNORECASE)
+_CLOSED_TODAY_RE = re.compile(
+    r"\bclosed\s+(?:today|all day|for the day|for the holiday)\b|\bnot open today\b", re.IGNORECASE
+)
+_CONSENT_ASK_RE = re.compile(
+    r"\b(?:consent|permission|(?:okay|ok|alright|all right|fine) (?:if|to|with)|mind if)\b", re.IGNORECASE
+)
+_AFFIRM_RE = re.compile(
+    r"^\W*(?:yes|yeah|yep|yup|sure|of course|absolutely|definitely|okay|ok|go ahead|correct|"
+    r"that's right|that is right|that's fine|that is fine|right|no problem|no worries|fine)\b",
+    re.IGNORECASE,
+)
+_DENY_RE = re.compile(r"^\W*(?:no|nope|nah|please don't|don't|do not|i'd rather not|rather not)\b", re.IGNORECASE)
+_WITHDRAW_RE = re.compile(
+    r"\b(?:don't|do not|stop|quit)\s+call(?:ing)?\b|\bremove (?:us|me|our)\b|\btake (?:us|me) off\b|"
+    r"\bno more calls\b|\bnot interested\b",
+    re.IGNORECASE,
+)
+_MERIDIEM_RE = re.compile(r"[ap]\.?\s?m\b|noon|midnight", re.IGNORECASE)
+
+# How sure a time is: said with am/pm, with am/pm guessed, or repeated back and confirmed
+EXPLICIT_CONFIDENCE = 0.9
+INFERRED_CONFIDENCE = 0.7
+CONFIRMED_CONFIDENCE = 1.0
+
+def _words_to_digits(text: str) -> str:
+    """'eleven to nine thirty' -> '11 to 9:30'; transcribers don't always write numbers as digits."""
+    def replace(match: "re.Match[str]") -> str:
+        hour = _NUMBER_WORDS[match.group(1).lower()]
+        minutes = _MINUTE_WORDS.get((match.group(2) or "").lower())
+        return f"{hour}:{minutes:02d}" if minutes else str(hour)
+    return _NUMBER_WORD_RE.sub(replace, text)
+
+def _resolve_time(raw: str, role: str, open_minutes: Optional[int] = None) -> Tuple[int, bool]:
+    """Minutes after midnight for a spoken time, and whether am/pm was actually said.
+
+    Without am/pm an opening time of 5-11 is the morning and 12-4 the afternoon; a
+    closing time is the evening (or midnight for 12), unless it's 24-hour.
+    """
+    minutes = parse_time_to_minutes(raw)
+    if _MERIDIEM_RE.search(raw):
+        return minutes, True
+    hour = minutes // 60
+    if hour == 0 or hour > 12:
+        return minutes, True
+    if role == "open":
+        return (minutes + 12 * 60 if 1 <= hour <= 4 else minutes), False
+    if hour == 12:
+        return minutes - 12 * 60, False
+    evening = minutes + 12 * 60
+    if open_minutes is not None and minutes > open_minutes and hour >= 9 and open_minutes < 9 * 60:
+        return minutes, False  # "6 to 11": a breakfast place closing late morning
+    return evening, False
+
+def _clock(minutes: int) -> str:
+    """Minutes after midnight as '9:00 PM', the format VAPI's structured data uses."""
+    hour, minute = divmod(minutes % (24 * 60), 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+class CallTranscript:
+    """Incremental parse of one call's transcript for today's hours and the restaurant's consent.
+
+    Final transcript lines are fed in order. The restaurant's lines ('user' in VAPI) are
+    searched for opening and closing times and for a yes or no to the assistant's consent
+    question; the assistant's lines give context (what was just asked, times read back).
+    """
+
+    def __init__(self, call_id: str):
+        self.call_id = call_id
+        self.time_open: Optional[int] = None
+        self.time_closed: Optional[int] = None
+        self.open_confidence = 0.0
+        self.close_confidence = 0.0
+        self.closed_today = False
+        self.consent: Optional[bool] = None
+        self.wrapped_up = False
+        self._asked_consent = False
+        self._asked_hours = False
+        self._read_back: Optional[Tuple[int, int]] = None
+        self.lines = 0
+
+    @property
+    def hours_confidence(self) -> float:
+        if self.closed_today:
+            return EXPLICIT_CONFIDENCE
+        return min(self.open_confidence, self.close_confidence)
+
+    def captured(self, threshold: float) -> bool:
+        return self.consent is not None and self.hours_confidence >= threshold
+
+    def structured_data(self) -> Dict[str, Any]:
+        """What was heard so far, shaped like VAPI's structured data."""
+        data: Dict[str, Any] = {"is_open": not self.closed_today}
+        if self.time_open is not None and self.time_closed is not None and not self.closed_today:
+            data.update(time_open=_clock(self.time_open), time_closed=_clock(self.time_closed))
+        if self.consent is not None:
+            data["withdrawing_consent"] = not self.consent
+        return data
+
+    def feed(self, role: str, text: str) -> None:
+        self.lines += 1
+        text = _words_to_digits(text.strip())
+        if role == "assistant":
+            self._hear_assistant(text)
+        elif role == "user":
+            self._hear_restaurant(text)
+
+    def _hear_assistant(self, text: str) -> None:
+        self._asked_consent = bool(_CONSENT_ASK_RE.search(text))
+        self._asked_hours = bool(_HOURS_TOPIC_RE.search(text))
+        match = _RANGE_RE.search(text)
+        if match:
+            opened, _ = _resolve_time(match.group("open"), "open")
+            closed, _ = _resolve_time(match.group("close"), "close", opened)
+            self._read_back = (opened, closed)
+        else:
+            self._read_back = None
+
+    def _hear_restaurant(self, text: str) -> None:
+        if _WITHDRAW_RE.search(text):
+            self.consent = False
+        affirmed = bool(_AFFIRM_RE.search(text))
+        if self._asked_consent and self.consent is None:
+            if affirmed:
+                self.consent = True
+            elif _DENY_RE.search(text):
+                self.consent = False
+        if affirmed and self._read_back and self._read_back == (self.time_open, self.time_closed):
+            self.open_confidence = self.close_confidence = CONFIRMED_CONFIDENCE
+        if not (self._asked_hours or _HOURS_TOPIC_RE.search(text)):
+            return
+        if _CLOSED_TODAY_RE.search(text):
+            self.closed_today = True
+            return
+        match = _RANGE_RE.search(text)
+        if match:
+            opened, open_explicit = _resolve_time(match.group("open"), "open")
+            closed, close_explicit = _resolve_time(match.group("close"), "close", opened)
+            self._set_open(opened, open_explicit)
+            self._set_close(closed, close_explicit)
+            return
+        match = _OPENS_RE.search(text)
+        if match:
+            self._set_open(*_resolve_time(match.group("time"), "open"))
+        match = _CLOSES_RE.search(text)
+        if match:
+            self._set_close(*_resolve_time(match.group("time") or match.group("until"), "close", self.time_open))
+
+    def _set_open(self, minutes: int, explicit: bool) -> None:
+        self.time_open, self.open_confidence = minutes, self._confidence(
+            minutes, self.time_open, self.open_confidence, explicit)
+        self.closed_today = False
+
+    def _set_close(self, minutes: int, explicit: bool) -> None:
+        self.time_closed, self.close_confidence = minutes, self._confidence(
+            minutes, self.time_closed, self.close_confidence, explicit)
+        self.closed_today = False
+
+    @staticmethod
+    def _confidence(minutes: int, previous: Optional[int], previous_confidence: float, explicit: bool) -> float:
+        confidence = EXPLICIT_CONFIDENCE if explicit else INFERRED_CONFIDENCE
+        if previous == minutes:
+            # Said again: at least as sure as before, and a little more
+            return min(CONFIRMED_CONFIDENCE, max(confidence, previous_confidence) + 0.1)
+        return confidence
+
+class CallTranscripts:
+    """Transcripts of calls in progress, fed from VAPI 'transcript' server messages.
+
+    Kept per process: if a call's messages are spread over several workers none may see
+    enough to end it early, and the call simply runs to its natural end.
+    """
+
+    def __init__(self, max_calls: int = 1000):
+        self.max_calls = max_calls
+        self._calls: "OrderedDict[str, CallTranscript]" = OrderedDict()
+
+    def feed(self, call_id: str, message: Dict[str, Any], threshold: float) -> Optional[str]:
+        """Add one transcript message; returns why to wrap the call up ('captured' or
+        'withdrawn') the first time it should be, otherwise None.
+        """
+        if message.get("transcriptType", "final") != "final" or not message.get("transcript"):
+            return None
+        transcript = self._calls.get(call_id)
+        if transcript is None:
+            transcript = self._calls[call_id] = CallTranscript(call_id)
+            while len(self._calls) > self.max_calls:
+                self._calls.popitem(last=False)
+        try:
+            transcript.feed(message.get("role", ""), message["transcript"])
+        except ValueError as e:
+            logger.debug("Ignoring unparseable time on call %s: %s", call_id, e)
+        if transcript.wrapped_up:
+            return None
+        if transcript.consent is False:
+            reason = "withdrawn"
+        elif transcript.captured(threshold):
+            reason = "captured"
+        else:
+            return None
+        transcript.wrapped_up = True
+        logger.info("✂️ Call %s can wrap up (%s): %s", call_id, reason, transcript.structured_data())
+        return reason
+
+    def get(self, call_id: str) -> Optional[CallTranscript]:
+        return self._calls.get(call_id)
+
+    def discard(self, call_id: str) -> None:
+        self._calls.pop(call_id, None)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+call_transcripts = CallTranscripts()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+from pydantic import ValidationError
+from app.cache.single_flight import SingleFlight
+from app.clients.vapi import VAPIClient, to_e164
+from app.db.call_jobs import CallJobDB
+from app.db.operating_hours import OperatingHoursDB
+from app.db.phone_calls import PhoneCallDB
+from app.db.restaurants import RestaurantDB
+from app.models import StructuredHours
+from app.services.call_events import wait_for_call_end
+from app.services.call_schedule import CallScheduler, restaurant_timezone
+from app.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+CHECK_HOURS_MESSAGE = "This is a call to check hours"
+
+class CallDeferred(Exception):
+    """The number can't be called right now; try again at `run_after` without spending an attempt."""
+
+    def __init__(self, message: str, run_after: datetime):
+        super().__init__(message)
+        self.run_after = run_after
+
+def persist_call_analysis(
+    restaurant_id: str, analysis: Dict[str, Any], hours_db: OperatingHoursDB
+) -> Dict[str, Any]:
+    """Store the hours captured by a finished call and summarize the outcome."""
+    structured_data = analysis.get("structuredData") or {}
+    success_evaluation = analysis.get("successEvaluation", False)
+
+    # A single call can capture today's hours, the weekly schedule and holiday overrides.
+    # A schedule the model garbled is dropped; today's hours are still worth keeping.
+    schedule = None
+    if structured_data:
+        try:
+            schedule = StructuredHours.from_analysis(structured_data)
+        except ValidationError as e:
+            logger.warning("⚠️ Ignoring unparseable schedule for restaurant %s: %s", restaurant_id, e)
+    has_daily_hours = "time_open" in structured_data and "time_closed" in structured_data
+    hours_updated = False
+    if success_evaluation and (has_daily_hours or schedule):
+        logger.info("✅ Updating hours for restaurant: %s", restaurant_id)
+        hours_updated = hours_db.update_hours(
+            restaurant_id,
+            structured_data.get("time_open"),
+            structured_data.get("time_closed"),
+            structured_data.get("is_open"),
+            schedule=schedule
+        )
+
+    return {
+        "successEvaluation": success_evaluation,
+        "structured_data": structured_data,
+        "hours_updated": hours_updated,
+    }
+
+@traced()
+async def apply_call_result(
+    phone: str,
+    call_id: str,
+    analysis: Dict[str, Any],
+    restaurant_db: RestaurantDB,
+    hours_db: OperatingHoursDB,
+    job_db: CallJobDB,
+    restaurant_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Write one call's outcome to every stored restaurant reachable at `phone`.
+
+    `restaurant_id`, the restaurant the call was placed for, comes first even if it
+    isn't stored yet. Jobs still waiting for the others are settled with the same result.
+    """
+    sharing = await asyncio.to_thread(restaurant_db.get_stored_by_phone, phone)
+    restaurant_ids: List[str] = list(dict.fromkeys(
+        ([restaurant_id] if restaurant_id else []) + [r.business_id for r in sharing]
+    ))
+    result: Dict[str, Any] = {
+        "call_id": call_id,
+        "phone": phone,
+        "successEvaluation": analysis.get("successEvaluation", False),
+        "structured_data": analysis.get("structuredData") or {},
+        "hours_updated": False,
+        "shared_with": restaurant_ids[1:],
+    }
+    for index, rid in enumerate(restaurant_ids):
+        summary = await asyncio.to_thread(persist_call_analysis, rid, analysis, hours_db)
+        if index == 0:
+            result.update(summary)
+    if result["successEvaluation"] and restaurant_ids:
+        for rid in restaurant_ids:
+            await restaurant_db.update_restaurant(rid, {"is_hours_verified": True})
+        settled = await asyncio.to_thread(job_db.complete_pending, restaurant_ids[1:], result)
+        if len(restaurant_ids) > 1:
+            logger.info("📞 Call %s to %s covered %s restaurants (%s queued jobs settled)",
+                        call_id, phone, len(restaurant_ids), settled)
+    return result
+
+class HoursChecker:
+    """Places hours-check calls keyed by E.164 number rather than by restaurant.
+
+    Concurrent checks for one number in this process share a single call, other workers
+    find the number busy, and for `cooldown_seconds` after a call ends its result is
+    reused instead of dialing again. Every call's outcome goes to all restaurants with
+    that number. With a scheduler, whether each call was answered is recorded against
+    the local hour it was placed in.
+    """
+
+    def __init__(
+        self,
+        vapi_client: VAPIClient,
+        restaurant_db: RestaurantDB,
+        hours_db: OperatingHoursDB,
+        phone_db: PhoneCallDB,
+        job_db: CallJobDB,
+        worker_id: str,
+        lease_seconds: int = 300,
+        cooldown_seconds: int = 6 * 3600,
+        busy_retry_seconds: float = 60.0,
+        scheduler: Optional[CallScheduler] = None,
+    ):
+        self.vapi_client = vapi_client
+        self.restaurant_db = restaurant_db
+        self.hours_db = hours_db
+        self.phone_db = phone_db
+        self.job_db = job_db
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.busy_retry_seconds = busy_retry_seconds
+        self.scheduler = scheduler
+        self._flight = SingleFlight()
+        self._held: Set[str] = set()
+
+    @traced()
+    async def check(self, restaurant_id: str) -> Dict[str, Any]:
+        """Get a restaurant's hours over the phone, unless its number is already being or was just called."""
+        logger.info("🔍 Calling to check hours for restaurant: %s", restaurant_id)
+        restaurant = await self.restaurant_db.get_restaurant(restaurant_id)
+        if not restaurant:
+            raise ValueError(f"Restaurant {restaurant_id} not found")
+        if not restaurant.phone:
+            raise ValueError(f"Restaurant {restaurant_id} has no phone number")
+        phone = to_e164(restaurant.phone)
+        timezone_name = restaurant_timezone(restaurant.model_dump(include={"location", "coordinates"}))
+        result = await self._flight.do(phone, lambda: self._call_number(phone, restaurant_id, timezone_name))
+        if restaurant_id != result["restaurant_id"] and restaurant_id not in result.get("shared_with", []):
+            # Shared a call placed for another restaurant that didn't cover this one
+            result = await self._reuse(phone, restaurant_id, result)
+        return result
+
+    async def _call_number(self, phone: str, restaurant_id: str,
+                           timezone_name: Optional[str] = None) -> Dict[str, Any]:
+        claim = await asyncio.to_thread(
+            self.phone_db.acquire, phone, self.worker_id, self.lease_seconds, self.cooldown_seconds
+        )
+        if claim.outcome == "busy":
+            raise CallDeferred(f"{phone} is being called by another worker",
+                               _now() + timedelta(seconds=self.busy_retry_seconds))
+        if claim.outcome == "recent":
+            last = claim.result or {}
+            if not (last.get("analysis") or {}).get("successEvaluation"):
+                raise CallDeferred(f"{phone} was called recently without capturing hours",
+                                   (claim.ended_at or _now()) + timedelta(seconds=self.cooldown_seconds))
+            logger.info("♻️ Reusing call %s to %s from within the cooldown", claim.call_id, phone)
+            return await self._reuse(phone, restaurant_id, last)
+
+        self._held.add(phone)
+        call_id = claim.call_id
+        resumed = call_id is not None
+        dialed_at = _now()
+        try:
+            if resumed:
+                logger.info("🔁 Resuming call %s to %s", call_id, phone)
+            else:
+                call_id = await self.vapi_client.make_call(
+                    phone, CHECK_HOURS_MESSAGE, idempotency_key=claim.idempotency_key
+                )
+                await asyncio.to_thread(self.phone_db.set_call_id, phone, self.worker_id, call_id)
+            report = await wait_for_call_end(self.vapi_client, call_id)
+        except BaseException as e:
+            if resumed:
+                # The number was dialed and that call can't be followed; let the cooldown run
+                await asyncio.to_thread(self.phone_db.finish, phone, self.worker_id,
+                                        {"call_id": call_id, "error": str(e)})
+            else:
+                # The next owner resumes the call, or retries the create under the same key
+                await asyncio.to_thread(self.phone_db.release, phone, self.worker_id)
+            raise
+        finally:
+            self._held.discard(phone)
+
+        analysis = report["analysis"]
+        await asyncio.to_thread(self.phone_db.finish, phone, self.worker_id,
+                                {"call_id": call_id, "analysis": analysis})
+        if self.scheduler and not resumed:
+            # A resumed call was dialed by another worker at a time this one doesn't know
+            await asyncio.to_thread(self.scheduler.record_attempt, phone, timezone_name,
+                                    dialed_at, report.get("endedReason"))
+        result = await apply_call_result(
+            phone, call_id, analysis, self.restaurant_db, self.hours_db, self.job_db,
+            restaurant_id=restaurant_id,
+        )
+        return {**result, "restaurant_id": restaurant_id, "analysis": analysis}
+
+    async def _reuse(self, phone: str, restaurant_id: str, last: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply an earlier call's analysis to `restaurant_id` without dialing."""
+        analysis = last.get("analysis") or {}
+        summary = await asyncio.to_thread(persist_call_analysis, restaurant_id, analysis, self.hours_db)
+        if summary["successEvaluation"]:
+            await self.restaurant_db.update_restaurant(restaurant_id, {"is_hours_verified": True})
+        return {
+            "call_id": last.get("call_id"), "phone": phone, **summary,
+            "restaurant_id": restaurant_id, "analysis": analysis, "reused": True,
+        }
+
+    def renew_leases(self) -> None:
+        """Keep holding the numbers this worker is calling; runs with the job lease renewal."""
+        for phone in list(self._held):
+            self.phone_db.renew_lease(phone, self.worker_id, self.lease_seconds)
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
@@ -0,0 +1,268 @@
+"""Bulk export of stored restaurants joined with their operating hours, as NDJSON, CSV or
+Parquet. Rows are read in keyset-paginated chunks and each chunk is encoded and written
+before the next is read, so memory stays flat however large the table is. Served by
+GET /api/admin/export/restaurants, or from the command line:
+
+    python -m app.services.restaurant_export --format csv --output restaurants.csv
+    python -m app.services.restaurant_export --format parquet --since 2026-10-19T00:00:00Z --output delta.parquet
+
+An incremental export (`since`) has the restaurants whose row or hours changed after
+that time; pass the previous export's watermark to pick up where it left off. The
+watermark is a little before the export started, so a write that was still committing
+then turns up again next time instead of being missed.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.db.restaurant_snapshot import parse_timestamp
+from app.responses import NDJSON_MEDIA_TYPE, ndjson_lines
+
+if TYPE_CHECKING:
+    from app.db.operating_hours import OperatingHoursDB
+    from app.db.restaurants import RestaurantDB
+
+logger = logging.getLogger(__name__)
+
+# How far the watermark trails the export's start: rows stamped with updated_at before
+# then but committed after the export read past them would otherwise never be exported.
+# Rows in the overlap come out twice, which is harmless.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+def export_watermark(started_at: datetime) -> datetime:
+    """The `since` to pass to the export after one started at `started_at`."""
+    return started_at - WATERMARK_OVERLAP
+
+def _hours(key: str) -> Callable[[Dict[str, Any]], Any]:
+    return lambda row: (row.get("operating_hours") or {}).get(key)
+
+def _location(key: str) -> Callable[[Dict[str, Any]], Any]:
+    return lambda row: (row.get("location") or {}).get(key)
+
+def _coordinate(key: str) -> Callable[[Dict[str, Any]], Any]:
+    return lambda row: (row.get("coordinates") or {}).get(key)
+
+def _categories(row: Dict[str, Any]) -> str:
+    return ",".join(c.get("alias", "") for c in row.get("categories") or [] if isinstance(c, dict))
+
+def _schedule(row: Dict[str, Any]) -> Optional[str]:
+    schedule = (row.get("operating_hours") or {}).get("schedule")
+    return json.dumps(schedule) if schedule else None
+
+# Flat columns for CSV and Parquet: name, type, and how to read it from a joined row.
+# NDJSON keeps the stored rows whole, with the hours row under "operating_hours".
+EXPORT_COLUMNS: Tuple[Tuple[str, str, Callable[[Dict[str, Any]], Any]], ...] = (
+    ("business_id", "string", lambda row: row.get("business_id")),
+    ("name", "string", lambda row: row.get("name")),
+    ("phone", "string", lambda row: row.get("phone")),
+    ("price", "string", lambda row: row.get("price")),
+    ("rating", "float", lambda row: row.get("rating")),
+    ("address1", "string", _location("address1")),
+    ("city", "string", _location("city")),
+    ("state", "string", _location("state")),
+    ("zip_code", "string", _location("zip_code")),
+    ("country", "string", _location("country")),
+    ("latitude", "float", _coordinate("latitude")),
+    ("longitude", "float", _coordinate("longitude")),
+    ("business_type", "string", lambda row: row.get("business_type")),
+    ("categories", "string", _categories),
+    ("is_closed", "bool", lambda row: row.get("is_closed")),
+    ("is_open", "bool", lambda row: row.get("is_open")),
+    ("is_hours_verified", "bool", lambda row: row.get("is_hours_verified")),
+    ("updated_at", "string", lambda row: row.get("updated_at")),
+    ("hours_time_open", "string", _hours("time_open")),
+    ("hours_time_closed", "string", _hours("time_closed")),
+    ("hours_is_open", "bool", _hours("is_open")),
+    ("hours_is_verified", "bool", _hours("is_hours_verified")),
+    ("hours_is_consenting", "bool", _hours("is_consenting")),
+    ("hours_schedule", "string", _schedule),
+    ("hours_updated_at", "string", _hours("updated_at")),
+)
+
+def _join_hours(rows: List[Dict[str, Any]], hours_map: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for row in rows:
+        row["operating_hours"] = hours_map.get(row["business_id"])
+    return rows
+
+def _changed_after(row: Dict[str, Any], since: datetime) -> bool:
+    updated_at = parse_timestamp(row.get("updated_at"))
+    return updated_at is not None and updated_at > since
+
+def iter_export_rows(
+    db: RestaurantDB, oh_db: OperatingHoursDB, since: Optional[datetime] = None, chunk_size: int = 500
+) -> Iterator[List[Dict[str, Any]]]:
+    """Stored restaurant rows with their hours row under "operating_hours", a chunk at a time.
+
+    Everything by business_id; or, with `since`, restaurants changed after it (oldest
+    change first) followed by those where only the hours changed.
+    """
+    if since is None:
+        for rows in db.iter_cached_restaurant_rows(chunk_size=chunk_size):
+            yield _join_hours(rows, oh_db.get_hours_bulk([row["business_id"] for row in rows]))
+        return
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    for rows in db.iter_restaurant_rows_updated_after(since.isoformat(), chunk_size):
+        yield _join_hours(rows, oh_db.get_hours_bulk([row["business_id"] for row in rows]))
+    for hours_rows in oh_db.iter_hours_updated_after(since.isoformat(), chunk_size):
+        hours_map = {hours["restaurant_id"]: hours for hours in hours_rows}
+        # Restaurants that changed themselves went out above, already with these hours
+        rows = [row for row in db.get_stored_rows_by_ids(list(hours_map)) if not _changed_after(row, since)]
+        if rows:
+            yield _join_hours(rows, hours_map)
+
+class NDJSONEncoder:
+    media_type = NDJSON_MEDIA_TYPE
+    extension = "ndjson"
+
+    def start(self) -> bytes:
+        return b""
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return ndjson_lines(rows)
+
+    def finish(self) -> bytes:
+        return b""
+
+class CSVEncoder:
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    def _lines(self, records: Iterable[List[Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(records)
+        return buffer.getvalue().encode("utf-8")
+
+    def start(self) -> bytes:
+        return self._lines([[name for name, _, _ in EXPORT_COLUMNS]])
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        def cell(value: Any) -> Any:
+            if isinstance(value, bool):
+                return "true" if value else "false"
+            return "" if value is None else value
+        return self._lines([cell(read(row)) for _, _, read in EXPORT_COLUMNS] for row in rows)
+
+    def finish(self) -> bytes:
+        return b""
+
+class _Drain:
+    """Write-only file for ParquetWriter whose contents are taken after every row group."""
+
+    def __init__(self):
+        self.closed = False
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+class ParquetEncoder:
+    """One row group per chunk (requires the optional `pyarrow` package)."""
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ValueError("Parquet exports require the `pyarrow` package") from e
+        self._pa = pyarrow
+        types = {"string": pyarrow.string(), "float": pyarrow.float64(), "bool": pyarrow.bool_()}
+        self._schema = pyarrow.schema([(name, types[kind]) for name, kind, _ in EXPORT_COLUMNS])
+        self._drain = _Drain()
+        self._writer = pyarrow.parquet.ParquetWriter(self._drain, self._schema, compression="zstd")
+
+    def start(self) -> bytes:
+        return self._drain.take()
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        columns = {name: [read(row) for row in rows] for name, _, read in EXPORT_COLUMNS}
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+        return self._drain.take()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._drain.take()
+
+EXPORT_FORMATS = {"ndjson": NDJSONEncoder, "csv": CSVEncoder, "parquet": ParquetEncoder}
+
+def export_encoder(export_format: str):
+    """An encoder for `export_format`; ValueError if it's unknown or its dependency is missing."""
+    encoder = EXPORT_FORMATS.get(export_format)
+    if encoder is None:
+        raise ValueError(f"Unknown export format: {export_format}")
+    return encoder()
+
+def encode_export(chunks: Iterator[List[Dict[str, Any]]], encoder: Any) -> Iterator[bytes]:
+    """The export file, a piece per chunk of rows."""
+    exported = 0
+    yield encoder.start()
+    for rows in chunks:
+        exported += len(rows)
+        yield encoder.encode(rows)
+    yield encoder.finish()
+    logger.info("📤 Exported %s restaurants as %s", exported, encoder.extension)
+
+async def stream_export(pieces: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Read and encode each chunk off the event loop, sending it as soon as it's ready."""
+    while True:
+        piece = await asyncio.to_thread(next, pieces, None)
+        if piece is None:
+            return
+        if piece:
+            yield piece
+
+def _main() -> None:
+    import argparse
+    import sys
+    from pathlib import Path
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).resolve().parent.parent.parent / ".env")
+    from app.dependencies import get_operating_hours_db, get_restaurant_db
+    from app.structured_logging import configure_logging
+
+    parser = argparse.ArgumentParser(description="Export stored restaurants with their operating hours")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--since", type=parse_timestamp,
+                        help="only restaurants (or hours) updated after this ISO timestamp")
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+    configure_logging()
+    try:
+        encoder = export_encoder(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    watermark = export_watermark(datetime.now(timezone.utc))
+    db, oh_db = get_restaurant_db(), get_operating_hours_db()
+    pieces = encode_export(iter_export_rows(db, oh_db, args.since, args.chunk_size), encoder)
+    with contextlib.ExitStack() as stack:
+        output = stack.enter_context(open(args.output, "wb")) if args.output else sys.stdout.buffer
+        for piece in pieces:
+            output.write(piece)
+    print(f"Next incremental export: --since {watermark.isoformat()}", file=sys.stderr)
+
+if __name__ == "__main__":
+    _main()
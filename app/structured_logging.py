@@ -0,0 +1,146 @@
+"""Non-blocking structured logging.
+
+Callers only create a LogRecord and put it on a queue; message formatting, JSON encoding
+and stream I/O all happen on a background listener thread, so logging never does I/O on
+the request's event-loop turn. Records keep their `%`-style args until the writer formats
+them, so use `logger.info("Found %s rows", n)` rather than f-strings on hot paths.
+
+Configuration (environment):
+    LOG_LEVEL         root level (default INFO)
+    LOG_FORMAT        "json" (default) or "text"
+    LOG_LEVELS        per-logger levels, e.g. "app.clients.supabase=WARNING,httpx=WARNING"
+    LOG_SAMPLE_RATES  per-logger sampling of sub-WARNING records, e.g. "app.db.restaurants=0.1"
+    LOG_QUEUE_SIZE    max queued records before new ones are dropped (default 10000)
+"""
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of sub-WARNING records per logger (longest matching prefix wins)."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, prefix_rate in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = prefix_rate, len(prefix)
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread untouched and never blocks when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process: no need to pre-format for pickling, so formatting stays on the writer
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+def _parse_mapping(value: Optional[str]) -> Dict[str, str]:
+    mapping = {}
+    for item in (value or "").split(","):
+        name, sep, setting = item.partition("=")
+        if sep and name.strip():
+            mapping[name.strip()] = setting.strip()
+    return mapping
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    levels: Optional[Dict[str, str]] = None,
+    sample_rates: Optional[Dict[str, float]] = None,
+) -> None:
+    """Route all logging through the background writer. Safe to call more than once."""
+    global _listener, _queue_handler
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_format = log_format or os.getenv("LOG_FORMAT", "json")
+    levels = levels if levels is not None else _parse_mapping(os.getenv("LOG_LEVELS"))
+    if sample_rates is None:
+        sample_rates = {k: float(v) for k, v in _parse_mapping(os.getenv("LOG_SAMPLE_RATES")).items()}
+
+    shutdown_logging()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(
+        StructuredFormatter() if log_format == "json"
+        else logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+    )
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    if sample_rates:
+        _queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level.upper())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
+
+atexit.register(shutdown_logging)
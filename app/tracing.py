@@ -0,0 +1,240 @@
+"""Lightweight request tracing.
+
+A root span is opened per HTTP request (see `log_requests` in app.main) and the current
+span travels in a ContextVar, so it follows awaits and `asyncio.to_thread` calls into the
+DB layer and outbound clients. Child spans are only created under a sampled root, so
+unsampled requests pay one ContextVar lookup per instrumented call.
+
+Configuration (environment):
+    TRACE_SAMPLE_RATE   fraction of requests traced (default 0.1); an incoming
+                        `traceparent` header with the sampled flag always traces
+    TRACE_BUFFER_SIZE   finished traces kept in memory for /api/admin/traces (default 500)
+    TRACE_EXPORT_FILE   optional path; finished traces are appended as JSON lines
+"""
+from __future__ import annotations
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+class Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start", "end", "status")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        self.end = time.time()
+        self.trace.spans.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+# ---------------------------------------------------------------------------
+# Exporters
+
+class RingBufferExporter:
+    """Keeps the most recent finished traces in memory for the admin endpoint."""
+
+    def __init__(self, size: int):
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=size)
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        self._traces.append(trace)
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        for trace in reversed(self._traces):
+            if trace["trace_id"] == trace_id:
+                return trace
+        return None
+
+    def query(self, min_duration_ms: float = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """Slowest traces first."""
+        matches = [t for t in list(self._traces) if t["duration_ms"] >= min_duration_ms]
+        matches.sort(key=lambda t: t["duration_ms"], reverse=True)
+        return matches[:limit]
+
+class JSONFileExporter:
+    """Appends finished traces as JSON lines from a background thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize=10_000)
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                trace = self._queue.get()
+                f.write(json.dumps(trace, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+trace_buffer = RingBufferExporter(int(os.getenv("TRACE_BUFFER_SIZE", "500")))
+_exporters: List[Any] = [trace_buffer]
+if os.getenv("TRACE_EXPORT_FILE"):
+    _exporters.append(JSONFileExporter(os.environ["TRACE_EXPORT_FILE"]))
+
+def _export(root: Span) -> None:
+    spans = sorted(root.trace.spans, key=lambda s: s.start)
+    trace = {
+        "trace_id": root.trace.trace_id,
+        "name": root.name,
+        "start": root.start,
+        "duration_ms": round(root.duration_ms, 3),
+        "status": root.status,
+        "spans": [span.to_dict() for span in spans],
+    }
+    for exporter in _exporters:
+        exporter.export(trace)
+
+# ---------------------------------------------------------------------------
+# API
+
+_TRACEPARENT_RE = re.compile(
+    r"^(?P<version>[0-9a-f]{2})-(?P<trace_id>[0-9a-f]{32})-(?P<parent_id>[0-9a-f]{16})-(?P<flags>[0-9a-f]{2})(?P<rest>-.*)?$"
+)
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """Parse a W3C traceparent header into (trace_id, parent_span_id, sampled).
+
+    Client input: anything malformed (wrong length, not lowercase hex, all-zero ids,
+    version ff, or extra fields on version 00) gives None instead of raising.
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip())
+    if not match:
+        return None
+    version, trace_id, parent_id = match.group("version"), match.group("trace_id"), match.group("parent_id")
+    if version == "ff" or (version == "00" and match.group("rest")):
+        return None
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(match.group("flags"), 16) & 1)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace.trace_id if span else None
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Open a root span if this request is sampled; yields None otherwise."""
+    parent = parse_traceparent(traceparent)
+    sampled = parent[2] if parent else random.random() < SAMPLE_RATE
+    if not sampled:
+        yield None
+        return
+    root = Span(Trace(parent[0] if parent else secrets.token_hex(16)), name,
+                parent[1] if parent else None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.finish(e)
+        _export(root)
+        raise
+    else:
+        root.finish()
+        _export(root)
+    finally:
+        _current_span.reset(token)
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Open a child of the current span; a no-op outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    span = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.finish(e)
+        raise
+    else:
+        span.finish()
+    finally:
+        _current_span.reset(token)
+
+def open_span(name: str, **attributes: Any) -> Optional[Span]:
+    """Start a child span without making it current, for callback-style instrumentation.
+
+    The caller must call `finish()` on it.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping a sync or async function in a child span."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -5,6 +5,10 @@ import { useMemo } from 'react';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL;  // Use environment variable
 
+// Hours checks run as background phone calls; poll their job until it finishes
+const CHECK_HOURS_POLL_MS = 3000;
+const CHECK_HOURS_TIMEOUT_MS = 15 * 60 * 1000;
+
 // Convert frontend price format to backend format
 function convertPriceFilter(price: string | null): string | undefined {
   if (!price) return undefined;
@@ -136,8 +140,27 @@ export function useRestaurantService() {
       return apiClient.get('/vapi/call-analysis/' + callId, true);
     },
 
+    async getCallJob(jobId: number): Promise<any> {
+      return apiClient.get('/vapi/jobs/' + jobId, true);
+    },
+
+    // Queues the call, then polls the job until it has succeeded or failed. Calls are placed
+    // in the restaurant's local calling hours, so a job scheduled past the timeout is
+    // returned still pending (run_after says when it will be called).
     async checkHours(restaurantId: string): Promise<any> {
-      return apiClient.get('/vapi/check-hours/' + restaurantId, true);
+      let job: any = await apiClient.get('/vapi/check-hours/' + restaurantId, true);
+      const deadline = Date.now() + CHECK_HOURS_TIMEOUT_MS;
+      while (job.status === 'pending' || job.status === 'running') {
+        if (job.status === 'pending' && job.run_after && Date.parse(job.run_after) > deadline) {
+          return job;
+        }
+        if (Date.now() > deadline) {
+          throw new Error('Timed out waiting for the hours check');
+        }
+        await new Promise((resolve) => setTimeout(resolve, CHECK_HOURS_POLL_MS));
+        job = await apiClient.get('/vapi/jobs/' + job.job_id, true);
+      }
+      return job;
     }
   };
 }
@@ -40,6 +40,24 @@ export interface OperatingHours {
   is_hours_verified: boolean;
   is_consenting: boolean;
   is_open: boolean;
+  schedule?: StructuredHours | null;
+}
+
+export interface HoursInterval {
+  time_open: string;
+  time_closed: string;
+}
+
+export interface HoursOverride {
+  date: string;
+  name?: string | null;
+  is_closed: boolean;
+  intervals: HoursInterval[];
+}
+
+export interface StructuredHours {
+  weekly: Record<string, HoursInterval[]>;
+  overrides: HoursOverride[];
 }
 
 export type PriceFilter = '1' | '2' | '3' | '4' | undefined;
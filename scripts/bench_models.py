@@ -0,0 +1,242 @@
+"""Microbenchmarks for the per-row model work done on every request, on synthetic
+datasets of 100, 1k and 10k rows.
+
+Benchmarks are written pytest-benchmark style: each `bench_*` function receives a
+`benchmark` fixture plus the dataset and hands it the code under test. Results can be
+saved and compared against a baseline to catch regressions:
+
+    python scripts/bench_models.py                        # all benchmarks, all sizes
+    python scripts/bench_models.py -k phone --sizes 1000
+    python scripts/bench_models.py --save .benchmarks/baseline.json
+    python scripts/bench_models.py --compare .benchmarks/baseline.json --max-regression 0.15
+"""
+import argparse
+import gc
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.clients.vapi import VAPIClient  # noqa: E402
+from app.clients.yelp import YelpClient  # noqa: E402
+from app.db.restaurants import RestaurantDB  # noqa: E402
+from app.models import (  # noqa: E402
+    Restaurant,
+    RestaurantWithHours,
+    decode_restaurant_rows_with_hours,
+)
+from scripts.bench_row_decoding import make_rows  # noqa: E402
+
+SIZES = (100, 1_000, 10_000)
+
+
+# --- Datasets ------------------------------------------------------------------
+
+class Dataset:
+    """Synthetic inputs for one size, built once and shared by every benchmark."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.rows, self.hours_map = make_rows(n)
+        self.restaurants = [Restaurant(**row) for row in self.rows]
+        self.yelp_businesses = [self._yelp_business(row) for row in self.rows]
+        self.phone_numbers = [self._phone(i) for i in range(n)]
+
+    @staticmethod
+    def _yelp_business(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": row["business_id"], "alias": row["business_id"], "name": row["name"],
+            "image_url": row["photos"][0], "is_closed": False, "review_count": 120,
+            "categories": row["categories"], "rating": row["rating"], "price": row["price"],
+            "coordinates": row["coordinates"], "location": row["location"],
+            "phone": row["phone"], "display_phone": row["phone"], "distance": 812.4,
+        }
+
+    @staticmethod
+    def _phone(i: int) -> str:
+        # The shapes that reach the formatter: Yelp E.164, local formatting, bare digits
+        digits = f"415555{i % 10000:04d}"
+        return (
+            f"+1{digits}",
+            f"({digits[:3]}) {digits[3:6]}-{digits[6:]}",
+            digits,
+            f"1-{digits[:3]}-{digits[3:6]}-{digits[6:]}",
+        )[i % 4]
+
+
+class StubSupabase:
+    """Serves fresh copies of the dataset rows, since get_stored_restaurants rewrites them in place."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def get_restaurants(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.rows]
+
+
+# --- Benchmarks ----------------------------------------------------------------
+
+def bench_restaurant_from_row(benchmark, data: Dataset):
+    """`Restaurant(**row)` for every stored row."""
+    benchmark(lambda: [Restaurant(**row) for row in data.rows])
+
+
+def bench_restaurant_with_hours_rebuild(benchmark, data: Dataset):
+    """The dump-and-revalidate path: `RestaurantWithHours(**r.model_dump(), operating_hours=...)`."""
+    benchmark(lambda: [
+        RestaurantWithHours(**r.model_dump(), operating_hours=data.hours_map.get(r.business_id))
+        for r in data.restaurants
+    ])
+
+
+def bench_decode_rows_with_hours(benchmark, data: Dataset):
+    """The batch path the list endpoint uses: rows + hours decoded in one pass."""
+    benchmark(lambda: decode_restaurant_rows_with_hours(
+        [dict(row) for row in data.rows], data.hours_map
+    ))
+
+
+def bench_yelp_business_mapping(benchmark, data: Dataset):
+    """Yelp search response business -> Restaurant, as in YelpClient.search_businesses."""
+    benchmark(lambda: [YelpClient._parse_business(b) for b in data.yelp_businesses])
+
+
+def bench_stored_restaurants(benchmark, data: Dataset):
+    """RestaurantDB.get_stored_restaurants: location reformatting plus model construction."""
+    db = RestaurantDB.__new__(RestaurantDB)
+    db.supabase = StubSupabase(data.rows)
+    benchmark(db.get_stored_restaurants)
+
+
+def bench_format_phone_number(benchmark, data: Dataset):
+    """VAPIClient._format_phone_number over a mix of input formats."""
+    client = VAPIClient.__new__(VAPIClient)
+    benchmark(lambda: [client._format_phone_number(p) for p in data.phone_numbers])
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    name[len("bench_"):]: fn for name, fn in sorted(globals().items()) if name.startswith("bench_")
+}
+
+
+# --- Runner --------------------------------------------------------------------
+
+class BenchmarkFixture:
+    """A small stand-in for pytest-benchmark's fixture: warm up, run rounds, keep timings."""
+
+    def __init__(self, min_rounds: int, max_time: float, warmup: int = 1):
+        self.min_rounds = min_rounds
+        self.max_time = max_time
+        self.warmup = warmup
+        self.timings: List[float] = []
+
+    def __call__(self, fn: Callable, *args, **kwargs) -> Any:
+        for _ in range(self.warmup):
+            result = fn(*args, **kwargs)
+        gc.collect()
+        deadline = time.perf_counter() + self.max_time
+        while len(self.timings) < self.min_rounds or time.perf_counter() < deadline:
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            self.timings.append(time.perf_counter() - start)
+        return result
+
+    def stats(self, rows: int) -> Dict[str, float]:
+        timings = self.timings
+        median = statistics.median(timings)
+        return {
+            "rounds": len(timings),
+            "min": min(timings),
+            "max": max(timings),
+            "mean": statistics.fmean(timings),
+            "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "median": median,
+            "rows_per_second": rows / median if median else math.inf,
+        }
+
+
+def run(names: List[str], sizes: List[int], min_rounds: int, max_time: float) -> Dict[str, Dict]:
+    results = {}
+    for n in sizes:
+        data = Dataset(n)
+        for name in names:
+            fixture = BenchmarkFixture(min_rounds=min_rounds, max_time=max_time)
+            BENCHMARKS[name](fixture, data)
+            results[f"{name}[{n}]"] = {"benchmark": name, "rows": n, **fixture.stats(n)}
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], max_regression: float) -> List[str]:
+    """Names of benchmarks whose median got slower than the baseline by more than max_regression."""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        change = result["median"] / before["median"] - 1
+        result["change_vs_baseline"] = change
+        if change > max_regression:
+            regressions.append(key)
+    return regressions
+
+
+def print_table(results: Dict[str, Dict]) -> None:
+    header = (f"{'benchmark':<42} {'min ms':>9} {'median ms':>10} {'mean ms':>9} "
+              f"{'stddev':>8} {'rounds':>7} {'rows/s':>12} {'vs base':>8}")
+    print(header)
+    print("-" * len(header))
+    for key, r in results.items():
+        change = r.get("change_vs_baseline")
+        print(f"{key:<42} {r['min'] * 1e3:>9.3f} {r['median'] * 1e3:>10.3f} {r['mean'] * 1e3:>9.3f} "
+              f"{r['stddev'] * 1e3:>8.3f} {r['rounds']:>7} {r['rows_per_second']:>12,.0f} "
+              f"{'' if change is None else f'{change:+.1%}':>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--max-time", type=float, default=0.5, help="Seconds to spend per benchmark and size")
+    parser.add_argument("--save", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Compare medians against results saved with --save")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="Fail if a median is this much slower than the baseline (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if not args.keyword or args.keyword in name]
+    if not names:
+        parser.error(f"no benchmarks match {args.keyword!r}; available: {', '.join(BENCHMARKS)}")
+
+    results = run(names, args.sizes, args.min_rounds, args.max_time)
+    regressions = []
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["benchmarks"]
+        regressions = compare(results, baseline, args.max_regression)
+    print_table(results)
+
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "saved_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "benchmarks": results,
+        }, indent=2))
+        print(f"\nSaved {path}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.max_regression:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Rows/second for decoding `restaurants` rows into response models, before and after
+the batch TypeAdapter path.
+
+    python scripts/bench_row_decoding.py [--sizes 1000 10000] [--repeat 5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.models import (  # noqa: E402
+    Restaurant,
+    RestaurantWithHours,
+    decode_restaurant_rows_with_hours,
+)
+
+def make_rows(n: int):
+    rows, hours_map = [], {}
+    for i in range(n):
+        business_id = f"biz-{i}"
+        rows.append({
+            "business_id": business_id,
+            "name": f"Restaurant {i}",
+            "rating": 3.5 + (i % 3) * 0.5,
+            "price": "$" * (1 + i % 4),
+            "phone": f"+1415555{i % 10000:04d}",
+            "location": {
+                "address1": f"{i} Market St", "address2": None, "address3": None,
+                "city": "San Francisco", "state": "CA", "zip_code": "94103",
+                "country": "US", "display_address": [f"{i} Market St", "San Francisco, CA 94103"],
+            },
+            "coordinates": {"latitude": 37.77 + i * 1e-5, "longitude": -122.41 - i * 1e-5},
+            "photos": [f"https://example.com/{i}.jpg"],
+            "business_type": "restaurants",
+            "categories": [{"alias": "sushi", "title": "Sushi Bars"}],
+            "is_closed": False,
+            "is_open": True,
+            "created_at": "2026-10-01T00:00:00+00:00",
+        })
+        if i % 2 == 0:
+            hours_map[business_id] = {
+                "id": i, "restaurant_id": business_id, "time_open": "10:00 AM",
+                "time_closed": "9:00 PM", "is_hours_verified": True,
+                "is_consenting": True, "is_open": True,
+            }
+    return rows, hours_map
+
+def before(rows, hours_map):
+    restaurants = [Restaurant(**r) for r in rows]
+    return [
+        RestaurantWithHours(**r.model_dump(), operating_hours=hours_map.get(r.business_id))
+        for r in restaurants
+    ]
+
+def after(rows, hours_map):
+    return decode_restaurant_rows_with_hours(rows, hours_map)
+
+def rows_per_second(fn, rows, hours_map, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        batch = [dict(r) for r in rows]  # fresh rows per run, as if just read from the DB
+        start = time.perf_counter()
+        fn(batch, hours_map)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'before rows/s':>15} {'after rows/s':>15} {'speedup':>8}")
+    for n in args.sizes:
+        rows, hours_map = make_rows(n)
+        # Both paths must produce the same response payload
+        assert [r.model_dump() for r in before([dict(r) for r in rows], hours_map)] == \
+            [r.model_dump() for r in after([dict(r) for r in rows], hours_map)]
+        old = rows_per_second(before, rows, hours_map, args.repeat)
+        new = rows_per_second(after, rows, hours_map, args.repeat)
+        print(f"{n:>8} {old:>15,.0f} {new:>15,.0f} {new / old:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
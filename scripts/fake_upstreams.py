@@ -0,0 +1,814 @@
+"""In-process fakes for every upstream the API talks to: Supabase (PostgREST), Yelp,
+Google Custom Search, Clerk and VAPI, served from one local HTTP server.
+
+Each upstream gets a latency distribution (log-normal around a median) and an error
+rate, so the app can be exercised against slow or flaky dependencies without any
+real credentials:
+
+    with FakeUpstreams(profiles={"yelp": UpstreamProfile(latency_ms=300, error_rate=0.05)}) as fakes:
+        os.environ.update(fakes.env())
+        ...  # import and run app.main
+
+Used by scripts/loadtest.py.
+"""
+import asyncio
+import base64
+import csv
+import itertools
+import json
+import operator
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+UPSTREAMS = ("supabase", "yelp", "google", "clerk", "vapi")
+
+CUISINES = ["Sushi", "Taco", "Pizza", "Ramen", "Burger", "Curry", "Pho", "Dim Sum", "Bagel", "Falafel"]
+CITIES = [("San Francisco", "CA"), ("Oakland", "CA"), ("Seattle", "WA"), ("Austin", "TX"), ("Boston", "MA")]
+
+# A realistic-ish starting point; override per run with --latency / --error-rate
+DEFAULT_PROFILES = {
+    "supabase": {"latency_ms": 15},
+    "yelp": {"latency_ms": 180},
+    "google": {"latency_ms": 220},
+    "clerk": {"latency_ms": 40},
+    "vapi": {"latency_ms": 90},
+}
+
+
+@dataclass
+class UpstreamProfile:
+    """How a fake upstream behaves: median latency, spread, and how often it fails."""
+    latency_ms: float = 0.0
+    jitter: float = 0.35  # sigma of the log-normal around the median
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    def sample_delay(self, rng: random.Random) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms * rng.lognormvariate(0.0, self.jitter) / 1000.0
+
+
+def default_profiles() -> Dict[str, UpstreamProfile]:
+    return {name: UpstreamProfile(**spec) for name, spec in DEFAULT_PROFILES.items()}
+
+
+def make_token(user_id: str, session_id: str) -> str:
+    """An unsigned Clerk-shaped JWT; the app only reads `sub` and `sid` and asks Clerk about them."""
+    def b64(obj: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    return f"{b64({'alg': 'none', 'typ': 'JWT'})}.{b64({'sub': user_id, 'sid': session_id})}.fake"
+
+
+def make_restaurant(business_id: str, name: str, city: str, state: str, i: int,
+                    with_photos: bool = True) -> Dict[str, Any]:
+    return {
+        "business_id": business_id,
+        "name": name,
+        "rating": 3.0 + (i % 5) * 0.5,
+        "price": "$" * (1 + i % 4),
+        "phone": f"+1415555{i % 10000:04d}",
+        "location": {
+            "address1": f"{i} Main St", "address2": None, "address3": None,
+            "city": city, "state": state, "zip_code": f"{10000 + i % 89999:05d}",
+            "country": "US", "display_address": [f"{i} Main St", f"{city}, {state}"],
+        },
+        "coordinates": {"latitude": 37.0 + (i % 1000) * 1e-3, "longitude": -122.0 - (i % 1000) * 1e-3},
+        "photos": [f"https://images.example.com/{business_id}.jpg"] if with_photos else [],
+        "business_type": "restaurants",
+        "categories": [{"alias": name.split()[0].lower(), "title": name.split()[0]}],
+        "is_closed": False,
+        "is_open": True,
+        "is_hours_verified": False,
+        "created_at": "2026-10-01T00:00:00+00:00",
+        "updated_at": "2026-10-01T00:00:00+00:00",
+    }
+
+
+def _normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """The generated restaurants.phone_e164 column (public.normalize_phone)."""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 10:
+        return f"+1{digits}"
+    return f"+{digits}" if len(digits) == 11 else None
+
+
+# --- PostgREST -----------------------------------------------------------------
+
+class PostgrestError(Exception):
+    pass
+
+
+def _column_value(row: Dict[str, Any], column: str) -> Any:
+    """Resolve `col`, `col->key` and `col->>key` paths against a row."""
+    parts = re.split(r"->>?", column)
+    value: Any = row.get(parts[0])
+    for key in parts[1:]:
+        value = value.get(key) if isinstance(value, dict) else None
+    if "->>" in column and value is not None and not isinstance(value, str):
+        value = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+    return value
+
+
+def _parse_in_list(raw: str) -> List[str]:
+    if not (raw.startswith("(") and raw.endswith(")")):
+        raise PostgrestError(f"malformed in() list: {raw}")
+    return next(csv.reader([raw[1:-1]], quotechar='"'), [])
+
+
+def _ilike_regex(pattern: str) -> "re.Pattern[str]":
+    escaped = re.escape(pattern).replace("%", ".*").replace(r"\*", ".*").replace("_", ".")
+    return re.compile(f"^{escaped}$", re.IGNORECASE | re.DOTALL)
+
+
+def _unquote(arg: str) -> str:
+    if len(arg) >= 2 and arg.startswith('"') and arg.endswith('"'):
+        return re.sub(r"\\(.)", r"\1", arg[1:-1])
+    return arg
+
+
+def _split_conditions(raw: str) -> List[str]:
+    """Top-level conditions of an `or=(...)` list; commas inside quotes or parentheses stay."""
+    if not (raw.startswith("(") and raw.endswith(")")):
+        raise PostgrestError(f"malformed or() list: {raw}")
+    conditions, current, depth, quoted, escaped = [], "", 0, False, False
+    for char in raw[1:-1]:
+        if escaped:
+            escaped = False
+        elif char == "\\" and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif not quoted and depth == 0 and char == ",":
+            conditions.append(current)
+            current = ""
+            continue
+        current += char
+    return conditions + [current] if current else conditions
+
+
+def _contains(value: Any, wanted: Any) -> bool:
+    """jsonb @> for the shapes the app asks about."""
+    if isinstance(wanted, list):
+        return isinstance(value, list) and all(any(_contains(v, w) for v in value) for w in wanted)
+    if isinstance(wanted, dict):
+        return isinstance(value, dict) and all(k in value and _contains(value[k], w) for k, w in wanted.items())
+    return value == wanted
+
+
+def _compile_condition(expr: str) -> Tuple[Callable[[Any], bool], bool]:
+    negate = expr.startswith("not.")
+    op, _, arg = (expr[4:] if negate else expr).partition(".")
+    return _compile_filter(op, arg), negate
+
+
+def _compile_or(raw: str) -> Callable[[Dict[str, Any]], bool]:
+    tests = []
+    for condition in _split_conditions(raw):
+        column, _, expr = condition.partition(".")
+        tests.append((column, *_compile_condition(expr)))
+    return lambda row: any(test(_column_value(row, c)) != neg for c, test, neg in tests)
+
+
+def _compile_filter(op: str, arg: str) -> Callable[[Any], bool]:
+    """Turn a PostgREST `op.arg` filter into a predicate over a column value."""
+    if op == "cs":
+        wanted = json.loads(_unquote(arg))
+        return lambda v: v is not None and _contains(v, wanted)
+    if op != "in":
+        arg = _unquote(arg)
+    if op == "is":
+        return (lambda v: v is None) if arg == "null" else (lambda v: str(v).lower() == arg)
+    if op == "in":
+        members = set(_parse_in_list(arg))
+        return lambda v: v is not None and str(v) in members
+    if op in ("like", "ilike"):
+        regex = _ilike_regex(arg)
+        return lambda v: v is not None and bool(regex.match(str(v)))
+    compare = COMPARISONS.get(op)
+    if compare is None:
+        raise PostgrestError(f"unsupported operator: {op}")
+
+    def predicate(value: Any) -> bool:
+        if value is None:
+            return False
+        if isinstance(value, bool):
+            return compare(str(value).lower(), arg)
+        if isinstance(value, (int, float)):
+            try:
+                return compare(value, type(value)(arg))
+            except ValueError:
+                return False
+        return compare(str(value), arg)
+    return predicate
+
+
+COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": operator.eq, "neq": operator.ne,
+    "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le,
+}
+
+
+class FakeStore:
+    """Just enough of PostgREST for the queries the app issues."""
+
+    PRIMARY_KEYS = {
+        "restaurants": "business_id", "operating_hours": "id", "user_table": "user_id", "call_jobs": "id",
+        "phone_calls": "phone",
+    }
+    # Column defaults the real schema fills in (see supabase/migrations)
+    DEFAULTS = {
+        "call_jobs": {"kind": "check_hours", "status": "pending", "attempts": 0, "max_attempts": 3,
+                      "lease_owner": None, "lease_expires_at": None, "call_id": None,
+                      "result": None, "last_error": None, "phone": None, "timezone": None,
+                      "priority": 0.0, "boost": 0.0, "scheduled_at": None, "window_ends_at": None},
+    }
+    RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {name: [] for name in self.PRIMARY_KEYS}
+        self._ids = itertools.count(1)
+
+    def _now(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _filter(self, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        rows = self.tables.setdefault(table, [])
+        filters, alternatives = [], []
+        for column, expr in params:
+            if column in self.RESERVED_PARAMS:
+                continue
+            if column == "or":
+                alternatives.append(_compile_or(expr))
+                continue
+            filters.append((column, *_compile_condition(expr)))
+        return [
+            row for row in rows
+            if all(test(_column_value(row, c)) != neg for c, test, neg in filters)
+            and all(matches(row) for matches in alternatives)
+        ]
+
+    def count(self, table: str, params: List[Tuple[str, str]]) -> int:
+        return len(self._filter(table, params))
+
+    def select(self, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        rows = self._filter(table, params)
+        query = dict(params)
+        for term in reversed(query.get("order", "").split(",") if query.get("order") else []):
+            column, _, direction = term.partition(".")
+            descending = direction.startswith("desc")
+            # Postgres puts nulls last ascending and first descending unless told otherwise
+            nulls_last = "nullslast" in direction or ("nullsfirst" not in direction and not descending)
+            present = sorted((r for r in rows if _column_value(r, column) is not None),
+                             key=lambda r: _column_value(r, column), reverse=descending)
+            missing = [r for r in rows if _column_value(r, column) is None]
+            rows = present + missing if nulls_last else missing + present
+        offset = int(query.get("offset", 0))
+        limit = query.get("limit")
+        return rows[offset: offset + int(limit)] if limit else rows[offset:]
+
+    def insert(self, table: str, payload: Any, upsert: bool) -> List[Dict[str, Any]]:
+        key = self.PRIMARY_KEYS.get(table, "id")
+        rows = self.tables.setdefault(table, [])
+        index = {row.get(key): row for row in rows}
+        written = []
+        for item in payload if isinstance(payload, list) else [payload]:
+            item = {k: (self._now() if v == "now()" else v) for k, v in item.items()}
+            item["updated_at"] = self._now()
+            existing = index.get(item.get(key)) if item.get(key) is not None else None
+            if existing is not None and upsert:
+                existing.update(item)
+                if table == "restaurants":
+                    existing["phone_e164"] = _normalize_phone(existing.get("phone"))
+                written.append(existing)
+                continue
+            if existing is not None:
+                raise PostgrestError(f"duplicate key value violates unique constraint on {key}")
+            if key == "id" and item.get("id") is None:
+                item["id"] = next(self._ids)
+            item = {**self.DEFAULTS.get(table, {}), **item}
+            item.setdefault("created_at", self._now())
+            if table == "restaurants":
+                item["phone_e164"] = _normalize_phone(item.get("phone"))
+            if table == "call_jobs":
+                item.setdefault("run_after", self._now())
+            rows.append(item)
+            index[item[key]] = item
+            written.append(item)
+        return written
+
+    def update(self, table: str, params: List[Tuple[str, str]], patch: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows = self._filter(table, params)
+        for row in rows:
+            row.update(patch)
+            row["updated_at"] = self._now()
+            if table == "restaurants":
+                row["phone_e164"] = _normalize_phone(row.get("phone"))
+        return rows
+
+    def delete(self, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        doomed = self._filter(table, params)
+        ids = {id(row) for row in doomed}
+        self.tables[table] = [row for row in self.tables[table] if id(row) not in ids]
+        return doomed
+
+    def rpc(self, name: str, args: Dict[str, Any]) -> Any:
+        handler = getattr(self, f"_rpc_{name}", None)
+        if handler is None:
+            raise PostgrestError(f"function {name} does not exist")
+        return handler(**args)
+
+    @staticmethod
+    def _parse_time(value: Optional[str]) -> Optional[datetime]:
+        return datetime.fromisoformat(value) if value else None
+
+    def _rpc_claim_call_jobs(self, p_worker: str, p_limit: int, p_lease_seconds: int) -> List[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        jobs = self.tables.setdefault("call_jobs", [])
+        for job in jobs:
+            expired = job["status"] == "running" and self._parse_time(job["lease_expires_at"]) < now
+            if expired and job["attempts"] >= job["max_attempts"]:
+                job.update(status="failed", lease_owner=None, lease_expires_at=None,
+                           last_error=job["last_error"] or "lease expired after final attempt")
+        def window_open(job: Dict[str, Any]) -> bool:
+            ends = self._parse_time(job["window_ends_at"])
+            return (job["scheduled_at"] is not None and self._parse_time(job["run_after"]) <= now
+                    and (ends is None or ends > now))
+
+        runnable = [
+            job for job in jobs
+            if (job["status"] == "pending" and window_open(job))
+            or (job["status"] == "running" and self._parse_time(job["lease_expires_at"]) < now)
+        ]
+        runnable.sort(key=lambda job: (-job["priority"], self._parse_time(job["run_after"])))
+        lease_expires_at = (now + timedelta(seconds=p_lease_seconds)).isoformat()
+        for job in runnable[:p_limit]:
+            job.update(status="running", attempts=job["attempts"] + 1, lease_owner=p_worker,
+                       lease_expires_at=lease_expires_at, updated_at=self._now())
+        return runnable[:p_limit]
+
+    def _rpc_acquire_phone_call(self, p_phone: str, p_worker: str, p_lease_seconds: int,
+                                p_cooldown_seconds: int) -> List[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        lease = (now + timedelta(seconds=p_lease_seconds)).isoformat()
+        calls = self.tables.setdefault("phone_calls", [])
+        row = next((c for c in calls if c["phone"] == p_phone), None)
+
+        def answer(outcome: str, result: Any = None, ended_at: Any = None) -> List[Dict[str, Any]]:
+            return [{"outcome": outcome, "call_id": row["call_id"], "idempotency_key": row["idempotency_key"],
+                     "result": result, "ended_at": ended_at}]
+
+        if row is None:
+            row = {"phone": p_phone, "status": "in_progress", "owner": p_worker, "lease_expires_at": lease,
+                   "idempotency_key": str(uuid.uuid4()), "call_id": None, "result": None,
+                   "started_at": now.isoformat(), "ended_at": None, "updated_at": now.isoformat()}
+            calls.append(row)
+            return answer("acquired")
+        if row["status"] == "ended" and \
+                self._parse_time(row["ended_at"]) > now - timedelta(seconds=p_cooldown_seconds):
+            return answer("recent", row["result"], row["ended_at"])
+        if row["status"] == "in_progress" and self._parse_time(row["lease_expires_at"]) > now \
+                and row["owner"] != p_worker:
+            return answer("busy")
+        if row["status"] == "ended":
+            row.update(idempotency_key=str(uuid.uuid4()), call_id=None, result=None,
+                       started_at=now.isoformat(), ended_at=None)
+        row.update(status="in_progress", owner=p_worker, lease_expires_at=lease, updated_at=now.isoformat())
+        return answer("acquired")
+
+    def _rpc_enqueue_unverified_restaurants(self, p_limit: int) -> int:
+        jobs = self.tables.setdefault("call_jobs", [])
+        day_ago = datetime.now(timezone.utc) - timedelta(days=1)
+        blocked = {
+            job["restaurant_id"] for job in jobs
+            if job["kind"] == "check_hours" and (
+                job["status"] in ("pending", "running")
+                or (job["status"] == "failed" and self._parse_time(job["updated_at"]) > day_ago)
+            )
+        }
+        candidates = sorted(
+            (r for r in self.tables["restaurants"]
+             if r.get("is_hours_verified") is False and r["business_id"] not in blocked),
+            key=lambda r: r.get("created_at") or "",
+        )[:p_limit]
+        for restaurant in candidates:
+            self.insert("call_jobs", {"restaurant_id": restaurant["business_id"]}, upsert=False)
+        return len(candidates)
+
+    def _rpc_record_call_attempt(self, p_phone: str, p_local_hour: int, p_answered: bool) -> None:
+        stats = self.tables.setdefault("call_slot_stats", [])
+        row = next((r for r in stats if r["phone"] == p_phone and r["local_hour"] == p_local_hour), None)
+        if row is None:
+            row = {"phone": p_phone, "local_hour": p_local_hour, "attempts": 0, "answered": 0}
+            stats.append(row)
+        row["attempts"] += 1
+        row["answered"] += int(bool(p_answered))
+        row["updated_at"] = self._now()
+
+    def _rpc_call_slot_totals(self) -> List[Dict[str, Any]]:
+        totals: Dict[int, Dict[str, Any]] = {}
+        for row in self.tables.setdefault("call_slot_stats", []):
+            hour = totals.setdefault(row["local_hour"], {"local_hour": row["local_hour"], "attempts": 0, "answered": 0})
+            hour["attempts"] += row["attempts"]
+            hour["answered"] += row["answered"]
+        return list(totals.values())
+
+    def _rpc_consume_search_credit(self, p_user_id: str) -> List[Dict[str, Any]]:
+        users = self._filter("user_table", [("user_id", f"eq.{p_user_id}")])
+        if not users:
+            return []
+        user = users[0]
+        permitted = bool(user.get("is_premium")) or user.get("search_credits", 0) > 0
+        if permitted and not user.get("is_premium"):
+            user["search_credits"] -= 1
+        return [{
+            "permitted": permitted,
+            "search_credits": user.get("search_credits", 0),
+            "is_premium": bool(user.get("is_premium")),
+        }]
+
+    def seed(self, restaurants: int, users: int, photo_ratio: float = 0.8,
+             hours_ratio: float = 0.5, premium_ratio: float = 1.0, shared_phone_ratio: float = 0.0) -> None:
+        """`shared_phone_ratio` of the restaurants reuse the previous one's number, like a chain."""
+        for i in range(restaurants):
+            city, state = CITIES[(i // len(CUISINES)) % len(CITIES)]
+            cuisine = CUISINES[i % len(CUISINES)]
+            business_id = f"seed-{i:06d}"
+            row = make_restaurant(
+                business_id, f"{cuisine} House {i}", city, state, i,
+                with_photos=(i % 100) < photo_ratio * 100,
+            )
+            if i and (i % 100) < shared_phone_ratio * 100:
+                row["phone"] = self.tables["restaurants"][-1]["phone"]
+            self.insert("restaurants", row, upsert=False)
+            if (i % 100) < hours_ratio * 100:
+                self.insert("operating_hours", {
+                    "restaurant_id": business_id, "time_open": "11:00 AM", "time_closed": "9:00 PM",
+                    "is_open": True, "is_hours_verified": True, "is_consenting": True,
+                }, upsert=False)
+        for i in range(users):
+            self.insert("user_table", {
+                "user_id": f"user_{i}", "id": i + 1, "search_credits": 3,
+                "is_premium": (i % 100) < premium_ratio * 100,
+            }, upsert=False)
+
+    @property
+    def restaurant_ids(self) -> List[str]:
+        return [row["business_id"] for row in self.tables["restaurants"]]
+
+
+# What every fake call "captures"
+FAKE_ANALYSIS = {
+    "successEvaluation": True,
+    "structuredData": {"time_open": "11:00 AM", "time_closed": "9:00 PM", "is_open": True},
+}
+
+# What a call sounds like, as (share of the call's length, role, line); the restaurant is "user"
+FAKE_TRANSCRIPT = [
+    (0.10, "assistant", "Hi, this is Hungry Monkey calling to check your hours today. What are your hours?"),
+    (0.20, "user", "We're open from 11 am to 9 pm today."),
+    (0.30, "assistant", "Great, 11 AM to 9 PM. Is it okay if we share these hours with our users?"),
+    (0.40, "user", "Sure, that's fine."),
+    (0.55, "assistant", "Wonderful. Do you have any special holiday hours coming up?"),
+    (0.70, "user", "Not that I know of, let me check with my manager real quick."),
+    (0.85, "user", "No, nothing special planned."),
+]
+# How long the assistant takes to say goodbye once told to wrap up, as a share of the call
+FAKE_WRAP_UP_SHARE = 0.05
+
+
+# --- The fake upstream server --------------------------------------------------
+
+@dataclass
+class FakeCall:
+    customer_number: str
+    created: float
+    duration: float
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)  # wall clock, for createdAt/updatedAt
+    server: Optional[Dict[str, Any]] = None  # where to send server messages, as VAPI does
+    server_messages: List[str] = field(default_factory=list)
+    control_url: Optional[str] = None  # Live Call Control, when monitorPlan.controlEnabled
+    ended_reason: str = "customer-ended-call"
+
+
+@dataclass
+class UpstreamStats:
+    requests: int = 0
+    injected_errors: int = 0
+
+
+def create_fake_app(store: FakeStore, profiles: Dict[str, UpstreamProfile],
+                    call_seconds: float = 0.5, seed: Optional[int] = None,
+                    webhook_loss: float = 0.0) -> FastAPI:
+    """One app serving every upstream under its own prefix (/supabase, /yelp, /google, /clerk, /vapi).
+
+    Calls created with a server URL in assistantOverrides get status-update and
+    end-of-call-report webhooks when they end, and FAKE_TRANSCRIPT as transcript messages
+    while they run if asked for; `webhook_loss` drops that share of them. Telling a call
+    to say something and hang up through its control URL ends it shortly after.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    calls: Dict[str, FakeCall] = {}
+    yelp_businesses: Dict[str, Dict[str, Any]] = {}
+    app.state.stats = {name: UpstreamStats() for name in UPSTREAMS}
+    app.state.store = store
+    app.state.calls = calls
+    app.state.webhooks = {"delivered": 0, "rejected": 0, "failed": 0, "dropped": 0}
+    webhook_tasks: Set[asyncio.Task] = set()
+
+    @app.middleware("http")
+    async def shape_traffic(request: Request, call_next):
+        upstream = request.url.path.strip("/").split("/", 1)[0]
+        profile = profiles.get(upstream)
+        stats = app.state.stats.get(upstream)
+        if stats is not None:
+            stats.requests += 1
+        if profile is not None:
+            delay = profile.sample_delay(rng)
+            if delay:
+                await asyncio.sleep(delay)
+            if profile.error_rate and rng.random() < profile.error_rate:
+                stats.injected_errors += 1
+                return JSONResponse({"message": f"injected {upstream} failure"},
+                                    status_code=profile.error_status)
+        return await call_next(request)
+
+    # Supabase / PostgREST
+    @app.api_route("/supabase/rest/v1/rpc/{name}", methods=["POST"])
+    async def postgrest_rpc(name: str, request: Request):
+        try:
+            return JSONResponse(store.rpc(name, await request.json()))
+        except PostgrestError as e:
+            return JSONResponse({"message": str(e)}, status_code=404)
+
+    @app.api_route("/supabase/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+    async def postgrest_table(table: str, request: Request):
+        params = list(request.query_params.multi_items())
+        try:
+            if request.method == "GET":
+                rows = store.select(table, params)
+                headers = {}
+                if "count=exact" in request.headers.get("prefer", ""):
+                    headers["Content-Range"] = f"0-{max(len(rows) - 1, 0)}/{store.count(table, params)}"
+                return JSONResponse(rows, headers=headers)
+            if request.method == "POST":
+                upsert = "merge-duplicates" in request.headers.get("prefer", "")
+                return JSONResponse(store.insert(table, await request.json(), upsert), status_code=201)
+            if request.method == "PATCH":
+                return JSONResponse(store.update(table, params, await request.json()))
+            return JSONResponse(store.delete(table, params))
+        except PostgrestError as e:
+            return JSONResponse({"message": str(e), "code": "PGRST"}, status_code=400)
+
+    # Yelp Fusion
+    @app.get("/yelp/businesses/search")
+    async def yelp_search(term: str = "food", location: str = "San Francisco", limit: int = 20):
+        slug = re.sub(r"\W+", "-", f"{term}-{location}".lower()).strip("-")
+        city = location.split(",")[0].strip() or "San Francisco"
+        businesses = []
+        for i in range(min(limit, 50)):
+            row = make_restaurant(f"yelp-{slug}-{i}", f"{term.title()} Spot {i}", city, "CA", i)
+            business = {
+                "id": row["business_id"], "name": row["name"], "rating": row["rating"],
+                "price": row["price"], "phone": row["phone"], "location": row["location"],
+                "coordinates": row["coordinates"], "photos": row["photos"],
+                "categories": row["categories"], "is_closed": False,
+            }
+            yelp_businesses[business["id"]] = business
+            businesses.append(business)
+        return {"businesses": businesses, "total": len(businesses)}
+
+    @app.get("/yelp/businesses/{business_id}")
+    async def yelp_business(business_id: str):
+        business = yelp_businesses.get(business_id)
+        if business is None:
+            return JSONResponse({"error": {"code": "BUSINESS_NOT_FOUND"}}, status_code=404)
+        return business
+
+    # Google Custom Search
+    @app.get("/google/customsearch/v1")
+    async def google_search(q: str, num: int = 1):
+        return {"items": [
+            {"link": f"https://images.example.com/search/{abs(hash(q)) % 10**8}-{i}.jpg"}
+            for i in range(num)
+        ]}
+
+    # Clerk backend API
+    @app.get("/clerk/users/{user_id}")
+    async def clerk_user(user_id: str):
+        return {
+            "id": user_id,
+            "email_addresses": [{"email_address": f"{user_id}@example.com"}],
+            "first_name": "Load", "last_name": user_id,
+        }
+
+    @app.get("/clerk/sessions/{session_id}")
+    async def clerk_session(session_id: str):
+        return {"id": session_id, "status": "active"}
+
+    # VAPI: calls "ring" for call_seconds and then end with a structured analysis
+    def call_view(call_id: str, call: FakeCall) -> Dict[str, Any]:
+        elapsed = time.monotonic() - call.created
+        if call.status != "ended":
+            call.status = "ended" if elapsed >= call.duration else "in-progress"
+        body: Dict[str, Any] = {"id": call_id, "status": call.status,
+                                "customer": {"number": call.customer_number},
+                                "createdAt": iso(call.created_at), "updatedAt": iso(call_updated_at(call))}
+        if call.status == "ended":
+            body["endedAt"] = body["updatedAt"]
+            body["endedReason"] = call.ended_reason
+            body["analysis"] = FAKE_ANALYSIS
+        return body
+
+    def iso(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+
+    def call_updated_at(call: FakeCall) -> float:
+        # In progress from creation, then ended after its duration
+        return call.created_at + (call.duration if call.status == "ended" else 0.0)
+
+    async def send_webhooks(call_id: str, call: FakeCall) -> None:
+        headers = {"X-Vapi-Secret": call.server["secret"]} if call.server.get("secret") else {}
+        call_ref: Dict[str, Any] = {"id": call_id, "customer": {"number": call.customer_number}}
+        if call.control_url:
+            call_ref["monitor"] = {"controlUrl": call.control_url}
+
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            async def post(message: Dict[str, Any]) -> None:
+                if rng.random() < webhook_loss:
+                    app.state.webhooks["dropped"] += 1
+                    return
+                try:
+                    response = await client.post(call.server["url"], json={"message": message}, headers=headers)
+                    app.state.webhooks["delivered" if response.status_code < 300 else "rejected"] += 1
+                except httpx.HTTPError:
+                    app.state.webhooks["failed"] += 1
+
+            if "transcript" in call.server_messages:
+                planned = call.duration
+                for share, role, line in FAKE_TRANSCRIPT:
+                    await asyncio.sleep(max(0.0, call.created + share * planned - time.monotonic()))
+                    if time.monotonic() >= call.created + call.duration:
+                        break  # wrapped up before this line
+                    await post({"type": "transcript", "role": role, "transcriptType": "final",
+                                "transcript": line, "call": call_ref})
+            # The end moves up if the call is wrapped up meanwhile
+            while (remaining := call.created + call.duration - time.monotonic()) > 0:
+                await asyncio.sleep(min(remaining, 0.05))
+            await post({"type": "status-update", "status": "ended", "call": call_ref})
+            await post({"type": "end-of-call-report", "endedReason": call.ended_reason,
+                        "call": call_ref, "analysis": FAKE_ANALYSIS})
+
+    @app.post("/vapi/call")
+    async def vapi_create_call(request: Request):
+        payload = await request.json()
+        call_id = str(uuid.uuid4())
+        overrides = payload.get("assistantOverrides") or {}
+        call = calls[call_id] = FakeCall(
+            customer_number=payload.get("customer", {}).get("number", ""),
+            created=time.monotonic(),
+            duration=call_seconds * rng.lognormvariate(0.0, 0.25),
+            server=overrides.get("server"),
+            server_messages=overrides.get("serverMessages") or [],
+        )
+        if (overrides.get("monitorPlan") or {}).get("controlEnabled"):
+            call.control_url = f"{str(request.base_url).rstrip('/')}/vapi/control/{call_id}"
+        if call.server and call.server.get("url"):
+            webhook_tasks.add(asyncio.create_task(send_webhooks(call_id, call)))
+            webhook_tasks.difference_update({t for t in webhook_tasks if t.done()})
+        return JSONResponse(call_view(call_id, calls[call_id]), status_code=201)
+
+    @app.get("/vapi/call")
+    async def vapi_list_calls(updatedAtGt: Optional[str] = None, updatedAtLe: Optional[str] = None,
+                              limit: int = 100):
+        def parse(value: str) -> float:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+        since = parse(updatedAtGt) if updatedAtGt else float("-inf")
+        until = parse(updatedAtLe) if updatedAtLe else float("inf")
+        views = [call_view(call_id, call) for call_id, call in calls.items()]  # settles each status first
+        views = [view for view in views if since < call_updated_at(calls[view["id"]]) <= until]
+        views.sort(key=lambda view: view["updatedAt"], reverse=True)
+        return views[:limit]
+
+    @app.get("/vapi/call/{call_id}")
+    async def vapi_get_call(call_id: str):
+        call = calls.get(call_id)
+        if call is None:
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        return call_view(call_id, call)
+
+    @app.post("/vapi/control/{call_id}")
+    async def vapi_control_call(call_id: str, request: Request):
+        call = calls.get(call_id)
+        if call is None or call_view(call_id, call)["status"] == "ended":
+            return JSONResponse({"message": "Call is not in progress"}, status_code=400)
+        payload = await request.json()
+        if payload.get("type") == "end-call" or payload.get("endCallAfterSpoken"):
+            elapsed = time.monotonic() - call.created
+            call.duration = min(call.duration, elapsed + FAKE_WRAP_UP_SHARE * call_seconds)
+            call.ended_reason = "assistant-ended-call"
+        return {"received": True}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """Run an ASGI app under uvicorn on a background thread."""
+
+    def __init__(self, app: Any, port: Optional[int] = None, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host=host, port=self.port, log_level="warning", access_log=False, lifespan="on",
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"server on {self.url} failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+@dataclass
+class FakeUpstreams:
+    """Start every fake upstream on a local port; `env()` points the app at it."""
+    profiles: Dict[str, UpstreamProfile] = field(default_factory=default_profiles)
+    store: FakeStore = field(default_factory=FakeStore)
+    call_seconds: float = 0.5
+    seed: Optional[int] = None
+    webhook_loss: float = 0.0
+
+    def __post_init__(self):
+        self.app = create_fake_app(self.store, self.profiles, self.call_seconds, self.seed, self.webhook_loss)
+        self._server = ServerThread(self.app)
+
+    @property
+    def url(self) -> str:
+        return self._server.url
+
+    def env(self) -> Dict[str, str]:
+        return {
+            "SUPABASE_URL": f"{self.url}/supabase",
+            "SUPABASE_KEY": make_token("service_role", "fake"),
+            "YELP_API_KEY": "fake", "YELP_API_BASE_URL": f"{self.url}/yelp",
+            "GOOGLE_API_KEY": "fake", "GOOGLE_SEARCH_ENGINE_ID": "fake",
+            "GOOGLE_SEARCH_BASE_URL": f"{self.url}/google/customsearch/v1",
+            "CLERK_SECRET_KEY": "fake", "CLERK_API_BASE_URL": f"{self.url}/clerk",
+            "VAPI_API_KEY": "fake", "VAPI_API_BASE_URL": f"{self.url}/vapi",
+            "VAPI_ASSISTANT_ID": "fake", "VAPI_PHONE_NUMBER_ID": "fake",
+        }
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: vars(s).copy() for name, s in self.app.state.stats.items()}
+
+    def webhook_stats(self) -> Dict[str, int]:
+        return dict(self.app.state.webhooks)
+
+    def call_stats(self) -> Dict[str, float]:
+        """Calls placed, how many the assistant ended early, and their average length in seconds."""
+        calls = list(self.app.state.calls.values())
+        ended_early = sum(1 for call in calls if call.ended_reason == "assistant-ended-call")
+        average = sum(call.duration for call in calls) / len(calls) if calls else 0.0
+        return {"calls": len(calls), "ended_early": ended_early, "avg_seconds": round(average, 3)}
+
+    def __enter__(self) -> "FakeUpstreams":
+        self._server.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.stop()
@@ -0,0 +1,344 @@
+"""Load test the API against local fakes of every upstream (see scripts/fake_upstreams.py).
+
+Starts the fake upstreams and the FastAPI app on local ports, then drives a weighted
+mix of requests from concurrent workers and reports throughput and p50/p95/p99 latency
+per scenario:
+
+    python scripts/loadtest.py --duration 30 --concurrency 32
+    python scripts/loadtest.py --mix list=1,search_hit=4,detail=4 --latency yelp=400 \\
+        --error-rate yelp=0.05 --output loadtest-results.json
+
+Scenarios:
+    list          GET /api/restaurants/?limit=N
+    search_hit    GET /api/restaurants/search for a term/city already in storage
+    search_miss   GET /api/restaurants/search for a new term (falls through to Yelp)
+    detail        GET /api/restaurants/{id}
+    check_hours   GET /api/vapi/check-hours/{id} (queues a job the dispatcher dials)
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.fake_upstreams import (  # noqa: E402
+    CITIES,
+    CUISINES,
+    FakeUpstreams,
+    ServerThread,
+    UPSTREAMS,
+    default_profiles,
+    free_port,
+    make_token,
+)
+
+DEFAULT_MIX = "list=20,search_hit=30,search_miss=10,detail=35,check_hours=5"
+PROJECT_ROOT = Path(__file__).parent.parent
+
+Request = Tuple[str, str]  # (method, path with query)
+
+
+def parse_pairs(specs: List[str], cast: Callable = float) -> Dict[str, float]:
+    """Parse `name=value` items, accepting both repeated flags and comma-separated lists."""
+    pairs = {}
+    for spec in specs:
+        for item in filter(None, spec.split(",")):
+            name, _, value = item.partition("=")
+            pairs[name.strip()] = cast(value)
+    return pairs
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Scenarios:
+    """Builds the request for each scenario from what the fake store was seeded with."""
+
+    def __init__(self, restaurant_ids: List[str], list_limit: int, rng: random.Random):
+        self.restaurant_ids = restaurant_ids
+        self.list_limit = list_limit
+        self.rng = rng
+
+    def list(self) -> Request:
+        return "GET", f"/api/restaurants/?limit={self.list_limit}"
+
+    def search_hit(self) -> Request:
+        city, _ = self.rng.choice(CITIES)
+        term = self.rng.choice(CUISINES)
+        return "GET", f"/api/restaurants/search?{httpx.QueryParams(term=term, location=city)}"
+
+    def search_miss(self) -> Request:
+        term = f"zz{uuid.uuid4().hex[:10]}"
+        return "GET", f"/api/restaurants/search?{httpx.QueryParams(term=term, location='Portland')}"
+
+    def detail(self) -> Request:
+        return "GET", f"/api/restaurants/{self.rng.choice(self.restaurant_ids)}"
+
+    def check_hours(self) -> Request:
+        return "GET", f"/api/vapi/check-hours/{self.rng.choice(self.restaurant_ids)}"
+
+
+class AppProcess:
+    """Run the API under uvicorn in its own process so it doesn't share a GIL with the
+    fakes and the load generator."""
+
+    def __init__(self, env: Dict[str, str], workers: int = 1, port: Optional[int] = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.command = [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+            "--port", str(self.port), "--workers", str(workers), "--log-level", "warning",
+            "--no-access-log",
+        ]
+        self.env = {**os.environ, **env}
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 60.0) -> "AppProcess":
+        self.process = subprocess.Popen(self.command, cwd=PROJECT_ROOT, env=self.env)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"app exited with status {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}/api/health", timeout=1.0).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"app did not become healthy on {self.url}")
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, scenario: str, status: str, seconds: float) -> None:
+        self.latencies[scenario].append(seconds)
+        self.statuses[scenario][status] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        results = {}
+        all_latencies: List[float] = []
+        for scenario in sorted(self.latencies):
+            latencies = sorted(self.latencies[scenario])
+            all_latencies.extend(latencies)
+            results[scenario] = self._stats(latencies, self.statuses[scenario], elapsed)
+        totals: Dict[str, int] = defaultdict(int)
+        for statuses in self.statuses.values():
+            for status, count in statuses.items():
+                totals[status] += count
+        results["all"] = self._stats(sorted(all_latencies), totals, elapsed)
+        return results
+
+    @staticmethod
+    def _stats(latencies: List[float], statuses: Dict[str, int], elapsed: float) -> Dict:
+        errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "statuses": dict(sorted(statuses.items())),
+        }
+
+
+async def worker(client: httpx.AsyncClient, scenarios: Scenarios, weights: Dict[str, float],
+                 tokens: List[str], rng: random.Random, deadline: float,
+                 warmup_until: float, recorder: Recorder) -> None:
+    names, shares = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(names, shares)[0]
+        method, path = getattr(scenarios, scenario)()
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers)
+            await response.aread()
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        if start >= warmup_until:
+            recorder.record(scenario, status, time.perf_counter() - start)
+
+
+async def drive(base_url: str, args: argparse.Namespace, scenarios: Scenarios,
+                weights: Dict[str, float], tokens: List[str]) -> Tuple[Recorder, float]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        started = time.perf_counter()
+        warmup_until = started + args.warmup
+        deadline = warmup_until + args.duration
+        await asyncio.gather(*(
+            worker(client, scenarios, weights, tokens, random.Random(args.seed + i),
+                   deadline, warmup_until, recorder)
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - warmup_until
+    return recorder, elapsed
+
+
+def print_report(results: Dict[str, Dict], upstream_stats: Dict[str, Dict[str, int]]) -> None:
+    header = f"{'scenario':<12} {'reqs':>7} {'rps':>8} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for scenario, r in results.items():
+        print(f"{scenario:<12} {r['requests']:>7} {r['throughput_rps']:>8.1f} "
+              f"{r['error_rate'] * 100:>5.1f}% {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+    print("\nupstream calls: " + ", ".join(
+        f"{name}={s['requests']} ({s['injected_errors']} injected errors)" for name, s in upstream_stats.items()
+    ))
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to measure for")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured traffic first")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client workers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--restaurants", type=int, default=2000, help="Restaurants seeded into the fake store")
+    parser.add_argument("--users", type=int, default=50, help="Users seeded into the fake store")
+    parser.add_argument("--list-limit", type=int, default=200, help="?limit= for the list scenario")
+    parser.add_argument("--latency", action="append", default=[], metavar="UPSTREAM=MS",
+                        help=f"Median latency per upstream ({', '.join(UPSTREAMS)})")
+    parser.add_argument("--jitter", action="append", default=[], metavar="UPSTREAM=SIGMA",
+                        help="Log-normal spread of the latency per upstream")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="UPSTREAM=RATE",
+                        help="Fraction of requests an upstream fails with a 503")
+    parser.add_argument("--call-seconds", type=float, default=0.5, help="How long fake VAPI calls last")
+    parser.add_argument("--call-completion", choices=("webhook", "poll"), default="webhook",
+                        help="Learn that calls ended from VAPI webhooks (polling as fallback) or by polling")
+    parser.add_argument("--webhook-loss", type=float, default=0.0,
+                        help="Fraction of webhook deliveries the fake VAPI drops")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client timeout per request")
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn worker processes for the app")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Serve the app from this process (handy under a profiler)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    weights = {k: v for k, v in parse_pairs([args.mix]).items() if v > 0}
+    unknown = set(weights) - {name for name in vars(Scenarios) if not name.startswith("_")}
+    if unknown:
+        parser.error(f"unknown scenarios in --mix: {', '.join(sorted(unknown))}")
+
+    profiles = default_profiles()
+    for option, attr in ((args.latency, "latency_ms"), (args.jitter, "jitter"), (args.error_rate, "error_rate")):
+        for name, value in parse_pairs(option).items():
+            if name not in profiles:
+                parser.error(f"unknown upstream: {name}")
+            setattr(profiles[name], attr, value)
+
+    fakes = FakeUpstreams(profiles=profiles, call_seconds=args.call_seconds, seed=args.seed,
+                          webhook_loss=args.webhook_loss)
+    fakes.store.seed(args.restaurants, args.users)
+
+    with fakes:
+        app_port = free_port()
+        app_env = {
+            "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+            "TRACE_SAMPLE_RATE": os.getenv("TRACE_SAMPLE_RATE", "0"),
+            "VAPI_POLL_INITIAL_DELAY": str(args.call_seconds / 2),
+            "VAPI_POLL_INTERVAL": str(args.call_seconds / 4),
+            "VAPI_EXPECTED_CALL_SECONDS": str(args.call_seconds),
+            "VAPI_MAX_POLL_INTERVAL": str(args.call_seconds),
+            # Dial queued check-hours jobs, but don't queue every unverified seeded restaurant
+            "DISPATCH_REFILL_BATCH": "0",
+            "DISPATCH_POLL_SECONDS": "1",
+            # Fake restaurants answer around the clock
+            "DISPATCH_CALL_WINDOWS": "00:00-24:00",
+            **fakes.env(),
+        }
+        if args.call_completion == "webhook":
+            app_env.update({
+                "VAPI_WEBHOOK_URL": f"http://127.0.0.1:{app_port}/api/vapi/webhook",
+                "VAPI_WEBHOOK_SECRET": "loadtest-webhook-secret",
+                "VAPI_FALLBACK_POLL_INTERVAL": str(args.call_seconds * 4),
+            })
+        if args.in_process:
+            os.environ.update(app_env)
+            # The app reads its configuration at import time, so import it only once the fakes are up
+            from app.main import app
+            server = ServerThread(app, port=app_port).start()
+        else:
+            server = AppProcess(app_env, workers=args.app_workers, port=app_port).start()
+        try:
+            tokens = [make_token(f"user_{i}", f"sess_{i}") for i in range(args.users)]
+            scenarios = Scenarios(fakes.store.restaurant_ids, args.list_limit, random.Random(args.seed))
+            print(f"Driving {server.url} for {args.duration:.0f}s (+{args.warmup:.0f}s warmup) "
+                  f"with {args.concurrency} workers, mix {weights}\n")
+            recorder, elapsed = asyncio.run(drive(server.url, args, scenarios, weights, tokens))
+            metrics_text = httpx.get(f"{server.url}/api/metrics").text
+        finally:
+            server.stop()
+        upstream_stats = fakes.stats()
+        webhook_stats = fakes.webhook_stats()
+        call_stats = fakes.call_stats()
+
+    results = recorder.summary(elapsed)
+    print_report(results, upstream_stats)
+    if args.call_completion == "webhook":
+        print("vapi webhooks: " + ", ".join(f"{k}={v}" for k, v in webhook_stats.items()))
+    if call_stats["calls"]:
+        print("vapi calls: " + ", ".join(f"{k}={v}" for k, v in call_stats.items()))
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {
+            "duration": args.duration, "warmup": args.warmup, "concurrency": args.concurrency,
+            "mix": weights, "restaurants": args.restaurants, "users": args.users,
+            "list_limit": args.list_limit, "call_seconds": args.call_seconds,
+            "call_completion": args.call_completion, "webhook_loss": args.webhook_loss,
+            "app_workers": 1 if args.in_process else args.app_workers, "in_process": args.in_process,
+            "profiles": {name: vars(p) for name, p in profiles.items()},
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "results": results,
+        "upstreams": upstream_stats,
+        "webhooks": webhook_stats,
+        "calls": call_stats,
+        "app_metrics": metrics_text,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
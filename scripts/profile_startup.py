@@ -0,0 +1,151 @@
+"""Import-time and startup profile for the API.
+
+Imports `app.main` in fresh interpreters (no credentials in the environment, which is
+how it should import) and reports wall time plus the slowest modules from
+`python -X importtime`. With --lifespan it also times the app lifespan, where the
+clients are built, against the local fakes from scripts/fake_upstreams.py.
+
+    python scripts/profile_startup.py [--repeat 5] [--top 25] [--lifespan] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Add project root to Python path
+sys.path.append(str(PROJECT_ROOT))
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Times `import app.main` and, when asked, entering the lifespan; prints JSON
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter() - start
+result = {"import_seconds": imported}
+if "--lifespan" in sys.argv:
+    async def run_lifespan():
+        start = time.perf_counter()
+        async with app.main.app.router.lifespan_context(app.main.app):
+            return time.perf_counter() - start
+    result["lifespan_seconds"] = asyncio.run(run_lifespan())
+print("PROBE " + json.dumps(result))
+"""
+
+
+def clean_env(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """The current environment minus anything the app reads, so secrets can't hide import-time work."""
+    keep = ("PATH", "HOME", "LANG", "LC_ALL", "PYTHONPATH", "VIRTUAL_ENV", "SYSTEMROOT", "TMPDIR")
+    env = {key: os.environ[key] for key in keep if key in os.environ}
+    env.update({"LOG_LEVEL": "WARNING", "PYTHONDONTWRITEBYTECODE": "1"})
+    env.update(extra or {})
+    return env
+
+
+def run_probe(env: Dict[str, str], lifespan: bool) -> Dict[str, float]:
+    args = [sys.executable, "-c", PROBE] + (["--lifespan"] if lifespan else [])
+    proc = subprocess.run(args, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("PROBE "):
+            return json.loads(line[len("PROBE "):])
+    raise RuntimeError(f"probe failed:\n{proc.stderr[-2000:]}")
+
+
+def importtime(env: Dict[str, str]) -> List[Dict]:
+    """Per-module self/cumulative import time in microseconds, from -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import failed:\n{proc.stderr[-2000:]}")
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return modules
+
+
+def top_level_packages(modules: List[Dict]) -> Dict[str, int]:
+    """Self time summed by top-level package (app, fastapi, pydantic, ...)."""
+    totals: Dict[str, int] = {}
+    for m in modules:
+        package = m["module"].split(".")[0]
+        totals[package] = totals.get(package, 0) + m["self_us"]
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to time the import in")
+    parser.add_argument("--top", type=int, default=20, help="Modules to list")
+    parser.add_argument("--lifespan", action="store_true", help="Also time the lifespan against local fakes")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    env = clean_env()
+    modules = importtime(env)
+    import_runs = [run_probe(env, lifespan=False)["import_seconds"] for _ in range(args.repeat)]
+
+    lifespan_runs: List[float] = []
+    if args.lifespan:
+        from scripts.fake_upstreams import FakeUpstreams
+        with FakeUpstreams() as fakes:
+            fake_env = clean_env(fakes.env())
+            lifespan_runs = [run_probe(fake_env, lifespan=True)["lifespan_seconds"] for _ in range(args.repeat)]
+
+    by_cumulative = sorted(modules, key=lambda m: m["cumulative_us"], reverse=True)[:args.top]
+    by_self = sorted(modules, key=lambda m: m["self_us"], reverse=True)[:args.top]
+    app_modules = sorted((m for m in modules if m["module"].split(".")[0] == "app"),
+                         key=lambda m: m["self_us"], reverse=True)
+    packages = top_level_packages(modules)
+
+    print(f"import app.main: median {statistics.median(import_runs) * 1000:.0f} ms "
+          f"(min {min(import_runs) * 1000:.0f}, max {max(import_runs) * 1000:.0f}, n={len(import_runs)})")
+    if lifespan_runs:
+        print(f"lifespan startup: median {statistics.median(lifespan_runs) * 1000:.0f} ms "
+              f"(min {min(lifespan_runs) * 1000:.0f}, max {max(lifespan_runs) * 1000:.0f})")
+    print(f"modules imported: {len(modules)}")
+
+    print(f"\nSlowest imports by cumulative time (top {args.top})")
+    for m in by_cumulative:
+        print(f"  {m['cumulative_us'] / 1000:>8.1f} ms  {m['module']}")
+    print(f"\nSlowest imports by self time (top {args.top})")
+    for m in by_self:
+        print(f"  {m['self_us'] / 1000:>8.1f} ms  {m['module']}")
+    print("\nSelf time by package")
+    for package, us in list(packages.items())[:args.top]:
+        print(f"  {us / 1000:>8.1f} ms  {package}")
+    print("\napp modules by self time")
+    for m in app_modules:
+        print(f"  {m['self_us'] / 1000:>8.1f} ms  {m['module']}")
+
+    report = {
+        "python": sys.version.split()[0],
+        "import_seconds": import_runs,
+        "lifespan_seconds": lifespan_runs,
+        "module_count": len(modules),
+        "packages_self_us": packages,
+        "modules": modules,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
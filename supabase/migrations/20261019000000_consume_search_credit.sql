@@ -0,0 +1,26 @@
+-- Atomically consume one search credit for a user in a single round trip.
+-- Premium users are always permitted and never decremented. The conditional
+-- update re-checks `search_credits > 0` under the row lock, so concurrent
+-- searches by the same user cannot double-spend a credit.
+-- Returns no rows when the user does not exist.
+create or replace function public.consume_search_credit(p_user_id text)
+returns table (permitted boolean, search_credits integer, is_premium boolean)
+language sql
+volatile
+as $$
+  with consumed as (
+    update public.user_table as t
+       set search_credits = t.search_credits - 1,
+           updated_at = now()
+     where t.user_id = p_user_id
+       and not t.is_premium
+       and t.search_credits > 0
+    returning t.search_credits
+  )
+  select
+    u.is_premium or exists (select 1 from consumed) as permitted,
+    coalesce((select c.search_credits from consumed as c), u.search_credits)::integer as search_credits,
+    u.is_premium
+  from public.user_table as u
+  where u.user_id = p_user_id;
+$$;
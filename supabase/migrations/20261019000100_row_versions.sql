@@ -0,0 +1,29 @@
+-- Row versions for cheap ETags and incremental reads: every write to restaurants
+-- and operating_hours bumps updated_at.
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$;
+
+alter table public.restaurants
+  add column if not exists updated_at timestamptz not null default now();
+alter table public.operating_hours
+  add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists restaurants_updated_at_idx on public.restaurants (updated_at);
+create index if not exists operating_hours_updated_at_idx on public.operating_hours (updated_at);
+
+drop trigger if exists restaurants_set_updated_at on public.restaurants;
+create trigger restaurants_set_updated_at
+  before update on public.restaurants
+  for each row execute function public.set_updated_at();
+
+drop trigger if exists operating_hours_set_updated_at on public.operating_hours;
+create trigger operating_hours_set_updated_at
+  before update on public.operating_hours
+  for each row execute function public.set_updated_at();
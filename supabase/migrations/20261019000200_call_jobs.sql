@@ -0,0 +1,112 @@
+-- Durable queue for outbound VAPI calls (hours verification).
+--
+-- A job is claimed by one dispatcher worker at a time under a lease. A worker that
+-- dies simply stops renewing its lease and the job becomes claimable again once the
+-- lease expires, so several app processes can dispatch without double-dialing.
+create table if not exists public.call_jobs (
+  id bigint generated by default as identity primary key,
+  restaurant_id text not null,
+  kind text not null default 'check_hours',
+  status text not null default 'pending'
+    check (status in ('pending', 'running', 'succeeded', 'failed')),
+  attempts integer not null default 0,
+  max_attempts integer not null default 3,
+  run_after timestamptz not null default now(),
+  lease_owner text,
+  lease_expires_at timestamptz,
+  call_id text,
+  result jsonb,
+  last_error text,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now()
+);
+
+-- At most one open job per restaurant and kind
+create unique index if not exists call_jobs_open_uniq
+  on public.call_jobs (restaurant_id, kind)
+  where status in ('pending', 'running');
+
+-- What claim_call_jobs scans: runnable pending jobs, and running jobs whose lease lapsed
+create index if not exists call_jobs_pending_idx
+  on public.call_jobs (run_after)
+  where status = 'pending';
+create index if not exists call_jobs_lease_idx
+  on public.call_jobs (lease_expires_at)
+  where status = 'running';
+
+drop trigger if exists call_jobs_set_updated_at on public.call_jobs;
+create trigger call_jobs_set_updated_at
+  before update on public.call_jobs
+  for each row execute function public.set_updated_at();
+
+-- Claim up to p_limit runnable jobs for p_worker, leasing them for p_lease_seconds.
+-- SKIP LOCKED lets concurrent workers claim disjoint batches without waiting.
+-- Jobs whose lease expired are reclaimed; ones that already used every attempt fail.
+create or replace function public.claim_call_jobs(
+  p_worker text, p_limit integer, p_lease_seconds integer
+)
+returns setof public.call_jobs
+language plpgsql
+volatile
+as $$
+begin
+  update public.call_jobs
+     set status = 'failed',
+         lease_owner = null,
+         lease_expires_at = null,
+         last_error = coalesce(last_error, 'lease expired after final attempt')
+   where status = 'running'
+     and lease_expires_at < now()
+     and attempts >= max_attempts;
+
+  return query
+  with candidates as (
+    select j.id
+      from public.call_jobs as j
+     where (j.status = 'pending' and j.run_after <= now())
+        or (j.status = 'running' and j.lease_expires_at < now())
+     order by j.run_after
+     limit p_limit
+     for update skip locked
+  )
+  update public.call_jobs as j
+     set status = 'running',
+         attempts = j.attempts + 1,
+         lease_owner = p_worker,
+         lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    from candidates as c
+   where j.id = c.id
+  returning j.*;
+end;
+$$;
+
+-- Queue hours checks for up to p_limit restaurants with unverified hours and no open
+-- job, oldest first. Bounded so each pass touches a small batch, not the whole table.
+create or replace function public.enqueue_unverified_restaurants(p_limit integer)
+returns integer
+language sql
+volatile
+as $$
+  with queued as (
+    insert into public.call_jobs (restaurant_id, kind)
+    select r.business_id, 'check_hours'
+      from public.restaurants as r
+     where r.is_hours_verified = false
+       and not exists (
+         select 1 from public.call_jobs as j
+          where j.restaurant_id = r.business_id
+            and j.kind = 'check_hours'
+            and (j.status in ('pending', 'running')
+                 or (j.status = 'failed' and j.updated_at > now() - interval '1 day'))
+       )
+     order by r.created_at
+     limit p_limit
+    on conflict do nothing
+    returning 1
+  )
+  select count(*)::integer from queued;
+$$;
+
+create index if not exists restaurants_unverified_idx
+  on public.restaurants (created_at)
+  where is_hours_verified = false;
@@ -0,0 +1,4 @@
+-- VAPI webhooks identify calls by id; find the job that placed a call
+create index if not exists call_jobs_call_id_idx
+  on public.call_jobs (call_id)
+  where call_id is not null;
@@ -0,0 +1,104 @@
+-- Calls keyed by the dialed number, so restaurants sharing a phone (chains, shared
+-- switchboards) get one call between them and a number isn't redialed right after
+-- a call to it finished.
+
+-- Mirrors to_e164 in app/clients/vapi.py; null for numbers it would reject
+create or replace function public.normalize_phone(p_phone text)
+returns text
+language sql
+immutable
+as $$
+  select case
+           when length(d) = 10 then '+1' || d
+           when length(d) = 11 then '+' || d
+         end
+    from (select regexp_replace(coalesce(p_phone, ''), '\D', '', 'g') as d) as digits;
+$$;
+
+alter table public.restaurants
+  add column if not exists phone_e164 text
+  generated always as (public.normalize_phone(phone)) stored;
+
+create index if not exists restaurants_phone_e164_idx
+  on public.restaurants (phone_e164)
+  where phone_e164 is not null;
+
+-- The latest call to each number. A worker holds the number under a lease while
+-- its call is in progress; the idempotency key and call_id survive a lapsed lease,
+-- so whoever takes over resumes that call instead of dialing again.
+create table if not exists public.phone_calls (
+  phone text primary key,
+  status text not null
+    check (status in ('in_progress', 'ended')),
+  owner text,
+  lease_expires_at timestamptz,
+  idempotency_key text not null,
+  call_id text,
+  result jsonb,
+  started_at timestamptz not null default now(),
+  ended_at timestamptz,
+  updated_at timestamptz not null default now()
+);
+
+create index if not exists phone_calls_call_id_idx
+  on public.phone_calls (call_id)
+  where call_id is not null;
+
+drop trigger if exists phone_calls_set_updated_at on public.phone_calls;
+create trigger phone_calls_set_updated_at
+  before update on public.phone_calls
+  for each row execute function public.set_updated_at();
+
+-- Try to take p_phone for p_worker. Outcomes:
+--   acquired  the caller owns the number; call_id is set when resuming a lapsed call
+--   recent    a call ended less than p_cooldown_seconds ago; result is its outcome
+--   busy      another worker's call to the number is in progress
+create or replace function public.acquire_phone_call(
+  p_phone text, p_worker text, p_lease_seconds integer, p_cooldown_seconds integer
+)
+returns table (outcome text, call_id text, idempotency_key text, result jsonb, ended_at timestamptz)
+language plpgsql
+volatile
+as $$
+declare
+  r public.phone_calls%rowtype;
+  lease timestamptz := now() + make_interval(secs => p_lease_seconds);
+begin
+  insert into public.phone_calls as pc (phone, status, owner, lease_expires_at, idempotency_key)
+  values (p_phone, 'in_progress', p_worker, lease, gen_random_uuid()::text)
+  on conflict (phone) do nothing
+  returning pc.* into r;
+  if found then
+    return query select 'acquired'::text, r.call_id, r.idempotency_key, null::jsonb, null::timestamptz;
+    return;
+  end if;
+
+  select * into r from public.phone_calls as pc where pc.phone = p_phone for update;
+
+  if r.status = 'ended' and r.ended_at > now() - make_interval(secs => p_cooldown_seconds) then
+    return query select 'recent'::text, r.call_id, r.idempotency_key, r.result, r.ended_at;
+    return;
+  end if;
+  if r.status = 'in_progress' and r.lease_expires_at > now() and r.owner is distinct from p_worker then
+    return query select 'busy'::text, r.call_id, r.idempotency_key, null::jsonb, null::timestamptz;
+    return;
+  end if;
+
+  if r.status = 'ended' then
+    -- A fresh call: new key, nothing to resume
+    update public.phone_calls as pc
+       set status = 'in_progress', owner = p_worker, lease_expires_at = lease,
+           idempotency_key = gen_random_uuid()::text, call_id = null, result = null,
+           started_at = now(), ended_at = null
+     where pc.phone = p_phone
+    returning pc.* into r;
+  else
+    -- Take over an unfinished call, keeping its key and call_id
+    update public.phone_calls as pc
+       set owner = p_worker, lease_expires_at = lease
+     where pc.phone = p_phone
+    returning pc.* into r;
+  end if;
+  return query select 'acquired'::text, r.call_id, r.idempotency_key, null::jsonb, null::timestamptz;
+end;
+$$;
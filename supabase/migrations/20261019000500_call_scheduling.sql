@@ -0,0 +1,102 @@
+-- Local-time-aware call scheduling.
+--
+-- New jobs are inserted unscheduled; the dispatcher works out each restaurant's
+-- timezone and best calling slot and sets run_after (when the slot opens),
+-- window_ends_at (when it closes) and priority (the expected answer rate, plus a
+-- boost for checks a user asked for). Claims take jobs whose slot is open now,
+-- most likely to be answered first.
+alter table public.call_jobs
+  add column if not exists phone text,
+  add column if not exists timezone text,
+  add column if not exists priority real not null default 0,
+  add column if not exists boost real not null default 0,
+  add column if not exists scheduled_at timestamptz,
+  add column if not exists window_ends_at timestamptz;
+
+drop index if exists public.call_jobs_pending_idx;
+create index if not exists call_jobs_ready_idx
+  on public.call_jobs (priority desc, run_after)
+  where status = 'pending' and scheduled_at is not null;
+create index if not exists call_jobs_unscheduled_idx
+  on public.call_jobs (created_at)
+  where status = 'pending' and scheduled_at is null;
+create index if not exists call_jobs_window_idx
+  on public.call_jobs (window_ends_at)
+  where status = 'pending' and window_ends_at is not null;
+
+create or replace function public.claim_call_jobs(
+  p_worker text, p_limit integer, p_lease_seconds integer
+)
+returns setof public.call_jobs
+language plpgsql
+volatile
+as $$
+begin
+  update public.call_jobs
+     set status = 'failed',
+         lease_owner = null,
+         lease_expires_at = null,
+         last_error = coalesce(last_error, 'lease expired after final attempt')
+   where status = 'running'
+     and lease_expires_at < now()
+     and attempts >= max_attempts;
+
+  return query
+  with candidates as (
+    select j.id
+      from public.call_jobs as j
+     where (j.status = 'pending'
+            and j.scheduled_at is not null
+            and j.run_after <= now()
+            and (j.window_ends_at is null or j.window_ends_at > now()))
+        or (j.status = 'running' and j.lease_expires_at < now())
+     order by j.priority desc, j.run_after
+     limit p_limit
+     for update skip locked
+  )
+  update public.call_jobs as j
+     set status = 'running',
+         attempts = j.attempts + 1,
+         lease_owner = p_worker,
+         lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    from candidates as c
+   where j.id = c.id
+  returning j.*;
+end;
+$$;
+
+-- Answered and unanswered calls per number and local hour of day
+create table if not exists public.call_slot_stats (
+  phone text not null,
+  local_hour smallint not null check (local_hour between 0 and 23),
+  attempts integer not null default 0,
+  answered integer not null default 0,
+  updated_at timestamptz not null default now(),
+  primary key (phone, local_hour)
+);
+
+create or replace function public.record_call_attempt(
+  p_phone text, p_local_hour integer, p_answered boolean
+)
+returns void
+language sql
+volatile
+as $$
+  insert into public.call_slot_stats as s (phone, local_hour, attempts, answered)
+  values (p_phone, p_local_hour, 1, case when p_answered then 1 else 0 end)
+  on conflict (phone, local_hour) do update
+     set attempts = s.attempts + 1,
+         answered = s.answered + excluded.answered,
+         updated_at = now();
+$$;
+
+-- Answer rates across every number, the prior for numbers with little history
+create or replace function public.call_slot_totals()
+returns table (local_hour smallint, attempts bigint, answered bigint)
+language sql
+stable
+as $$
+  select s.local_hour, sum(s.attempts), sum(s.answered)
+    from public.call_slot_stats as s
+   group by s.local_hour;
+$$;
@@ -0,0 +1,4 @@
+-- Structured weekly and holiday hours captured by a call (StructuredHours as JSON);
+-- null when the call only captured today's hours.
+alter table public.operating_hours
+  add column if not exists schedule jsonb;
@@ -0,0 +1,5 @@
+-- Only the backend (service_role) may spend credits: functions are executable by
+-- PUBLIC by default, which would let the anon and authenticated PostgREST roles call
+-- consume_search_credit for any user_id, however row-level security is set up.
+revoke execute on function public.consume_search_credit(text) from public, anon, authenticated;
+grant execute on function public.consume_search_credit(text) to service_role;
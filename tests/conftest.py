@@ -0,0 +1,18 @@
+"""Fixtures shared by the tests: the fake upstreams from scripts/fake_upstreams.py, with the
+app's environment pointed at them before any test imports the app."""
+import os
+import pytest
+from fake_upstreams import FakeUpstreams
+
+VAPI_WEBHOOK_SECRET = "test-webhook-secret"
+
+@pytest.fixture(scope="session")
+def fakes():
+    upstreams = FakeUpstreams()
+    with upstreams:
+        os.environ.update({
+            **upstreams.env(),
+            "VAPI_WEBHOOK_SECRET": VAPI_WEBHOOK_SECRET,
+            "DISPATCH_ENABLED": "false",
+        })
+        yield upstreams
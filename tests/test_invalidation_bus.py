@@ -0,0 +1,49 @@
+import asyncio
+import time
+from app.cache.invalidation import InvalidationBus, InvalidationEvent, LocalServerTransport
+from app.cache.local_server import serve
+from app.cache.ttl_cache import TTLCache
+
+def _worker(port: int):
+    """A bus and a user cache wired together the way app.db.users does it."""
+    cache: TTLCache[str] = TTLCache(ttl_seconds=60)
+    bus = InvalidationBus(LocalServerTransport("127.0.0.1", port))
+
+    def apply_user_change(event: InvalidationEvent) -> None:
+        for user_id in event.keys:
+            cache.invalidate(user_id, version=event.version)
+    bus.subscribe("user", apply_user_change)
+    return bus, cache
+
+async def _eventually(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+def test_publish_invalidates_other_workers_cache():
+    async def run():
+        server = await serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        (writer, _), (reader, reader_cache) = _worker(port), _worker(port)
+        await writer.start()
+        await reader.start()
+        try:
+            read_before = time.time()
+            assert reader_cache.set("user-1", "credits=5", version=read_before)
+
+            version = writer.publish("user", "user-1")
+            await _eventually(lambda: reader_cache.get("user-1") is None)
+
+            # A read that started before the write finishes after the event: refused
+            assert not reader_cache.set("user-1", "credits=5", version=read_before)
+            assert reader_cache.get("user-1") is None
+            # A read after the write is cached as usual
+            assert reader_cache.set("user-1", "credits=4", version=version + 0.001)
+            assert reader_cache.get("user-1") == "credits=4"
+        finally:
+            await writer.stop()
+            await reader.stop()
+            server.close()
+            await server.wait_closed()
+    asyncio.run(run())
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import httpx
+from fake_upstreams import make_restaurant
+
+def _post(message, secret=None):
+    """POST a VAPI server message to the app's webhook, as VAPI would."""
+    from app.main import app
+    secret = os.environ["VAPI_WEBHOOK_SECRET"] if secret is None else secret
+    headers = {"X-Vapi-Secret": secret} if secret else {}
+
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/vapi/webhook", json={"message": message}, headers=headers
+            )
+    return send()
+
+ANALYSIS = {
+    "successEvaluation": True,
+    "structuredData": {
+        "time_open": "09:00",
+        "time_closed": "17:00",
+        "is_open": True,
+        "weekly_hours": {"Mon-Fri": [{"time_open": "9am", "time_closed": "5pm"}], "sunday": []},
+        "holiday_hours": [{"date": "2026-12-25", "name": "Christmas", "is_closed": True}],
+    },
+}
+
+def test_webhook_resolves_waiting_call(fakes):
+    from app.services.call_events import call_waiters
+
+    async def run():
+        waiter = call_waiters.register("call-waited")
+        try:
+            response = await _post(
+                {"type": "status-update", "status": "ended", "call": {"id": "call-waited"}}
+            )
+            assert response.status_code == 200
+            assert waiter.ended
+            response = await _post({
+                "type": "end-of-call-report", "call": {"id": "call-waited"},
+                "analysis": ANALYSIS, "endedReason": "assistant-ended-call",
+            })
+            assert response.status_code == 200
+            report = await asyncio.wait_for(waiter.report, timeout=1)
+        finally:
+            call_waiters.discard("call-waited")
+        assert report == {"analysis": ANALYSIS, "endedReason": "assistant-ended-call"}
+    asyncio.run(run())
+
+def test_webhook_persists_report_for_call_placed_elsewhere(fakes):
+    restaurant = make_restaurant("webhook-restaurant", "Webhook Diner", "Oakland", "CA", 1)
+    restaurant["phone"] = "(415) 555-9876"
+    [restaurant] = fakes.store.insert("restaurants", restaurant, upsert=False)
+    phone_call = {"phone": "+14155559876", "call_id": "call-elsewhere"}
+    fakes.store.insert("phone_calls", phone_call, upsert=False)
+
+    response = asyncio.run(_post({
+        "type": "end-of-call-report", "call": {"id": "call-elsewhere"},
+        "analysis": ANALYSIS, "endedReason": "customer-ended-call",
+    }))
+
+    assert response.status_code == 200
+    stored = fakes.store.tables["operating_hours"]
+    hours = [h for h in stored if h["restaurant_id"] == restaurant["business_id"]]
+    assert len(hours) == 1
+    assert hours[0]["time_open"] == "09:00" and hours[0]["time_closed"] == "17:00"
+    assert hours[0]["is_open"] is True
+    schedule = hours[0]["schedule"]
+    assert schedule["weekly"]["wednesday"] == [{"time_open": "09:00", "time_closed": "17:00"}]
+    assert schedule["weekly"]["sunday"] == []
+    assert schedule["overrides"] == [
+        {"date": "2026-12-25", "name": "Christmas", "is_closed": True, "intervals": []}
+    ]
+    assert restaurant["is_hours_verified"] is True
+
+def test_webhook_requires_secret(fakes):
+    message = {"type": "status-update", "status": "ended", "call": {"id": "call-unsigned"}}
+    assert asyncio.run(_post(message, secret="")).status_code == 403
+    assert asyncio.run(_post(message, secret="wrong")).status_code == 403